@@ -1,12 +1,22 @@
 from collections import deque
 import networkx as nx
+import numpy as np
 import random
-from typing import Dict, Generator, List, Optional, Tuple
+from typing import Dict, Generator, Iterable, List, Optional, Tuple, Union
 import pickle
+import sys
+import warnings
 
 import bgpsecsim.error as error
-from bgpsecsim.asys import AS, AS_ID, Relation, Route, RoutingPolicy
+import bgpsecsim.propagation as propagation
+import bgpsecsim.reachability as reachability
+from bgpsecsim.aspa import ASPAIndex
+from bgpsecsim.asys import AS, AS_ID, RELATIONS, Relation, Route, RoutingPolicy
+from bgpsecsim.deployment import Deployment
+from bgpsecsim.profiling import PropagationStats
 from bgpsecsim.routing_policy import DefaultPolicy
+from bgpsecsim.routing_state import PolicyRule, RoutingState
+from bgpsecsim.topology import ASN_DTYPE, Topology
 
 
 def parse_as_rel_file_CAIDA(filename: str) -> nx.Graph:
@@ -36,46 +46,68 @@ def parse_as_rel_file_CAIDA(filename: str) -> nx.Graph:
     return graph
 
 
-def parse_as_rel_file_pickle(filename: str) -> nx.Graph:
-    pickleGraph = pickle.load(open(filename, "rb"))
-
-    node_relationships = {}
-
-    graph = nx.Graph()
-
-    for node in pickleGraph.nodes:
-        customers = []
-        providers = []
+# Pickled graphs with at least this many edges report their progress while being loaded
+PROGRESS_EDGES = 1_000_000
+
+
+def _classify_pickle_edges(
+        filename: str
+) -> Tuple[List[AS_ID], List[Tuple[AS_ID, AS_ID]], List[Tuple[AS_ID, AS_ID]]]:
+    """Reads a pickled networkx DiGraph, where an edge points from a customer to its provider and peers
+    have edges both ways, in a single pass over the edges.
+
+    Returns the ASs in the order parse_as_rel_file_pickle has always added them (every AS of the graph
+    followed by those of its customers, then of its peers, that were not seen before), the
+    <provider-as>, <customer-as> pairs and the <peer-as>, <peer-as> pairs, each pair once and in the
+    order it has always been added to the graph. Self-loops are dropped.
+    """
+    with open(filename, 'rb') as f:
+        digraph = pickle.load(f)
+    pred = digraph.pred
+    succ = digraph.succ
+
+    total = digraph.number_of_edges()
+    progress = total >= PROGRESS_EDGES
+    done = 0
+    next_report = PROGRESS_EDGES
+
+    # Dict used as an ordered set
+    seen: Dict[AS_ID, None] = {}
+    processed = set()
+    provider_customer = []
+    peer = []
+    for asys in digraph:
+        seen.setdefault(asys)
+        processed.add(asys)
+        providers = succ[asys]
         peers = []
+        for neighbor in pred[asys]:
+            if neighbor in providers:
+                peers.append(neighbor)
+            else:
+                seen.setdefault(neighbor)
+                provider_customer.append((asys, neighbor))
+        for neighbor in peers:
+            seen.setdefault(neighbor)
+            # Both ASs see the pair, which is added by the first of them; an AS is no peer of itself
+            if neighbor not in processed:
+                peer.append((asys, neighbor))
+
+        if progress:
+            done += len(pred[asys])
+            if done >= next_report or done == total:
+                print(f"\rClassified {done}/{total} edges", end='\n' if done == total else '',
+                      file=sys.stderr, flush=True)
+                next_report = done + PROGRESS_EDGES
+    return list(seen), provider_customer, peer
 
-        for in_edges in pickleGraph.in_edges(node):  # Add all peers
-            for out_edges in pickleGraph.out_edges(node):
-                if in_edges[0] == out_edges[1] and in_edges[1] == out_edges[0]:
-                    peers.append(in_edges[0])
-        for edge in pickleGraph.in_edges(node):
-            if edge[0] not in peers:
-                customers.append(edge[0])  # Add all customers (who are not peers already)
-        for edge in pickleGraph.out_edges(node):
-            if edge[1] not in peers:
-                providers.append(edge[1])  # Add all providers (who are not peers already)
-
-        node_relationships[node] = (customers, providers, peers)  # Store in dict
-
-    for node in node_relationships:
-        # node:     1234: ([customers], [providers], [peers])
-        if node not in graph:
-            graph.add_node(node)
-
-        for customer in node_relationships[node][0]:
-            if customer not in graph:
-                graph.add_node(customer)
-            graph.add_edge(node, customer, customer=customer)
-
-        for peer in node_relationships[node][2]:
-            if peer not in graph:
-                graph.add_node(peer)
-            graph.add_edge(node, peer, customer=None)
 
+def parse_as_rel_file_pickle(filename: str) -> nx.Graph:
+    asns, provider_customer, peer = _classify_pickle_edges(filename)
+    graph = nx.Graph()
+    graph.add_nodes_from(asns)
+    graph.add_edges_from((provider, customer, {'customer': customer}) for provider, customer in provider_customer)
+    graph.add_edges_from(peer, customer=None)
     return graph
 
 
@@ -85,59 +117,146 @@ def parse_as_rel_file(filename: str) -> nx.Graph:
     else:
         return parse_as_rel_file_CAIDA(filename)
 
+
+def load_topology_CAIDA(filename: str) -> Topology:
+    """Reads a CAIDA as-rel file straight into a topology, without building a networkx graph.
+
+    As with parse_as_rel_file_CAIDA, ASs and pairs of ASs are ordered by first appearance, and a pair
+    listed more than once gets the relation of its last line.
+    """
+    try:
+        with warnings.catch_warnings():
+            # Files without any relation are fine, and give an empty topology
+            warnings.simplefilter('ignore', UserWarning)
+            rows = np.loadtxt(filename, dtype=ASN_DTYPE, delimiter='|', comments='#', ndmin=2)
+    except ValueError as e:
+        raise error.InvalidASRelFile(filename, f"bad line: {e}")
+    if rows.size == 0:
+        rows = rows.reshape(0, 3)
+    # The 'serial-1' as-rel files contain p2p and p2c relationships. The format is:
+    # <provider-as>|<customer-as>|-1
+    # <peer-as>|<peer-as>|0
+    if rows.shape[1] != 3:
+        raise error.InvalidASRelFile(filename, f"expected 3 columns, got {rows.shape[1]}")
+
+    ends = rows[:, :2]
+    asns, first_seen = np.unique(ends.ravel(), return_index=True)
+    # Index of the first and the last line of every AS pair, in either direction. ASNs are 32 bit, so
+    # both fit in one 64 bit key.
+    pairs = np.sort(ends, axis=1).astype(np.uint64)
+    keys = (pairs[:, 0] << np.uint64(32)) | pairs[:, 1]
+    _, first = np.unique(keys, return_index=True)
+    _, last = np.unique(keys[::-1], return_index=True)
+    # Both by key; the last line of every pair, in the order of the first
+    rows = rows[(len(rows) - 1 - last)[np.argsort(first)]]
+
+    customer = rows[:, 2] == -1
+    return Topology(asns[np.argsort(first_seen)], rows[customer, :2], rows[~customer, :2])
+
+
+# Version of the loaders, part of the key of cached topologies. Bump it whenever a change to the
+# loaders or to the topology arrays changes what a file loads as.
+PARSER_VERSION = 5
+
+
+def load_topology(filename: str) -> Topology:
+    """Reads an as-rel file like parse_as_rel_file does, into a topology."""
+    if "pickle" in filename:
+        asns, provider_customer, peer = _classify_pickle_edges(filename)
+        return Topology(asns, np.array(provider_customer, dtype=ASN_DTYPE), np.array(peer, dtype=ASN_DTYPE))
+    else:
+        return load_topology_CAIDA(filename)
+
 class ASGraph(object):
-    __slots__ = ['asyss', 'graph']
+    __slots__ = [
+        'asyss', 'graph', 'topology', 'by_index', 'model', 'aspa_index',
+        'attacker', 'state', 'n_routes', 'n_tainted_routes', 'reachability_counts', 'reachability_one',
+        'stats', 'policy_rules'
+    ]
 
     asyss: Dict[AS_ID, AS]
+    topology: Topology
+    # AS objects by topology index; the AS objects are thin views over the topology.
+    by_index: List[AS]
+    # Routing model of find_routes_to and hijack_n_hops, one of propagation.MODELS
+    model: str
+    # ASPA records and hop verdicts, built by get_aspa_index when the first route is checked against
+    # ASPA
+    aspa_index: Optional[ASPAIndex]
+    # Attacker of the current trial, routes through it are tainted
+    attacker: Optional[AS]
+    # Routes to the destination of the current trial, which are counted as they are learned: the
+    # number of ASs with a route to it and the number of those routes which are tainted
+    state: Optional[RoutingState]
+    n_routes: int
+    n_tainted_routes: int
+    # Number of ASs that can reach each AS by index, computed by the first determine_reachability_all
+    reachability_counts: Optional[np.ndarray]
+    # Number of ASs that can reach each AS determine_reachability_one was asked for, by index, until
+    # the counts of all ASs are computed
+    reachability_one: Dict[int, int]
+    # Counters of the propagations while profiling, see bgpsecsim.profiling
+    stats: Optional[PropagationStats]
+    # Policies of all ASs by index, the rules RoutingState.propagate applies for them and whether any
+    # of them checks ASPA, rebuilt when a policy changes
+    policy_rules: Optional[Tuple[List[RoutingPolicy], List[PolicyRule], bool]]
     tierOne = []
     tierTwo = []
     tierThree = []
 
-    def __init__(self, graph: nx.Graph, policy: RoutingPolicy = DefaultPolicy()):
+    def __init__(
+            self,
+            graph: Union[nx.Graph, Topology],
+            policy: RoutingPolicy = DefaultPolicy(),
+            model: str = propagation.QUEUE
+    ):
+        if model not in propagation.MODELS:
+            raise ValueError(f"unknown routing model {model}")
+        self.model = model
+        self.aspa_index = None
+        self.attacker = None
+        self.state = None
+        self.n_routes = 0
+        self.n_tainted_routes = 0
+        self.reachability_counts = None
+        self.reachability_one = {}
+        self.stats = None
+        self.policy_rules = None
         self.asyss = {}
         self.tierOne.clear()
         self.tierTwo.clear()
         self.tierThree.clear()
 
-        for as_id in graph.nodes:
-            self.asyss[as_id] = AS(as_id, policy)
-        # Looks for all edges in the before created graph;
-        # evaluates them which type of relation is there and adds the information to each AS
-        for (as_id1, as_id2) in graph.edges:
-            as1 = self.asyss[as_id1]
-            as2 = self.asyss[as_id2]
-            customer = graph.edges[(as_id1, as_id2)]['customer']
-            if customer is None:
-                as1.add_peer(as2)
-                as2.add_peer(as1)
-            elif customer == as_id1:
-                as1.add_provider(as2)
-                as2.add_customer(as1)
-            elif customer == as_id2:
-                as1.add_customer(as2)
-                as2.add_provider(as1)
-        # Creates aspa objects for all AS in the current graph
-        for as_id in graph.nodes:
-            self.asyss.get(as_id, None).create_new_aspa()
+        topology = graph if isinstance(graph, Topology) else Topology.from_networkx(graph)
+        self.topology = topology
+        asns = topology.asns.tolist()
+        self.by_index = [AS(as_id, policy, self, index) for index, as_id in enumerate(asns)]
+        # ASs are iterated in the order of the input graph, not in index order
+        for index in topology.order.tolist():
+            self.asyss[asns[index]] = self.by_index[index]
 
         # Sorts AS to Tier1, Tier2 and Tier3 by
         # Tier1: do not have providers
         # Tier2: do have both providers and customers
         # Tier3: do not have customers
-        for as_id in graph.nodes:
-            providers = len(self.asyss[as_id].get_providers())
-            customers = len(self.asyss[as_id].get_customers())
-            if customers == 0:
-                self.tierThree.append(as_id)
-            elif providers == 0:
-                self.tierOne.append(as_id)
+        providers = topology.degrees(Relation.PROVIDER)
+        customers = topology.degrees(Relation.CUSTOMER)
+        for index in topology.order.tolist():
+            if customers[index] == 0:
+                self.tierThree.append(asns[index])
+            elif providers[index] == 0:
+                self.tierOne.append(asns[index])
             else:
-                self.tierTwo.append(as_id)
-
+                self.tierTwo.append(asns[index])
 
     def get_asys(self, as_id: AS_ID) -> Optional[AS]:
         return self.asyss.get(as_id, None)
 
+    def get_aspa_index(self) -> ASPAIndex:
+        if self.aspa_index is None:
+            self.aspa_index = ASPAIndex(self.topology)
+        return self.aspa_index
+
     def get_tierOne(self):
         return self.tierOne
 
@@ -147,14 +266,26 @@ class ASGraph(object):
     def get_tierThree(self):
         return self.tierThree
 
+    def apply_deployment(
+            self,
+            policy: RoutingPolicy,
+            overrides: Iterable[Tuple[RoutingPolicy, Iterable[AS_ID]]] = (),
+            **flags: Iterable[AS_ID],
+    ) -> None:
+        """Resets the policy and security flags of every AS, keeping the AS objects and routing tables.
+
+        ASs use the given policy unless listed in overrides with another one, and have a flag of
+        deployment.FLAGS set only if listed for it, e.g. aspa_enabled=[3356, 174].
+        """
+        Deployment.create(self.topology, self.model, policy, overrides, **flags).apply(self)
+
 
     # ISP is no customer of any other AS
     def identify_top_isps(self, n: int) -> List[AS]:
         """Top ISPs by customer degree."""
-        isps = [(asys, asys.neighbor_counts_by_relation())
-                for asys in self.asyss.values()]
-        isps.sort(key=lambda pair: -pair[1][Relation.CUSTOMER])
-        return [asys for asys, _ in isps[:n]]
+        customers = self.topology.degrees(Relation.CUSTOMER)
+        isps = sorted(self.asyss.values(), key=lambda asys: -customers[asys.index])
+        return isps[:n]
 
     def get_providers(self, ids: List[AS_ID]) -> List[AS]:
         """Return providers of a list of ASes, as a set"""
@@ -165,88 +296,90 @@ class ASGraph(object):
         return list(providers)
 
     def determine_reachability_one(self, as_id: AS_ID) -> int:
-        """Returns how many ASs can the given AS, itself included."""
-        graph = self._build_reachability_graph()
-        n_ancestors = len([as_id
-                           for side, as_id in nx.ancestors(graph, ('r', as_id))
-                           if side == 'l'])
-        return n_ancestors
+        """Returns how many ASs can reach the given AS, itself included."""
+        index = self.asyss[as_id].index
+        if self.reachability_counts is not None:
+            return int(self.reachability_counts[index])
+        count = self.reachability_one.get(index)
+        if count is None:
+            count = self.reachability_one[index] = int(reachability.reachable_from(self.topology, index).sum())
+        return count
 
     def determine_reachability_all(self) -> Dict[AS_ID, int]:
         """Returns how many ASs can reach each AS, themselves included."""
-        graph = self._build_reachability_graph()
-
-        # Process nodes in topological order, keeping track of which ones they are reachable from
-        # with a bitfield.
-
-        # Queue are like stack but with the FIFO Principle; whereas deque works with LIFO
-        queue: deque = deque()
-        remaining_edges = {}
-        for node in graph:
-            # in_degree is the number of edges pointing to the node
-            remaining_edges[node] = graph.in_degree(node)
-            print(remaining_edges[node])
-            if remaining_edges[node] == 0:
-                del remaining_edges[node]
-                queue.append(node)
-        while queue:
-            node = queue.popleft()
-            # A successor of n is a node m such that there exists a directed edge from n to m.
-            for next_node in graph.successors(node):
-                graph.nodes[next_node]['reachable_from'] |= graph.nodes[node]['reachable_from']
-                remaining_edges[next_node] -= 1
-                if remaining_edges[next_node] == 0:
-                    del remaining_edges[next_node]
-                    queue.append(next_node)
-        print({as_id: bit_count(graph.nodes[('r', as_id)]['reachable_from'])
-                for as_id in self.asyss})
-        return {as_id: bit_count(graph.nodes[('r', as_id)]['reachable_from'])
-                for as_id in self.asyss}
-
-    def _build_reachability_graph(self) -> nx.DiGraph:
-        graph = nx.DiGraph()
-        for asys in self.asyss.values():
-            asysInteger = int(asys.as_id)
-            graph.add_node(('l', asysInteger), reachable_from=(1 << asysInteger))
-            graph.add_node(('r', asysInteger), reachable_from=0)
-            graph.add_edge(('l', asysInteger), ('r', asys))
-            print (('l', asysInteger), ('r', asysInteger))
-        for asys in self.asyss.values():
-            for neighbor, relation in asys.neighbors.items():
-                if relation == Relation.CUSTOMER:
-                    graph.add_edge(('r', asysInteger), ('r', int(neighbor.as_id)))
-                elif relation == Relation.PEER:
-                    graph.add_edge(('l', asysInteger), ('r', int(neighbor.as_id)))
-                elif relation == Relation.PROVIDER:
-                    graph.add_edge(('l', asysInteger), ('l', int(neighbor.as_id)))
-        return graph
+        if self.reachability_counts is None:
+            self.reachability_counts = reachability.reachable_counts(self.topology)
+            self.reachability_one.clear()
+        counts = self.reachability_counts.tolist()
+        return {as_id: counts[asys.index] for as_id, asys in self.asyss.items()}
 
     def any_customer_provider_cycles(self) -> bool:
         graph = nx.DiGraph()
-        for asys in self.asyss.values():
-            graph.add_node(asys.as_id)
-        for asys in self.asyss.values():
-            for neighbor, relation in asys.neighbors.items():
-                if relation == Relation.CUSTOMER:
-                    graph.add_edge(asys.as_id, neighbor.as_id)
+        graph.add_nodes_from(range(len(self.topology)))
+        graph.add_edges_from(self.topology.edges(Relation.CUSTOMER).tolist())
         return not nx.is_directed_acyclic_graph(graph)
 
+    @property
+    def tracked(self) -> Optional[AS_ID]:
+        """Destination of the current trial."""
+        return None if self.state is None else self.state.dest
+
     def clear_routing_tables(self) -> None:
-        for asys in self.asyss.values():
-            asys.reset_routing_table()
+        self.state = None
+        # Tables holding only the own route are left as they are
+        for asys in self.by_index:
+            if len(asys.routing_table) != 1:
+                asys.reset_routing_table()
+
+    def start_trial(self, victim: AS, attacker: AS) -> None:
+        """Clears the routing tables, then keeps the routes to the victim in a routing state until the
+        routing tables are cleared again: routes through the attacker are tainted, and routes are
+        counted as they are learned."""
+        self._clear_for_attacker(attacker)
+        self.n_routes = 0
+        self.n_tainted_routes = 0
+        self.state = RoutingState(self, victim.as_id)
+        victim.force_route(victim.routing_table[victim.as_id])
+
+    def routes_to(self, target: AS) -> RoutingState:
+        """Copy of the routing state of the current trial, whose destination is the target."""
+        if self.tracked != target.as_id:
+            raise ValueError(f"the current trial does not route to AS {target.as_id}")
+        return self.state.copy()
+
+    def restore_routes_to(self, victim: AS, attacker: AS, routes: RoutingState) -> None:
+        """Starts a trial like start_trial followed by find_routes_to, from the routing state that
+        routes_to returned after an earlier find_routes_to with the same routing decisions."""
+        if routes.dest != victim.as_id:
+            raise ValueError(f"the routes do not lead to AS {victim.as_id}")
+        self._clear_for_attacker(attacker)
+        self.state = routes.copy()
+        self.state.taint(attacker)
+
+    def _clear_for_attacker(self, attacker: AS) -> None:
+        previous = self.attacker
+        self.attacker = attacker
+        self.clear_routing_tables()
+        # Own routes of the previous and the new attacker change whether they are tainted
+        for asys in (previous, attacker):
+            if asys is not None:
+                asys.reset_routing_table()
 
     def find_routes_to(self, target: AS) -> None:
-        routes: deque = deque()
-        for neighbor in target.neighbors:
-            routes.append(target.originate_route(neighbor))
+        if self.model == propagation.STABLE:
+            propagation.find_routes_to(self, target)
+        else:
+            routes: deque = deque()
+            for relation in RELATIONS:
+                for neighbor in target.get_neighbors(relation):
+                    routes.append(target.originate_route(neighbor))
 
-        while routes:
-            route = routes.popleft()
-            asys = route.final
-            for neighbor in asys.learn_route(route):
-                routes.append(asys.forward_route(route, neighbor))
+            self._propagate(routes)
+        self._compact_state(target)
 
-    def hijack_n_hops(self, victim: AS, attacker: AS, n: int) -> None:
+    def hijack_n_hops(self, victim: AS, attacker: AS, n: int, rng: Optional[random.Random] = None) -> None:
+        """The attacker announces a route to the victim with n - 1 forged hops in between; those are
+        drawn with rng, the global random generator by default."""
         if n < 0:
             raise ValueError("number of hops must be non-negative")
         # If 0 hops then path is only the attacker itself
@@ -257,14 +390,20 @@ class ASGraph(object):
             path = [victim, attacker]
         # In other cases if 2 or more hops
         else:
-            # set is a list with only unique elements, so everythin double will be removed from it
-            # set1-set2 gives all the elements which are only uniquely in set1 and do not occur in set2
-            asyss = list(set(self.asyss.values()) - set([victim, attacker]))
-            # random.sample returns n-1 random items of asyss
-            middle = random.sample(asyss, n - 1)
-            # middle is added as new path from victom to attacker;
-            # where middle are AS choosen randomly from asyss;
-            # number of choosen is one lower than the number of hops given by n
+            by_index = self.by_index
+            if n - 1 > len(by_index) - 2:
+                raise ValueError("more hops than ASs besides the victim and the attacker")
+            # n - 1 distinct ASs other than the victim and the attacker, drawn by index and drawn
+            # again when taken, in order of the draws
+            randrange = (rng or random).randrange
+            taken = {victim.index, attacker.index}
+            middle = []
+            while len(middle) < n - 1:
+                index = randrange(len(by_index))
+                if index not in taken:
+                    taken.add(index)
+                    middle.append(by_index[index])
+            # middle is added as new path from victom to attacker
             path = [victim] + middle + [attacker]
 
         bad_route = Route(
@@ -275,30 +414,61 @@ class ASGraph(object):
             authenticated=False
         )
 
-        routes: deque = deque()
-        for neighbor in attacker.neighbors:
-            routes.append(attacker.forward_route(bad_route, neighbor))
-
+        if self.model == propagation.STABLE:
+            propagation.hijack(self, victim, attacker, bad_route)
+        else:
+            routes: deque = deque()
+            for relation in RELATIONS:
+                for neighbor in attacker.get_neighbors(relation):
+                    if not bad_route.contains(neighbor):
+                        routes.append(attacker.forward_route(bad_route, neighbor))
+
+            self._propagate(routes)
+        self._compact_state(victim)
+
+    def _compact_state(self, target: AS) -> None:
+        # The routes to the target have settled, so the routing state of the trial only needs the
+        # replaced routes its current routes extend
+        if self.tracked == target.as_id:
+            self.state.compact()
+
+    def _propagate(self, routes: deque) -> None:
+        """Passes the queued routes on until no AS learns a better one; counted into stats while
+        profiling. Routes to the destination of the routing state are passed on by the state."""
+        stats = self.stats
+        state = self.state
+        if state is not None and routes and routes[0].dest == state.dest and state.propagate(routes, stats):
+            return
+        if stats is not None:
+            stats.peak_queue = max(stats.peak_queue, len(routes))
         while routes:
             route = routes.popleft()
             asys = route.final
-            for neighbor in asys.learn_route(route):
-                routes.append(asys.forward_route(route, neighbor))
-
-
-def bit_count(bitfield: int) -> int:
-    # .count returns the number of times the value "1" appears
-    # bin returns the binary version of a number
-    return bin(bitfield).count('1')
+            neighbors = asys.learn_route(route, stats)
+            if neighbors:
+                # Forward the stored route, which is a view in a routing state
+                route = asys.get_route(route.dest)
+                for neighbor in neighbors:
+                    routes.append(asys.forward_route(route, neighbor))
+                if stats is not None:
+                    stats.forwarded += len(neighbors)
+                    stats.peak_queue = max(stats.peak_queue, len(routes))
 
 
 def asyss_by_customer_count(
-        graph: nx.Graph,
+        graph: Union[nx.Graph, Topology],
         min_count: int,
         # Optional returns only values of the desired type, in this case "int"; otherwise NONE will be returned
         max_count: Optional[int]
 ) -> Generator[int, None, None]:
     # Generator[yield_type, send_type, return_type]
+    if isinstance(graph, Topology):
+        customer_counts = graph.degrees(Relation.CUSTOMER)
+        for index, as_id in zip(graph.order.tolist(), graph.as_ids()):
+            customer_count = customer_counts[index]
+            if min_count <= customer_count and (max_count is None or max_count >= customer_count):
+                yield as_id
+        return
     for node in graph:
         customer_count = sum((1
                              for neighbor in graph[node]
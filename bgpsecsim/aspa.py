@@ -0,0 +1,108 @@
+from typing import Dict, Iterable, List
+
+from bgpsecsim.asys import AS, Relation, Route
+from bgpsecsim.topology import Topology
+
+# Verdicts for a hop from an AS to the next AS on the path, by the ASPA record of the AS.
+# The AS publishes no providers, so the hop can not be checked
+UNKNOWN = 0
+# The next AS is a provider of the AS, the hop goes upstream
+PROVIDER = 1
+# The next AS is a peer of the AS
+PEER = 2
+# The next AS is neither, the hop does not go upstream
+NOT_PROVIDER = 3
+
+
+class ASPAIndex(object):
+    """ASPA records of all ASs of a topology and the verdicts of the hops checked so far.
+
+    The ASPA record of an AS lists its providers, which are the provider rows of the topology, in
+    topology order. Verdicts do not depend on that order. Records do not change during a trial, so the
+    verdict of every (AS, next AS) hop is computed once and cached.
+    """
+    __slots__ = ['topology', 'size', 'offsets', 'providers', 'verdicts']
+
+    topology: Topology
+    # Number of ASs
+    size: int
+    # Provider CSR arrays of the topology
+    offsets: memoryview
+    providers: memoryview
+    # Verdicts by AS index * N + next AS index
+    verdicts: Dict[int, int]
+
+    def __init__(self, topology: Topology):
+        self.topology = topology
+        self.size = len(topology)
+        self.offsets = memoryview(topology.provider_offsets)
+        self.providers = memoryview(topology.provider_indices)
+        self.verdicts = {}
+
+    def get_providers(self, index: int) -> List[int]:
+        """Indices of the providers in the ASPA record of an AS."""
+        return self.providers[self.offsets[index]:self.offsets[index + 1]].tolist()
+
+    def verdict(self, index: int, next_index: int) -> int:
+        key = index * self.size + next_index
+        verdict = self.verdicts.get(key)
+        if verdict is None:
+            verdict = self.verdicts[key] = self._check_hop(index, next_index)
+        return verdict
+
+    def _check_hop(self, index: int, next_index: int) -> int:
+        providers = self.get_providers(index)
+        if not providers:
+            return UNKNOWN
+        if next_index in providers:
+            return PROVIDER
+        if self.topology.relation(index, next_index) == Relation.PEER:
+            return PEER
+        return NOT_PROVIDER
+
+    def may_go_up(self, asys: AS, next_hop: AS) -> bool:
+        """Whether the hop may go upstream, unless the AS has ASPA enabled and its record says no."""
+        return not asys.aspa_enabled or self.verdict(asys.index, next_hop.index) in (UNKNOWN, PROVIDER)
+
+    def may_go_down(self, asys: AS, next_hop: AS) -> bool:
+        """Whether the hop may go downstream, unless the next AS has ASPA enabled and its record does
+        not list the AS as a provider."""
+        return not next_hop.aspa_enabled or self.verdict(next_hop.index, asys.index) in (UNKNOWN, PROVIDER)
+
+    def verify(self, route: Route) -> bool:
+        """Whether the route may be valley-free as far as the records of the ASs with ASPA enabled show:
+        up from the origin, across at most one peer, then down to the final AS. Every hop is checked
+        against the record of its customer side, the AS before it going up and the AS after it going
+        down.
+
+        One pass from the origin finds the hops that may go upstream, one from the final AS those that
+        may go downstream; the route is valid if they meet or only a peer hop is left between them.
+        """
+        return self.verify_path(route.path)
+
+    def verify_path(self, path: List[AS]) -> bool:
+        """Like verify, for the path of a route."""
+        return self.verify_back(self.count_up(path), len(path) - 1, reversed(path))
+
+    def count_up(self, path: List[AS]) -> int:
+        """Number of hops from the origin on that may go upstream."""
+        n_hops = len(path) - 1
+        up = 0
+        while up < n_hops and self.may_go_up(path[up], path[up + 1]):
+            up += 1
+        return up
+
+    def verify_back(self, up: int, n_hops: int, back: Iterable[AS]) -> bool:
+        """Like verify_path, given count_up of the path, its number of hops and its ASs from the final
+        AS back to the origin, which are only followed as far as the downstream pass needs."""
+        back = iter(back)
+        following = next(back)
+        down = n_hops
+        for asys in back:
+            if down == up or not self.may_go_down(asys, following):
+                break
+            down -= 1
+            following = asys
+        if down == up:
+            return True
+        return down == up + 1 and self.verdict(asys.index, following.index) == PEER
@@ -1,6 +1,9 @@
 import abc
 from enum import Enum
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from bgpsecsim.profiling import PropagationStats
 
 AS_ID = int
 
@@ -10,27 +13,30 @@ class Relation(Enum):
     PEER = 2
     PROVIDER = 3
 
-class AspaList:
-    List['AS']
-
+# Iterating over an Enum class is slow, hot paths iterate over this tuple instead
+RELATIONS = tuple(Relation)
 
 class AS(object):
     # __slots__ states which instance attributes you expect your object instances to have -> results in faster access
     __slots__ = [
-        'as_id', 'neighbors', 'policy', 'publishes_rpki', 'publishes_path_end', 'bgp_sec_enabled',
-        'routing_table', 'aspa', 'aspa_enabled'
+        'as_id', 'index', 'graph', 'policy', 'publishes_rpki', 'publishes_path_end', 'bgp_sec_enabled',
+        'routing_table', 'aspa_enabled'
     ]
 
     as_id: AS_ID
-    # Dict stores key:value pairs -> RELATION is connected with the given AS (e.g. Dict['123', 1] states that AS 123 is a CUSTOMER of the current AS
-    neighbors: Dict['AS', Relation]
+    # Dense index of the AS in the topology of its graph. Neighbors are not stored on the AS itself,
+    # they are looked up in the topology's relation-partitioned CSR arrays.
+    index: int
+    graph: 'ASGraph'
     policy: 'RoutingPolicy'
     publishes_rpki: bool
     publishes_path_end: bool
     bgp_sec_enabled: bool
+    # Routes by destination, except the routes to the destination of the graph's current trial, which
+    # are kept in the graph's routing state
     routing_table: Dict[AS_ID, 'Route']
-    # ASPA object is a list for the current AS with its ID and all its providers, which will be candidates for connections in ASPA algorithm
-    aspa: ['AS_ID', AspaList]
+    # Whether routes are checked against the ASPA record of the AS, which lists its providers, see
+    # ASGraph.get_aspa_index.
     aspa_enabled: bool
 
     def __init__(
@@ -38,14 +44,17 @@ class AS(object):
         self,
         as_id: AS_ID,
         policy: 'RoutingPolicy',
+        graph: 'ASGraph',
+        index: int,
         publishes_rpki: bool = False,
         publishes_path_end: bool = False,
         bgp_sec_enabled: bool = False,
         aspa_enabled: bool = False
     ):
         self.as_id = as_id
+        self.index = index
+        self.graph = graph
         self.policy = policy
-        self.neighbors = {}
         self.publishes_rpki = publishes_rpki
         self.publishes_path_end = publishes_path_end
         self.bgp_sec_enabled = bgp_sec_enabled
@@ -55,65 +64,92 @@ class AS(object):
 
     # -> marks return function annotation. So tells which type the function should return, but does not force it.
 
+    @property
+    def neighbors(self) -> Dict['AS', Relation]:
+        """All neighbors with their relation to this AS (e.g. {AS 123: Relation.CUSTOMER} states that AS 123 is a CUSTOMER of the current AS).
+
+        Built on every access, hot paths should use get_neighbors instead.
+        """
+        return {neighbor: relation
+                for relation in RELATIONS
+                for neighbor in self.get_neighbors(relation)}
+
+    def get_neighbors(self, relation: Relation) -> List['AS']:
+        """All neighbors that stand in the given relation to this AS."""
+        by_index = self.graph.by_index
+        return [by_index[i] for i in self.graph.topology.neighbors(self.index, relation)]
+
     def neighbor_counts_by_relation(self) -> Dict[Relation, int]:
         # counts number of neoghbours of the current AS
-        counts = {relation: 0 for relation in Relation}
-        for relation in self.neighbors.values():
-            counts[relation] += 1
-        return counts
+        topology = self.graph.topology
+        return {relation: topology.degree(self.index, relation) for relation in Relation}
 
     def get_providers(self) -> List[AS_ID]:
         # returns a list of all providers of the current AS
-        providers = filter(lambda id: self.neighbors[id] == Relation.PROVIDER, self.neighbors.keys())
-        return [p.as_id for p in providers]
+        topology = self.graph.topology
+        return topology.asns[topology.neighbors(self.index, Relation.PROVIDER)].tolist()
 
     def get_customers(self) -> List[AS_ID]:
-        # returns a list of all providers of the current AS
-        customers = filter(lambda id: self.neighbors[id] == Relation.CUSTOMER, self.neighbors.keys())
-        return [p.as_id for p in customers]
-
-    def add_peer(self, asys: 'AS') -> None:
-        self.neighbors[asys] = Relation.PEER
-
-    def add_customer(self, asys: 'AS') -> None:
-        self.neighbors[asys] = Relation.CUSTOMER
-
-    def add_provider(self, asys: 'AS') -> None:
-        self.neighbors[asys] = Relation.PROVIDER
+        # returns a list of all customers of the current AS
+        topology = self.graph.topology
+        return topology.asns[topology.neighbors(self.index, Relation.CUSTOMER)].tolist()
 
     def get_relation(self, asys: 'AS') -> Optional[Relation]:
-        return self.neighbors.get(asys, None)
+        return self.graph.topology.relation(self.index, asys.index)
 
     def get_route(self, as_id: AS_ID) -> Optional['Route']:
+        state = self.graph.state
+        if state is not None and as_id == state.dest:
+            return state.route(self.index)
         return self.routing_table.get(as_id, None)
 
     def force_route(self, route: 'Route') -> None:
-        self.routing_table[route.dest] = route
-
-    def learn_route(self, route: 'Route') -> List['AS']:
+        state = self.graph.state
+        if state is not None and route.dest == state.dest:
+            state.store(self.index, route)
+        else:
+            self.routing_table[route.dest] = route
+
+    def withdraw_route(self, dest: AS_ID) -> None:
+        state = self.graph.state
+        if state is not None and dest == state.dest:
+            state.withdraw(self.index)
+        else:
+            self.routing_table.pop(dest, None)
+
+    def learn_route(self, route: 'Route', stats: Optional['PropagationStats'] = None) -> List['AS']:
         """Learn about a new route.
 
-        Returns a list of ASs to advertise route to.
+        Returns a list of ASs to advertise route to, which excludes the ASs on its path. The route is
+        counted into stats if given.
         """
+        if stats is not None:
+            stats.offered += 1
         if route.dest == self.as_id:
             return []
 
         if not self.policy.accept_route(route):
+            if stats is not None:
+                stats.rejected_accept += 1
             return []
 
-        if (route.dest in self.routing_table and
-            not self.policy.prefer_route(self.routing_table[route.dest], route)):
+        current = self.get_route(route.dest)
+        if current is not None and not self.policy.prefer_route(current, route):
+            if stats is not None:
+                stats.rejected_prefer += 1
             return []
 
-        self.routing_table[route.dest] = route
-
-        forward_to_relations = set((relation
-                                    for relation in Relation
-                                    if self.policy.forward_to(route, relation)))
+        self.force_route(route)
+        return self.advertise_to(route)
 
+    def advertise_to(self, route: 'Route') -> List['AS']:
+        """Neighbors to pass on a route just learned to."""
+        # Neighbors already on the path would reject the route as a loop
         return [neighbor
-                for neighbor, relation in self.neighbors.items()
-                if relation in forward_to_relations]
+                for relation in RELATIONS
+                if self.policy.forward_to(route, relation)
+                for neighbor in self.get_neighbors(relation)
+                if not route.contains(neighbor)]
 
     def originate_route(self, next_hop: 'AS') -> 'Route':
         return Route(
@@ -125,13 +161,7 @@ class AS(object):
         )
 
     def forward_route(self, route: 'Route', next_hop: 'AS') -> 'Route':
-        return Route(
-            dest=route.dest,
-            path=route.path + [next_hop],
-            origin_invalid=route.origin_invalid,
-            path_end_invalid=route.path_end_invalid,
-            authenticated=route.authenticated and next_hop.bgp_sec_enabled,
-        )
+        return route.extend(next_hop, authenticated=route.authenticated and next_hop.bgp_sec_enabled)
 
     def reset_routing_table(self) -> None:
         self.routing_table.clear()
@@ -143,24 +173,41 @@ class AS(object):
             authenticated=True,
         )
 
-    def create_new_aspa(self) -> None:
-        self.aspa = self.as_id, self.get_providers()
+    def get_aspa(self) -> Tuple[AS_ID, List[AS_ID]]:
+        return self.as_id, self.get_aspa_providers()
+
+    def get_aspa_providers(self) -> List[AS_ID]:
+        by_index = self.graph.by_index
+        return [by_index[index].as_id for index in self.graph.get_aspa_index().get_providers(self.index)]
 
-    def get_aspa(self):
-        if hasattr(self, 'aspa'):
-            return self.aspa
 
-    def get_aspa_providers(self):
-        if hasattr(self, 'aspa'):
-            return self.aspa[1]
+# Number of bits of Route.path_filter
+PATH_FILTER_BITS = 64
+
 
 class Route(object):
-    __slots__ = ['dest', 'path', 'origin_invalid', 'path_end_invalid', 'authenticated']
+    __slots__ = [
+        'dest', 'parent', 'final', 'length', 'path_filter', 'cyclic', 'tainted',
+        'origin_invalid', 'path_end_invalid', 'authenticated'
+    ]
 
     # Destination is an IP block that is owned by this AS. The AS_ID is the same as the origin's ID
     # for valid routes, but may differ in a hijacking attack.
     dest: AS_ID
-    path: List[AS]
+    # The path is not stored as a list: every route points to the route it was forwarded from, which
+    # holds the path up to the previous hop, and stores only the last AS of the path itself. Routes
+    # forwarded from the same route share that part of the path.
+    parent: Optional['Route']
+    final: AS
+    length: int
+    # One-hash Bloom filter of the ASs on the path: bit (index % PATH_FILTER_BITS) is set for every AS
+    # on it. An AS whose bit is not set is not on the path, which answers most membership tests
+    # without walking the path.
+    path_filter: int
+    # Whether some AS appears on the path more than once
+    cyclic: bool
+    # Whether the attacker of the graph's current trial is on the path, see ASGraph.start_trial
+    tainted: bool
     # Whether the origin has no valid RPKI record and one is expected.
     origin_invalid: bool
     # Whether the first hop has no valid path-end record and one is expected.
@@ -176,17 +223,54 @@ class Route(object):
         path_end_invalid: bool,
         authenticated: bool,
     ):
+        if not path:
+            raise ValueError("path must not be empty")
+        final = path[-1]
         self.dest = dest
-        self.path = path
+        self.parent = None
+        self.path_filter = 0
+        self.cyclic = False
+        self.tainted = final is final.graph.attacker
+        if len(path) > 1:
+            self.parent = Route(dest, path[:-1], origin_invalid, path_end_invalid, authenticated)
+            self.path_filter = self.parent.path_filter
+            self.cyclic = self.parent.cyclic or self.parent.contains(final)
+            self.tainted = self.tainted or self.parent.tainted
+        self.path_filter |= 1 << (final.index % PATH_FILTER_BITS)
+        self.final = final
+        self.length = len(path)
         self.origin_invalid = origin_invalid
         self.path_end_invalid = path_end_invalid
         self.authenticated = authenticated
 
+    def extend(self, next_hop: AS, authenticated: bool) -> 'Route':
+        """Returns the route with next_hop appended to its path, without copying the path."""
+        route = Route.__new__(Route)
+        route.dest = self.dest
+        route.parent = self
+        route.final = next_hop
+        route.length = self.length + 1
+        route.path_filter = self.path_filter | (1 << (next_hop.index % PATH_FILTER_BITS))
+        route.cyclic = self.cyclic or self.contains(next_hop)
+        route.tainted = self.tainted or next_hop is next_hop.graph.attacker
+        route.origin_invalid = self.origin_invalid
+        route.path_end_invalid = self.path_end_invalid
+        route.authenticated = authenticated
+        return route
 
-# @property is python way to create getter and setter method
     @property
-    def length(self) -> int:
-        return len(self.path)
+    def path(self) -> List[AS]:
+        """The path as a list, built on every access."""
+        path = []
+        route = self
+        # Views of a routing state build the rest of the path from the state
+        while type(route) is Route:
+            path.append(route.final)
+            route = route.parent
+        path.reverse()
+        if route is not None:
+            return route.path + path
+        return path
 
     @property
     def origin(self) -> AS:
@@ -194,14 +278,23 @@ class Route(object):
 
     @property
     def first_hop(self) -> AS:
-        return self.path[-2]
-
-    @property
-    def final(self) -> AS:
-        return self.path[-1]
+        if self.parent is None:
+            raise IndexError("route has no first hop")
+        return self.parent.final
+
+    def contains(self, asys: AS) -> bool:
+        """Whether the AS is on the path, i.e. whether appending it would create a loop."""
+        if not (self.path_filter >> (asys.index % PATH_FILTER_BITS)) & 1:
+            return False
+        route = self
+        while route is not None:
+            if route.final is asys:
+                return True
+            route = route.parent
+        return False
 
     def contains_cycle(self) -> bool:
-        return len(self.path) != len(set(self.path))
+        return self.cyclic
 
     # __str__ returns the string representation of the object
     def __str__(self) -> str:
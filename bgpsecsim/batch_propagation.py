@@ -0,0 +1,112 @@
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from bgpsecsim.asys import Relation
+from bgpsecsim.reachability import gather
+from bgpsecsim.topology import INDEX_DTYPE, Topology
+
+# Routes of a block of destinations at once, for a deployment in which every AS uses DefaultPolicy:
+# routes are ranked by relation (customer, peer, provider), then path length, then next hop AS
+# number, and forwarded valley-free. The routes are the ones the stable model of propagation.py
+# settles on, in the same three phases, customer to provider, across peers and provider to customer,
+# here level by level for the whole block: every offer of a level is an array entry, and every AS
+# settles on the shortest offer, the one from the lowest index on ties. Indices are in AS number
+# order, so that is the lowest AS number.
+
+# Destinations per block; a block holds a next hop and a path length for every AS and destination
+BLOCK_SIZE = 256
+# Next hop of the destinations themselves and of ASs without a route
+NO_ROUTE = -1
+# Path length, in ASs; 0 for ASs without a route
+LENGTH_DTYPE = np.int16
+
+
+def _settle(
+        length: np.ndarray,
+        next_hop: np.ndarray,
+        n: int,
+        receivers: np.ndarray,
+        senders: np.ndarray,
+        lengths: np.ndarray,
+) -> np.ndarray:
+    """Settles every receiver without a route on its best offer. Receivers are flat (destination,
+    AS) positions, senders AS indices; returns the positions settled."""
+    unsettled = length[receivers] == 0
+    receivers = receivers[unsettled]
+    if not receivers.size:
+        return receivers
+    keys = lengths[unsettled].astype(np.int64) * n + senders[unsettled]
+    settled, inverse = np.unique(receivers, return_inverse=True)
+    best = np.full(settled.size, np.iinfo(np.int64).max)
+    np.minimum.at(best, inverse, keys)
+    length[settled] = best // n
+    next_hop[settled] = best % n
+    return settled
+
+
+def _offer(
+        topology: Topology,
+        relation: Relation,
+        length: np.ndarray,
+        next_hop: np.ndarray,
+        senders: np.ndarray,
+) -> np.ndarray:
+    """Offers the routes of the flat positions to the neighbors of the given relation of their ASs."""
+    n = len(topology)
+    offsets, indices = topology.partition(relation)
+    ases = senders % n
+    neighbors, segments = gather(offsets, indices, ases)
+    counts = np.diff(segments)
+    receivers = np.repeat(senders - ases, counts) + neighbors
+    return _settle(length, next_hop, n, receivers, np.repeat(ases, counts),
+                   np.repeat(length[senders] + 1, counts))
+
+
+def routes_to(topology: Topology, targets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Next hop and path length of the route of every AS to each target, by target and AS index."""
+    n = len(topology)
+    targets = np.asarray(targets, dtype=np.int64)
+    length = np.zeros(targets.size * n, dtype=LENGTH_DTYPE)
+    next_hop = np.full(targets.size * n, NO_ROUTE, dtype=INDEX_DTYPE)
+    origins = np.arange(targets.size) * n + targets
+    length[origins] = 1
+
+    # Phase 1: customer to provider
+    uphill = [origins]
+    frontier = origins
+    while frontier.size:
+        frontier = _offer(topology, Relation.PROVIDER, length, next_hop, frontier)
+        uphill.append(frontier)
+
+    # Phase 2: across peers, only routes learned from customers and the destinations' own
+    _offer(topology, Relation.PEER, length, next_hop, np.concatenate(uphill))
+
+    # Phase 3: provider to customer, from every AS with a route, in order of path length
+    settled = np.flatnonzero(length)
+    by_length: Dict[int, List[np.ndarray]] = {}
+    for route_length in np.unique(length[settled]).tolist():
+        by_length[route_length] = [settled[length[settled] == route_length]]
+    route_length = 1
+    while route_length <= max(by_length):
+        frontier = np.concatenate(by_length.get(route_length, [settled[:0]]))
+        settled = _offer(topology, Relation.CUSTOMER, length, next_hop, frontier)
+        if settled.size:
+            by_length.setdefault(route_length + 1, []).append(settled)
+        route_length += 1
+
+    return next_hop.reshape(targets.size, n), length.reshape(targets.size, n)
+
+
+def route_blocks(
+        topology: Topology,
+        targets: Optional[np.ndarray] = None,
+        block_size: int = BLOCK_SIZE,
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Routes to the targets, all ASs by default, as (targets, next hops, path lengths) per block."""
+    if block_size < 1:
+        raise ValueError("block_size must be positive")
+    if targets is None:
+        targets = np.arange(len(topology))
+    for start in range(0, len(targets), block_size):
+        block = targets[start:start + block_size]
+        yield (block,) + routes_to(topology, block)
@@ -0,0 +1,274 @@
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import bgpsecsim.as_graph as as_graph
+import bgpsecsim.experiments as experiments
+from bgpsecsim.as_graph import ASGraph
+from bgpsecsim.asys import AS_ID
+from bgpsecsim.routing_policy import (
+    DefaultPolicy, RPKIPolicy, PathEndValidationPolicy,
+    BGPsecHighSecPolicy, BGPsecMedSecPolicy, BGPsecLowSecPolicy, ASPAPolicy
+)
+from bgpsecsim.topology import Topology
+
+# Timings of the hot paths of the simulator, see the bench command. Every benchmark works on fixed
+# samples of victims and attackers, so records of different commits on the same machine compare.
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'caida-data')
+# The smallest and the largest bundled snapshot
+SNAPSHOTS = [os.path.join(DATA_DIR, '19980101.as-rel.txt'), os.path.join(DATA_DIR, '20141201.as-rel.txt')]
+HISTORY_FILE = os.path.join('.benchmarks', 'history.json')
+# Timed runs of every benchmark; records keep the fastest and the median
+REPEAT = 3
+# Victim and attacker pairs of the per-trial benchmarks
+N_PAIRS = 10
+# Trials of the end-to-end figure2a_experiment benchmarks
+TRIAL_COUNTS = (100,)
+# Slowdown of the fastest run, relative to the previous record, that counts as a regression
+THRESHOLD = 0.1
+# Most routes offered to ASPAPolicy.accept_route per run
+MAX_ASPA_ROUTES = 20000
+
+# Policy of every AS in the hijack_n_hops benchmarks, with the flags the figures deploy it with
+HIJACK_POLICIES = [
+    (DefaultPolicy, ()),
+    (RPKIPolicy, ()),
+    (PathEndValidationPolicy, ()),
+    (BGPsecHighSecPolicy, ('bgp_sec_enabled',)),
+    (BGPsecMedSecPolicy, ('bgp_sec_enabled',)),
+    (BGPsecLowSecPolicy, ('bgp_sec_enabled',)),
+    (ASPAPolicy, ('aspa_enabled',)),
+]
+
+
+class Benchmark(object):
+    """A named timing. prepare runs untimed before every timed run and returns the function to time;
+    that function may return the seconds it timed itself as a float, for benchmarks that set up state
+    between timed steps. Other return values are ignored."""
+    __slots__ = ['name', 'prepare', 'ops']
+
+    name: str
+    prepare: Callable[[], Callable[[], Any]]
+    # Operations per run, e.g. victims routed
+    ops: int
+
+    def __init__(self, name: str, prepare: Callable[[], Callable[[], Any]], ops: int = 1):
+        self.name = name
+        self.prepare = prepare
+        self.ops = ops
+
+    def time(self, repeat: int) -> Dict[str, Any]:
+        times = []
+        for _ in range(repeat):
+            run = self.prepare()
+            start = time.perf_counter()
+            seconds = run()
+            times.append(seconds if isinstance(seconds, float) else time.perf_counter() - start)
+        return {'min': min(times), 'median': statistics.median(times), 'repeat': repeat, 'ops': self.ops}
+
+
+def snapshot_benchmarks(
+        as_rel_file: str,
+        n_pairs: int = N_PAIRS,
+        trial_counts: Sequence[int] = TRIAL_COUNTS
+) -> List[Benchmark]:
+    """Benchmarks on one as-rel file. The topology and graph are built once, when a benchmark first
+    needs them."""
+    snapshot = os.path.basename(as_rel_file).split('.')[0]
+    shared: Dict[str, Any] = {}
+
+    def topology() -> Topology:
+        if 'topology' not in shared:
+            shared['topology'] = as_graph.load_topology(as_rel_file)
+        return shared['topology']
+
+    def graph() -> ASGraph:
+        if 'graph' not in shared:
+            shared['graph'] = ASGraph(topology())
+        return shared['graph']
+
+    def pairs(n: int, seed: int = 0) -> List[Tuple[AS_ID, AS_ID]]:
+        rng = random.Random(seed)
+        as_ids = topology().as_ids()
+        return [tuple(rng.sample(as_ids, 2)) for _ in range(n)]
+
+    def deploy(policy_class: type, flags: Sequence[str] = ()) -> ASGraph:
+        g = graph()
+        g.apply_deployment(policy_class(), **{flag: g.asyss for flag in flags})
+        return g
+
+    def prepare_find_routes_to() -> Callable[[], None]:
+        g = deploy(DefaultPolicy)
+        trials = [(g.get_asys(victim_id), g.get_asys(attacker_id)) for victim_id, attacker_id in pairs(n_pairs)]
+
+        def run() -> None:
+            for victim, attacker in trials:
+                g.start_trial(victim, attacker)
+                g.find_routes_to(victim)
+        return run
+
+    def hijack(policy_class: type, flags: Sequence[str]) -> Benchmark:
+        routes: Dict[Tuple[AS_ID, AS_ID], Any] = {}
+
+        def prepare() -> Callable[[], float]:
+            g = deploy(policy_class, flags)
+            trials = [(g.get_asys(victim_id), g.get_asys(attacker_id)) for victim_id, attacker_id in pairs(n_pairs)]
+            # The legitimate routes are found once, and restored before every timed hijack
+            for victim, attacker in trials:
+                if (victim.as_id, attacker.as_id) not in routes:
+                    g.start_trial(victim, attacker)
+                    g.find_routes_to(victim)
+                    routes[(victim.as_id, attacker.as_id)] = g.routes_to(victim)
+
+            def run() -> float:
+                seconds = 0.0
+                for victim, attacker in trials:
+                    g.restore_routes_to(victim, attacker, routes[(victim.as_id, attacker.as_id)])
+                    start = time.perf_counter()
+                    g.hijack_n_hops(victim, attacker, 1)
+                    seconds += time.perf_counter() - start
+                return seconds
+            return run
+        return Benchmark(f'hijack_n_hops[{snapshot},{policy_class.__name__}]', prepare, n_pairs)
+
+    def prepare_accept_route() -> Callable[[], None]:
+        g = deploy(ASPAPolicy, ('aspa_enabled',))
+        offers = []
+        for victim_id, attacker_id in pairs(n_pairs):
+            victim = g.get_asys(victim_id)
+            g.start_trial(victim, g.get_asys(attacker_id))
+            g.find_routes_to(victim)
+            # Every route as forwarded to every neighbor; views keep the routing state they belong to
+            for asys in g.by_index:
+                route = asys.get_route(victim_id)
+                if route is None:
+                    continue
+                for neighbor in asys.neighbors:
+                    offers.append((neighbor.policy, asys.forward_route(route, neighbor)))
+            if len(offers) >= MAX_ASPA_ROUTES:
+                break
+        del offers[MAX_ASPA_ROUTES:]
+        accept_route.ops = len(offers)
+
+        def run() -> None:
+            for policy, route in offers:
+                policy.accept_route(route)
+        return run
+
+    def prepare_success_rate() -> Callable[[], float]:
+        g = deploy(RPKIPolicy)
+        trials = [(g.get_asys(victim_id), g.get_asys(attacker_id)) for victim_id, attacker_id in pairs(n_pairs)]
+
+        def run() -> float:
+            # Routes in the routing tables, not counted while propagating, so every route is checked
+            seconds = 0.0
+            for victim, attacker in trials:
+                g.clear_routing_tables()
+                g.find_routes_to(victim)
+                g.hijack_n_hops(victim, attacker, 1)
+                start = time.perf_counter()
+                experiments.attacker_success_rate(g, attacker, victim)
+                seconds += time.perf_counter() - start
+            g.clear_routing_tables()
+            return seconds
+        return run
+
+    def figure2a(n_trials: int) -> Benchmark:
+        def prepare() -> Callable[[], None]:
+            g = experiments.graph_for(topology())
+            g.apply_deployment(RPKIPolicy())
+            trials = pairs(n_trials, seed=1)
+            # Workers are started and given the topology before the timed run
+            experiments.figure2a_experiment(g, trials[:1], n_hops=1)
+            return lambda: experiments.figure2a_experiment(g, trials, n_hops=1)
+        return Benchmark(f'figure2a_experiment[{snapshot},{n_trials}]', prepare, n_trials)
+
+    accept_route = Benchmark(f'ASPAPolicy.accept_route[{snapshot}]', prepare_accept_route, MAX_ASPA_ROUTES)
+    return [
+        Benchmark(f'parse_as_rel_file[{snapshot}]', lambda: lambda: as_graph.parse_as_rel_file(as_rel_file)),
+        Benchmark(f'load_topology[{snapshot}]', lambda: lambda: as_graph.load_topology(as_rel_file)),
+        Benchmark(f'ASGraph.__init__[{snapshot}]', lambda: lambda: ASGraph(topology())),
+        Benchmark(f'find_routes_to[{snapshot}]', prepare_find_routes_to, n_pairs),
+    ] + [hijack(policy_class, flags) for policy_class, flags in HIJACK_POLICIES] + [
+        accept_route,
+        Benchmark(f'attacker_success_rate[{snapshot}]', prepare_success_rate, n_pairs),
+    ] + [figure2a(n_trials) for n_trials in trial_counts]
+
+
+def run(
+        benchmarks: List[Benchmark],
+        repeat: int = REPEAT,
+        only: Optional[str] = None,
+        report: Callable[[str, Dict[str, Any]], None] = lambda name, result: None
+) -> Dict[str, Dict[str, Any]]:
+    """Times the benchmarks whose name contains only, all by default, calling report after each."""
+    results = {}
+    for benchmark in benchmarks:
+        if only is not None and only not in benchmark.name:
+            continue
+        results[benchmark.name] = benchmark.time(repeat)
+        report(benchmark.name, results[benchmark.name])
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def record(results: Dict[str, Dict[str, Any]], label: Optional[str] = None) -> Dict[str, Any]:
+    """A history entry of the results, with what they were measured on."""
+    return {
+        'time': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'label': label,
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.node(),
+        'cpus': os.cpu_count(),
+        'results': results,
+    }
+
+
+def load_history(filename: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(filename):
+        return []
+    with open(filename) as f:
+        return json.load(f)
+
+
+def append_history(filename: str, entry: Dict[str, Any]) -> None:
+    """Appends the entry to the history file, replacing the file at once."""
+    history = load_history(filename) + [entry]
+    directory = os.path.dirname(filename) or '.'
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile('w', dir=directory, delete=False) as f:
+        json.dump(history, f, indent=1)
+    os.replace(f.name, filename)
+
+
+def compare(
+        old: Dict[str, Any],
+        new: Dict[str, Any],
+        threshold: float = THRESHOLD
+) -> List[Tuple[str, float, float, bool]]:
+    """(name, old fastest run, new fastest run, regressed) of every benchmark in both entries."""
+    comparison = []
+    for name, result in new['results'].items():
+        if name not in old['results']:
+            continue
+        old_min = old['results'][name]['min']
+        comparison.append((name, old_min, result['min'], result['min'] > old_min * (1 + threshold)))
+    return comparison
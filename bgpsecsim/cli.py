@@ -1,21 +1,36 @@
 import click
 import networkx as nx
+import os
+import numpy as np
 import random
 
 import bgpsecsim.as_graph as as_graph
+import bgpsecsim.batch_propagation as batch_propagation
+import bgpsecsim.benchmark as benchmark
+import bgpsecsim.cluster as cluster
 import bgpsecsim.experiments as experiments
 import bgpsecsim.graphs as graphs
+import bgpsecsim.profiling as profiling
+import bgpsecsim.progress as progress
+import bgpsecsim.propagation as propagation
+import bgpsecsim.reachability as reachability
 import bgpsecsim.routing_policy as routing_policy
+import bgpsecsim.topology_cache as topology_cache
 from bgpsecsim.as_graph import ASGraph
+from bgpsecsim.error import ClusterError, ResultStoreMismatch
 import other.evaluation as eval
 
 @click.group()
-def cli():
-    pass
+@click.option('--cache-dir', envvar='BGPSECSIM_CACHE_DIR', default=topology_cache.CACHE_DIR, show_default=True,
+              help="Directory of the parsed topologies, which are reused while the as-rel file is unchanged.")
+@click.option('--no-cache', is_flag=True, help="Parse as-rel files on every load.")
+def cli(cache_dir, no_cache):
+    topology_cache.CACHE_DIR = None if no_cache else cache_dir
 
 @cli.command()
 @click.argument('as-rel-file')
 def check_graph(as_rel_file):
+    # The connectivity check needs a networkx graph
     nx_graph = as_graph.parse_as_rel_file(as_rel_file)
 
     if not nx.is_connected(nx_graph):
@@ -35,9 +50,9 @@ def check_graph(as_rel_file):
 @click.argument('origin-asn', type=int)
 @click.argument('final-asn', type=int)
 def find_route(as_rel_file, origin_asn, final_asn):
-    nx_graph = as_graph.parse_as_rel_file(as_rel_file)
+    topology = topology_cache.load_topology(as_rel_file)
 
-    graph = ASGraph(nx_graph)
+    graph = ASGraph(topology)
     print("Loaded graph")
 
     origin = graph.get_asys(origin_asn)
@@ -52,9 +67,9 @@ def find_route(as_rel_file, origin_asn, final_asn):
 @click.argument('as-rel-file')
 @click.argument('target-asn', type=int)
 def get_path_lengths(as_rel_file, target_asn):
-    nx_graph = as_graph.parse_as_rel_file(as_rel_file)
+    topology = topology_cache.load_topology(as_rel_file)
 
-    graph = ASGraph(nx_graph, policy=routing_policy.RPKIPolicy())
+    graph = ASGraph(topology, policy=routing_policy.RPKIPolicy())
     print("Loaded graph")
 
     origin_id = int(target_asn)
@@ -82,25 +97,257 @@ def get_path_lengths(as_rel_file, target_asn):
     for path_len, count in sorted(path_lengths.items()):
         print(f"path_length: {path_len}, count: {count}")
 
+@cli.command()
+@click.option('--target', 'targets', type=int, multiple=True, help="ASN of a destination; all ASs by default.")
+@click.option('--per-destination', is_flag=True, help="Print the path lengths to every destination as well.")
+@click.option('--block-size', type=click.IntRange(min=1), default=batch_propagation.BLOCK_SIZE, show_default=True,
+              help="Destinations routed at once, memory grows with it.")
+@click.argument('as-rel-file')
+def path_length_histogram(targets, per_destination, block_size, as_rel_file):
+    """Path lengths of the routes of all ASs to all destinations in the stable routing model, with every AS
+    using the default policy."""
+    topology = topology_cache.load_topology(as_rel_file)
+    print("Loaded graph")
+
+    try:
+        indices = topology.indices_of(np.array(targets)) if targets else None
+    except KeyError:
+        raise click.BadParameter("unknown ASN", param_hint='--target')
+    # Cross-check path routing results with reachability.
+    reachable = reachability.reachable_counts(topology)
+    path_lengths = {}
+    for block, _, lengths in batch_propagation.route_blocks(topology, indices, block_size):
+        for target, row in zip(block.tolist(), lengths):
+            counts = {path_len: count for path_len, count in enumerate(np.bincount(row).tolist()) if count}
+            counts[-1] = counts.pop(0, 0)
+            assert counts[-1] + reachable[target] == len(topology)
+            for path_len, count in counts.items():
+                path_lengths[path_len] = path_lengths.get(path_len, 0) + count
+            if per_destination:
+                print(f"AS {topology.asns[target]}: " + ", ".join(
+                    f"{path_len}: {count}" for path_len, count in sorted(counts.items())))
+
+    for path_len, count in sorted(path_lengths.items()):
+        print(f"path_length: {path_len}, count: {count}")
+
 @cli.command()
 @click.option('-s', '--seed', type=int)
 @click.option('--trials', type=int, default=1)
+@click.option('--model', type=click.Choice(propagation.MODELS), default=propagation.QUEUE,
+              help="Routing model; 'stable' computes the stable valley-free routes instead of simulating BGP, "
+                   "for DefaultPolicy, RPKIPolicy, PathEndValidationPolicy and ASPAPolicy only. Its results "
+                   "differ from those of 'queue', see the README.")
+@click.option('--chunk-size', type=click.IntRange(min=1),
+              help="Trials sent to a worker at a time; by default about four chunks per worker and experiment.")
+@click.option('--ci-width', type=click.FloatRange(min=0, min_open=True),
+              help="Stop every point once the confidence interval of its success rate is at most this wide, in "
+                   "percentage points; --trials is then the most trials per point.")
+@click.option('--ci-batch', type=click.IntRange(min=2), default=experiments.CI_BATCH, show_default=True,
+              help="Trials run between two checks of the confidence interval.")
+@click.option('--confidence', type=click.FloatRange(0, 1, min_open=True, max_open=True),
+              default=experiments.CONFIDENCE, show_default=True, help="Confidence level of the interval.")
+@click.option('--resume', is_flag=True,
+              help="Continue the run in the figure's result store (OUTPUT_FILE.results), for figures with one; needs --seed.")
+@click.option('--coordinator', 'address', metavar='ADDRESS',
+              help="Run the trials on workers connecting to ADDRESS, HOST:PORT or the path of a Unix socket, "
+                   "instead of local processes.")
+@click.option('--authkey', envvar='BGPSECSIM_AUTHKEY', help="Key shared by the coordinator and its workers.")
+@click.option('--profile', is_flag=True,
+              help="Time the stages of every experiment line and count the routes propagated, per worker, into "
+                   "OUTPUT_FILE.profile.json.")
+@click.option('--cprofile-dir', metavar='DIR',
+              help="With --profile, also dump the cProfile statistics of every worker to DIR.")
+@click.option('--progress-interval', type=click.FloatRange(min=0, min_open=True), default=progress.INTERVAL,
+              show_default=True, help="Seconds between two progress reports.")
+@click.option('--no-progress', is_flag=True, help="Do not print the progress, throughput and ETA.")
+@click.option('--status-file', metavar='FILE',
+              help="Also write the progress to FILE, in the Prometheus text format, e.g. for the node exporter.")
 @click.argument('figure')
 @click.argument('as-rel-file')
 @click.argument('output-file')
-def generate(seed, trials, figure, as_rel_file, output_file):
+def generate(seed, trials, model, chunk_size, ci_width, ci_batch, confidence, resume, address, authkey, profile,
+             cprofile_dir, progress_interval, no_progress, status_file, figure, as_rel_file, output_file):
+    import contextlib
     import sys
+    import time
     sys.setrecursionlimit(100000)
+    start = time.perf_counter()
+
+    if resume and seed is None:
+        raise click.UsageError("--resume needs --seed, an unseeded run can not be continued")
+    if cprofile_dir is not None and not profile:
+        raise click.UsageError("--cprofile-dir needs --profile")
+    if profile and address is not None:
+        raise click.UsageError("--profile only profiles local workers, not with --coordinator")
 
     if seed is not None:
         random.seed(seed)
+    experiments.MODEL = model
+    experiments.CHUNK_SIZE = chunk_size
+    experiments.CI_WIDTH = ci_width
+    experiments.CI_BATCH = ci_batch
+    experiments.CONFIDENCE = confidence
+    experiments.SEED = seed
+    graphs.RESUME = resume
+    profiling.ENABLED = profile
+    profiling.CPROFILE_DIR = cprofile_dir
 
-    nx_graph = as_graph.parse_as_rel_file(as_rel_file)
+    topology = topology_cache.load_topology(as_rel_file)
     print("Loaded graph")
 
     func = getattr(graphs, figure)
-    func(output_file, nx_graph, trials)
+    if address is None:
+        # One pool of workers for all experiments of the figure
+        pool = experiments.worker_pool()
+    else:
+        if not authkey:
+            raise click.UsageError("--coordinator needs --authkey or BGPSECSIM_AUTHKEY")
+        try:
+            pool = cluster.coordinator(cluster.parse_address(address), authkey.encode(), topology, chunk_size)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint='--coordinator')
+        print(f"Waiting for workers on {address}")
+    if no_progress and status_file is None:
+        reporting = contextlib.nullcontext()
+    else:
+        reporting = progress.reporting(progress_interval, status_file, None if no_progress else sys.stderr)
+    with pool as p, reporting:
+        try:
+            func(output_file, topology, trials)
+        except ResultStoreMismatch as e:
+            raise click.ClickException(f"{e.filename}: {e.message}")
+        except ClusterError as e:
+            raise click.ClickException(e.message)
+        if profile:
+            worker_profiles = p.profiles()
+
+    if profile:
+        profiling.write_report(output_file + '.profile.json', profiling.report(
+            profiling.PROFILE, worker_profiles, time.perf_counter() - start))
+        print(f"Profile of {len(worker_profiles)} workers written to {output_file}.profile.json")
+
+    if ci_width is not None:
+        # Trials and interval of every point, in the order the figure ran them
+        with open(output_file + '.points.csv', 'w') as f:
+            f.write("point,trials,success_rate,ci_low,ci_high\n")
+            for i, point in enumerate(experiments.POINTS):
+                f.write(f"{i},{point.n_trials},{point.mean},{point.mean - point.half_width},"
+                        f"{point.mean + point.half_width}\n")
+                print(f"  {point}")
+        print(f"{len(experiments.POINTS)} points, {sum(point.n_trials for point in experiments.POINTS)} trials")
+    if experiments.N_SKIPPED:
+        print(f"{experiments.N_SKIPPED} trials skipped and counted as 0%, their victim or attacker is not in the topology")
+
+@cli.command()
+@click.option('--connect', 'address', metavar='ADDRESS', required=True,
+              help="Address of the coordinator, HOST:PORT or the path of a Unix socket.")
+@click.option('--authkey', envvar='BGPSECSIM_AUTHKEY', required=True, help="Key shared by the coordinator and its workers.")
+@click.option('--processes', type=click.IntRange(min=1), default=experiments.PARALLELISM, show_default=True,
+              help="Local processes running the trials.")
+@click.option('--connect-timeout', type=float, default=cluster.CONNECT_TIMEOUT, show_default=True,
+              help="Seconds to keep trying to reach a coordinator that is not listening yet.")
+@click.argument('as-rel-file')
+def worker(address, authkey, processes, connect_timeout, as_rel_file):
+    """Runs trials for a generate --coordinator, on the topology of its own copy of the as-rel file."""
+    import sys
+    sys.setrecursionlimit(100000)
+
+    try:
+        address = cluster.parse_address(address)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--connect')
+    topology = topology_cache.load_topology(as_rel_file)
+    try:
+        n_chunks = cluster.run_worker(address, authkey.encode(), topology, processes, connect_timeout)
+    except ClusterError as e:
+        raise click.ClickException(e.message)
+    except OSError as e:
+        raise click.ClickException(str(e))
+    print(f"Ran {n_chunks} chunks")
+
+
+@cli.group()
+def cache():
+    """Builds, lists and prunes the cached topologies."""
+    if topology_cache.CACHE_DIR is None:
+        raise click.UsageError("the topology cache is disabled")
+
+@cache.command('build')
+@click.argument('as-rel-files', nargs=-1, required=True)
+def cache_build(as_rel_files):
+    for as_rel_file in as_rel_files:
+        entry = topology_cache.build(as_rel_file, topology_cache.CACHE_DIR)
+        print(f"{as_rel_file}: {entry.key}")
+
+@cache.command('list')
+def cache_list():
+    for entry in topology_cache.entries(topology_cache.CACHE_DIR):
+        print(f"{entry.key[:16]}  {entry.status():<15}  {entry.meta.get('n_ases', '?'):>7} ASs  "
+              f"{entry.size() / 1e6:8.1f} MB  {entry.meta.get('source', '?')}")
+
+@cache.command('prune')
+@click.option('--all', 'everything', is_flag=True, help="Remove all entries, not only those no longer in use.")
+def cache_prune(everything):
+    for entry in topology_cache.prune(topology_cache.CACHE_DIR, everything):
+        print(f"Removed {entry.key[:16]} ({entry.meta.get('source', '?')})")
+
+@cli.command()
+@click.option('--snapshot', 'snapshots', multiple=True,
+              help="as-rel file to time; by default the 1998 and 2014 CAIDA snapshots.")
+@click.option('--only', help="Run only the benchmarks whose name contains this text.")
+@click.option('--repeat', type=click.IntRange(min=1), default=benchmark.REPEAT, show_default=True,
+              help="Timed runs of every benchmark.")
+@click.option('--pairs', type=click.IntRange(min=1), default=benchmark.N_PAIRS, show_default=True,
+              help="Victim and attacker pairs of the per-trial benchmarks.")
+@click.option('--trials', 'trial_counts', type=click.IntRange(min=1), multiple=True,
+              default=benchmark.TRIAL_COUNTS, show_default=True,
+              help="Trials of an end-to-end figure2a_experiment benchmark; may be given more than once.")
+@click.option('--workers', type=click.IntRange(min=1), help="Worker processes; by default one per CPU.")
+@click.option('--history', default=benchmark.HISTORY_FILE, show_default=True,
+              help="JSON file the results are appended to.")
+@click.option('--label', help="Name of the record in the history, e.g. the change being measured.")
+@click.option('--threshold', type=float, default=benchmark.THRESHOLD, show_default=True,
+              help="Slowdown of the fastest run, relative to the previous record, reported as a regression.")
+@click.option('--compare-only', is_flag=True, help="Compare the last two records of the history without running.")
+@click.option('--fail-on-regression', is_flag=True, help="Exit with status 1 if any benchmark regressed.")
+def bench(snapshots, only, repeat, pairs, trial_counts, workers, history, label, threshold, compare_only,
+          fail_on_regression):
+    """Times the hot paths of the simulator on CAIDA snapshots and compares with the last record."""
+    import sys
+    sys.setrecursionlimit(100000)
+
+    records = benchmark.load_history(history)
+    if compare_only:
+        if len(records) < 2:
+            raise click.ClickException(f"{history} has fewer than two records")
+        previous, current = records[-2:]
+    else:
+        def report(name, result):
+            print(f"{name:<60} {result['min'] * 1000:10.2f} ms  (median {result['median'] * 1000:.2f} ms, "
+                  f"{result['ops']} ops)")
+
+        results = {}
+        with experiments.worker_pool(workers or os.cpu_count()):
+            for snapshot in snapshots or benchmark.SNAPSHOTS:
+                results.update(benchmark.run(benchmark.snapshot_benchmarks(snapshot, pairs, trial_counts), repeat,
+                                             only, report))
+        current = benchmark.record(results, label)
+        previous = records[-1] if records else None
+        benchmark.append_history(history, current)
+        print(f"Appended to {history}")
 
+    if previous is None:
+        return
+    print(f"Compared with {previous.get('label') or previous['time']} ({previous.get('commit')}):")
+    regressions = 0
+    for name, old, new, regressed in benchmark.compare(previous, current, threshold):
+        regressions += regressed
+        print(f"{name:<60} {old * 1000:10.2f} -> {new * 1000:10.2f} ms  {new / old - 1:+7.1%}"
+              f"{'  REGRESSION' if regressed else ''}")
+    if regressions:
+        print(f"{regressions} regressions beyond {threshold:.0%}")
+        if fail_on_regression:
+            sys.exit(1)
 
 @cli.command()
 @click.argument('input-file')
@@ -0,0 +1,321 @@
+import collections
+import contextlib
+import math
+import multiprocessing as mp
+from multiprocessing.connection import Client, Connection, Listener, wait
+import numpy as np
+import queue
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Deque, Generator, List, Optional, Tuple, Union
+
+import bgpsecsim.experiments as experiments
+from bgpsecsim.as_graph import ASGraph
+from bgpsecsim.deployment import Deployment
+from bgpsecsim.error import ClusterError
+from bgpsecsim.topology import Topology
+
+# Runs the trials of figure2a_experiment on workers on other machines. The coordinator takes the
+# place of the WorkerPool of the generate command: every batch of trials is cut into chunks like a
+# WorkerPool does, and the chunks are handed out to the connected workers one at a time. Every
+# worker loads the topology from its own copy of the as-rel file, is only accepted if the digest of
+# its topology matches, and runs its chunks on a local WorkerPool. The chunk of a worker that
+# disconnects is handed out again, and the route counts of every trial are written at its id, so
+# results are those of a single machine.
+#
+# Messages are pickled tuples over multiprocessing connections, TCP or Unix sockets, authenticated
+# with a shared key:
+#   worker -> coordinator  (HELLO, topology digest, processes), then (DONE | ERROR, batch, chunk, counts | traceback)
+#   coordinator -> worker  (WELCOME, topology digest) or (REJECT, reason), then (BATCH, batch, deployment, args),
+#                          (CHUNK, batch, chunk, trials) and (STOP,)
+
+HELLO = 'hello'
+WELCOME = 'welcome'
+REJECT = 'reject'
+BATCH = 'batch'
+CHUNK = 'chunk'
+DONE = 'done'
+ERROR = 'error'
+STOP = 'stop'
+
+# Seconds a new connection has to send its HELLO
+HELLO_TIMEOUT = 10.0
+# Seconds between two checks of the coordinator for new workers while it waits for results
+POLL_INTERVAL = 0.5
+# Seconds a worker keeps trying to reach a coordinator that is not listening yet
+CONNECT_TIMEOUT = 60.0
+CONNECT_RETRY = 1.0
+
+Address = Union[str, Tuple[str, int]]
+
+
+def parse_address(address: str) -> Address:
+    """HOST:PORT as a TCP address; anything else, like a path, as a Unix socket."""
+    host, sep, port = address.rpartition(':')
+    if not sep or '/' in address:
+        return address
+    if not port.isdigit():
+        raise ValueError(f"invalid port in {address!r}")
+    return (host or 'localhost', int(port))
+
+
+class RemoteWorker(object):
+    __slots__ = ['conn', 'n_processes', 'batch_id', 'chunk']
+
+    conn: Connection
+    n_processes: int
+    # Batch whose deployment the worker has
+    batch_id: int
+    # Chunk of the current batch the worker is running
+    chunk: Optional[int]
+
+    def __init__(self, conn: Connection, n_processes: int):
+        self.conn = conn
+        self.n_processes = n_processes
+        self.batch_id = 0
+        self.chunk = None
+
+
+class Coordinator(object):
+    """Hands out the trials of every batch to the remote workers that connect to its address, see
+    run_worker. Takes the place of a WorkerPool as experiments.POOL."""
+    __slots__ = ['listener', 'topology_digest', 'chunk_size', 'workers', 'joined', 'batch_id', 'batch', 'closed',
+                 'n_done']
+
+    listener: Listener
+    topology_digest: str
+    # Trials per chunk, None for about four chunks per process of the connected workers
+    chunk_size: Optional[int]
+    workers: List[RemoteWorker]
+    # Workers accepted by the listening thread and not yet in workers
+    joined: 'queue.Queue[RemoteWorker]'
+    batch_id: int
+    # BATCH message of the current batch, sent to every worker before its first chunk
+    batch: Optional[Tuple]
+    closed: bool
+    # Trials of the chunks done so far
+    n_done: int
+
+    def __init__(self, address: Address, authkey: bytes, topology_digest: str, chunk_size: Optional[int] = None):
+        if chunk_size is not None and chunk_size < 1:
+            raise ValueError("chunk size must be positive")
+        self.listener = Listener(address, authkey=authkey)
+        self.topology_digest = topology_digest
+        self.chunk_size = chunk_size
+        self.workers = []
+        self.joined = queue.Queue()
+        self.batch_id = 0
+        self.batch = None
+        self.closed = False
+        self.n_done = 0
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    @property
+    def address(self) -> Address:
+        return self.listener.address
+
+    def trials_done(self) -> int:
+        """Trials done by the workers so far, like WorkerPool.trials_done, counted by chunk."""
+        return self.n_done
+
+    def _accept(self) -> None:
+        while not self.closed:
+            try:
+                conn = self.listener.accept()
+            except mp.AuthenticationError:
+                continue
+            except OSError:
+                if self.closed:
+                    return
+                continue
+            try:
+                if not conn.poll(HELLO_TIMEOUT):
+                    raise ValueError("no hello")
+                kind, digest, n_processes = conn.recv()
+                if kind != HELLO:
+                    raise ValueError(f"unexpected {kind!r} message")
+                if digest != self.topology_digest:
+                    conn.send((REJECT, f"topology {digest[:16]} differs from the coordinator's "
+                                       f"{self.topology_digest[:16]}"))
+                    raise ValueError("different topology")
+                conn.send((WELCOME, self.topology_digest))
+            except (OSError, EOFError, ValueError, TypeError):
+                conn.close()
+                continue
+            self.joined.put(RemoteWorker(conn, max(1, int(n_processes))))
+
+    def _add_joined(self, block: bool = True) -> None:
+        """Adds the workers that joined; with block, waits for one if there are none."""
+        while True:
+            try:
+                worker = self.joined.get(block=block and not self.workers)
+            except queue.Empty:
+                return
+            self.workers.append(worker)
+
+    def _lost(self, worker: RemoteWorker, pending: Deque[int]) -> None:
+        self.workers.remove(worker)
+        worker.conn.close()
+        if worker.chunk is not None:
+            pending.appendleft(worker.chunk)
+        print(f"Lost a worker, {len(self.workers)} left", file=sys.stderr)
+
+    def run(
+            self,
+            graph: ASGraph,
+            trials: List,
+            *args,
+            label: Optional[str] = None,
+            same_batch: bool = False
+    ) -> np.ndarray:
+        """Runs the trials on the workers with the deployment of the graph, like WorkerPool.run;
+        with same_batch, workers that have the previous batch keep it. Remote workers are not
+        profiled, so the label is ignored."""
+        if graph.topology.digest() != self.topology_digest:
+            raise ClusterError("the workers have a different topology")
+        if not same_batch or self.batch is None:
+            self.batch_id += 1
+            self.batch = (BATCH, self.batch_id, Deployment.of(graph), args)
+        batch = self.batch
+        counts = np.zeros((len(trials), 2), dtype=experiments.COUNTS_DTYPE)
+
+        self._add_joined()
+        n_processes = sum(worker.n_processes for worker in self.workers)
+        chunk_size = self.chunk_size or max(1, math.ceil(len(trials) / (4 * n_processes)))
+        chunks = experiments.victim_chunks(trials, chunk_size, experiments.Figure2aExperiment.trial_victim)
+        pending = collections.deque(range(len(chunks)))
+        done = [False] * len(chunks)
+        n_left = len(chunks)
+        while n_left:
+            self._add_joined()
+            for worker in list(self.workers):
+                if worker.chunk is not None or not pending:
+                    continue
+                worker.chunk = pending.popleft()
+                try:
+                    if worker.batch_id != self.batch_id:
+                        worker.conn.send(batch)
+                        worker.batch_id = self.batch_id
+                    worker.conn.send((CHUNK, self.batch_id, worker.chunk,
+                                      [trials[trial_id] for trial_id in chunks[worker.chunk]]))
+                except OSError:
+                    self._lost(worker, pending)
+
+            ready = wait([worker.conn for worker in self.workers], timeout=POLL_INTERVAL)
+            for worker in [worker for worker in self.workers if worker.conn in ready]:
+                try:
+                    kind, batch_id, chunk, result = worker.conn.recv()
+                except (EOFError, OSError):
+                    self._lost(worker, pending)
+                    continue
+                if kind == ERROR:
+                    raise ClusterError(f"a worker failed:\n{result}")
+                worker.chunk = None
+                if batch_id == self.batch_id and not done[chunk]:
+                    counts[chunks[chunk]] = result
+                    done[chunk] = True
+                    n_left -= 1
+                    self.n_done += len(chunks[chunk])
+        return counts
+
+    def close(self) -> None:
+        self.closed = True
+        self.listener.close()
+        self._add_joined(block=False)
+        for worker in self.workers:
+            try:
+                worker.conn.send((STOP,))
+            except OSError:
+                pass
+            worker.conn.close()
+        self.workers = []
+
+
+@contextlib.contextmanager
+def coordinator(
+        address: Address,
+        authkey: bytes,
+        topology: Topology,
+        chunk_size: Optional[int] = None
+) -> Generator[Coordinator, None, None]:
+    """Runs all experiments in the block on the workers connecting to the address, like
+    experiments.worker_pool does on local processes."""
+    coord = Coordinator(address, authkey, topology.digest(), chunk_size)
+    previous, experiments.POOL = experiments.POOL, coord
+    try:
+        yield coord
+    finally:
+        experiments.POOL = previous
+        coord.close()
+
+
+def connect(address: Address, authkey: bytes, timeout: float = CONNECT_TIMEOUT) -> Connection:
+    """Connects to a coordinator, waiting up to timeout seconds for it to listen."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return Client(address, authkey=authkey)
+        except mp.AuthenticationError:
+            raise ClusterError("the coordinator has a different key")
+        except (ConnectionRefusedError, FileNotFoundError):
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(CONNECT_RETRY)
+
+
+def run_worker(
+        address: Address,
+        authkey: bytes,
+        topology: Topology,
+        n_processes: int,
+        connect_timeout: float = CONNECT_TIMEOUT
+) -> int:
+    """Runs the chunks a coordinator hands out on a WorkerPool of n_processes, until the coordinator
+    stops or disappears. Returns the number of chunks run."""
+    conn = connect(address, authkey, connect_timeout)
+    digest = topology.digest()
+    try:
+        conn.send((HELLO, digest, n_processes))
+        reply = conn.recv()
+        if reply[0] == REJECT:
+            raise ClusterError(f"rejected by the coordinator: {reply[1]}")
+        if reply[1] != digest:
+            raise ClusterError("the coordinator has a different topology")
+
+        graph = ASGraph(topology)
+        args: Tuple[Any, ...] = ()
+        # Whether the next chunk is the first of its batch, so the local workers need its deployment
+        new_batch = True
+        n_chunks = 0
+        pool = experiments.WorkerPool(n_processes, chunk_size=experiments.CHUNK_SIZE)
+        try:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    break
+                kind = message[0]
+                if kind == STOP:
+                    break
+                if kind == BATCH:
+                    _, _, deployment, args = message
+                    deployment.apply(graph)
+                    new_batch = True
+                    continue
+
+                _, batch_id, chunk, trials = message
+                try:
+                    counts = pool.run(graph, trials, *args, same_batch=not new_batch)
+                    new_batch = False
+                except Exception:
+                    conn.send((ERROR, batch_id, chunk, traceback.format_exc()))
+                    raise
+                conn.send((DONE, batch_id, chunk, counts))
+                n_chunks += 1
+        finally:
+            pool.close()
+        return n_chunks
+    finally:
+        conn.close()
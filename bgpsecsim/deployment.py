@@ -0,0 +1,153 @@
+import hashlib
+import numpy as np
+import pickle
+from typing import Any, Dict, Iterable, List, Tuple, TYPE_CHECKING
+
+from bgpsecsim.asys import AS_ID, RoutingPolicy
+from bgpsecsim.routing_policy import (
+    AUTHENTICATED, ASPAPolicy, BGPsecHighSecPolicy, BGPsecLowSecPolicy, BGPsecMedSecPolicy, DefaultPolicy,
+    PathEndValidationPolicy, RPKIPolicy
+)
+from bgpsecsim.topology import ASN_DTYPE, INDEX_DTYPE, Topology
+
+if TYPE_CHECKING:
+    from bgpsecsim.as_graph import ASGraph
+
+# Security flags of an AS, all False by default
+FLAGS = ('publishes_rpki', 'publishes_path_end', 'bgp_sec_enabled', 'aspa_enabled')
+
+# Policies that only differ from DefaultPolicy in rejecting origin or path-end invalid routes, and in
+# their preference
+_VALIDATING_POLICIES = (
+    DefaultPolicy, RPKIPolicy, PathEndValidationPolicy, BGPsecHighSecPolicy, BGPsecMedSecPolicy,
+    BGPsecLowSecPolicy
+)
+
+
+def _legitimate_behaviour(policy: RoutingPolicy) -> Any:
+    """What decides how the policy treats routes originated by their destination, which are never
+    origin or path-end invalid."""
+    if type(policy) in _VALIDATING_POLICIES:
+        return ('default', policy.preference)
+    if type(policy) is ASPAPolicy:
+        return ('aspa', policy.preference)
+    return ('other', pickle.dumps(policy))
+
+
+class Deployment(object):
+    """Policies, security flags and routing model of the ASs of a graph, without the graph.
+
+    A deployment is small compared to its graph: it holds the policy most ASs use, the other
+    policies with the indices of the ASs using them, and the indices of the ASs with each flag set.
+    Workers that hold a graph of the same topology apply deployments instead of receiving graphs.
+    """
+    __slots__ = ['model', 'policy', 'overrides'] + list(FLAGS)
+
+    model: str
+    # Policy of every AS not listed in overrides
+    policy: RoutingPolicy
+    # Other policies, each with the sorted indices of the ASs using it
+    overrides: List[Tuple[RoutingPolicy, np.ndarray]]
+    # Sorted indices of the ASs with the flag set
+    publishes_rpki: np.ndarray
+    publishes_path_end: np.ndarray
+    bgp_sec_enabled: np.ndarray
+    aspa_enabled: np.ndarray
+
+    @classmethod
+    def create(
+            cls,
+            topology: Topology,
+            model: str,
+            policy: RoutingPolicy,
+            overrides: Iterable[Tuple[RoutingPolicy, Iterable[AS_ID]]] = (),
+            **flags: Iterable[AS_ID],
+    ) -> 'Deployment':
+        """Describes a deployment by AS numbers: the ASs listed in overrides use the policy they are
+        listed with, the last one if listed more than once, and the ASs listed for a flag have it set."""
+        unknown = set(flags) - set(FLAGS)
+        if unknown:
+            raise ValueError(f"unknown flags: {', '.join(sorted(unknown))}")
+        deployment = cls.__new__(cls)
+        deployment.model = model
+        deployment.policy = policy
+        # Every AS is kept in the last override listing it only
+        deployment.overrides = []
+        listed = np.zeros(0, dtype=INDEX_DTYPE)
+        for override, as_ids in reversed(list(overrides)):
+            indices = np.setdiff1d(cls._indices(topology, as_ids), listed)
+            deployment.overrides.insert(0, (override, indices))
+            listed = np.union1d(listed, indices)
+        for flag in FLAGS:
+            setattr(deployment, flag, cls._indices(topology, flags.get(flag, ())))
+        return deployment
+
+    @staticmethod
+    def _indices(topology: Topology, as_ids: Iterable[AS_ID]) -> np.ndarray:
+        return np.unique(topology.indices_of(np.fromiter(as_ids, dtype=ASN_DTYPE)))
+
+    @classmethod
+    def of(cls, graph: 'ASGraph') -> 'Deployment':
+        """Captures the current deployment of a graph."""
+        deployment = cls.__new__(cls)
+        deployment.model = graph.model
+
+        by_policy = {}
+        for asys in graph.by_index:
+            by_policy.setdefault(id(asys.policy), (asys.policy, []))[1].append(asys.index)
+        groups = sorted(by_policy.values(), key=lambda group: len(group[1]), reverse=True)
+        deployment.policy = groups[0][0]
+        deployment.overrides = [(policy, np.array(indices, dtype=INDEX_DTYPE)) for policy, indices in groups[1:]]
+
+        for flag in FLAGS:
+            indices = [asys.index for asys in graph.by_index if getattr(asys, flag)]
+            setattr(deployment, flag, np.array(indices, dtype=INDEX_DTYPE))
+        return deployment
+
+    def apply(self, graph: 'ASGraph') -> None:
+        """Sets policies, flags and routing model of a graph of the same topology. Routing tables are kept."""
+        by_index = graph.by_index
+        for asys in by_index:
+            asys.policy = self.policy
+            asys.publishes_rpki = False
+            asys.publishes_path_end = False
+            asys.bgp_sec_enabled = False
+            asys.aspa_enabled = False
+        for policy, indices in self.overrides:
+            for index in indices.tolist():
+                by_index[index].policy = policy
+        for flag in FLAGS:
+            for index in getattr(self, flag).tolist():
+                setattr(by_index[index], flag, True)
+        graph.model = self.model
+
+    def routing_key(self) -> str:
+        """Digest of what decides the routes to a destination before any attack: the model, the
+        policies as far as they treat legitimate routes, the ASPA flags if an AS uses ASPA and the
+        BGPsec flags if an AS prefers authenticated routes. Deployments with equal keys lead to the
+        same routes."""
+        behaviours: Dict[Any, List[np.ndarray]] = {}
+        default = _legitimate_behaviour(self.policy)
+        for policy, indices in self.overrides:
+            behaviour = _legitimate_behaviour(policy)
+            if behaviour != default and len(indices):
+                behaviours.setdefault(behaviour, []).append(indices)
+        used = [default] + list(behaviours)
+
+        sha = hashlib.sha256()
+        sha.update(repr((self.model, default)).encode())
+        for behaviour in sorted(behaviours, key=repr):
+            sha.update(repr(behaviour).encode())
+            sha.update(np.unique(np.concatenate(behaviours[behaviour])).astype(INDEX_DTYPE).tobytes())
+        opaque = any(kind == 'other' for kind, _ in used)
+        flags = []
+        if opaque or any(kind == 'aspa' for kind, _ in used):
+            flags.append('aspa_enabled')
+        if opaque or any(kind != 'other' and AUTHENTICATED in preference for kind, preference in used):
+            flags.append('bgp_sec_enabled')
+        if opaque:
+            flags += ['publishes_rpki', 'publishes_path_end']
+        for flag in flags:
+            sha.update(flag.encode())
+            sha.update(getattr(self, flag).astype(INDEX_DTYPE).tobytes())
+        return sha.hexdigest()
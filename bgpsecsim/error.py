@@ -6,3 +6,16 @@ class InvalidASRelFile(Exception):
 class NoRouteError(Exception):
     def __init__(self, message: str):
         self.message = message
+
+class ResultStoreMismatch(Exception):
+    def __init__(self, filename: str, message: str):
+        self.filename = filename
+        self.message = message
+
+class ClusterError(Exception):
+    def __init__(self, message: str):
+        self.message = message
+
+class StaleRouteError(Exception):
+    def __init__(self, message: str):
+        self.message = message
@@ -1,120 +1,175 @@
 import abc
-from fractions import Fraction
+import cProfile
+from collections import OrderedDict
+import contextlib
+import ctypes
+import hashlib
+import math
 import multiprocessing as mp
+from multiprocessing import resource_tracker, shared_memory
 import multiprocessing.synchronize as mpsync
-import networkx as nx
+import numpy as np
+import pickle
 import random
 import signal
+import statistics
+import sys
+import time
 import warnings
-from typing import List, Tuple
+from typing import Any, Callable, Dict, Generator, Iterable, List, Optional, Tuple, Type, Union
 
+import bgpsecsim.profiling as profiling
+import bgpsecsim.progress as progress
+import bgpsecsim.propagation as propagation
 from bgpsecsim.asys import AS, AS_ID
 from bgpsecsim.as_graph import ASGraph
+from bgpsecsim.deployment import Deployment
 from bgpsecsim.routing_policy import (
     DefaultPolicy, RPKIPolicy, PathEndValidationPolicy,
     BGPsecHighSecPolicy, BGPsecMedSecPolicy, BGPsecLowSecPolicy, ASPAPolicy
 )
+from bgpsecsim.routing_state import RoutingState
+from bgpsecsim.topology import Topology
 
 PARALLELISM = 100
+# Routing model of the graphs built by the experiments, see bgpsecsim.propagation
+MODEL = propagation.QUEUE
+# Trials per task sent to a worker; None sends every worker about four tasks per batch
+CHUNK_SIZE: Optional[int] = None
+# Pool of the innermost open worker_pool block
+POOL: Optional['WorkerPool'] = None
+# Graph of the topology of the last experiment, see graph_for
+GRAPH: Optional[ASGraph] = None
+# Victims whose routes each worker keeps for trials with the same victim and routing decisions, see
+# Deployment.routing_key; 0 finds the routes again for every trial
+ROUTES_CACHE_SIZE = 8
+# Seed of the run. Every trial of figure2a_experiment draws from its own generator, seeded from the
+# seed, the id of the experiment and the index of the trial, so results do not depend on which
+# worker runs a trial. None seeds every experiment from the global random generator.
+SEED: Optional[int] = None
+# Id of the next figure2a_experiment call; calls are numbered in the order a figure makes them
+EXPERIMENT_ID = 0
+# Sequential sampling: with a width, every figure2a_experiment call runs its trials in batches of
+# CI_BATCH and stops once the CONFIDENCE interval of the mean success rate, in percentage points,
+# is at most CI_WIDTH wide, or its trials run out. None runs every trial.
+CI_WIDTH: Optional[float] = None
+CI_BATCH = 100
+CONFIDENCE = 0.95
+# Estimates of the figure2a_experiment calls in sequential sampling, in order
+POINTS: List['Point'] = []
+# Route counts of a trial whose victim or attacker is not in the topology. Such trials are skipped
+# and count as a success rate of 0%; N_SKIPPED counts them.
+SKIPPED_COUNTS = (0, -1)
+N_SKIPPED = 0
+
+def graph_for(topology: Topology) -> ASGraph:
+    """The graph of the topology, which all experiments on it reuse: each sets its deployment with
+    ASGraph.apply_deployment."""
+    global GRAPH
+    if GRAPH is None or GRAPH.topology is not topology:
+        start = time.perf_counter()
+        GRAPH = ASGraph(topology, model=MODEL)
+        if profiling.ENABLED:
+            profiling.PROFILE.line(sys._getframe(1).f_code.co_name).stages['graph_build'] += \
+                time.perf_counter() - start
+    GRAPH.model = MODEL
+    return GRAPH
+
+def as_ids(asyss: Iterable[AS]) -> List[AS_ID]:
+    return [asys.as_id for asys in asyss]
 
 def figure2a_line_1_next_as(
-        nx_graph: nx.Graph,
+        topology: Topology,
         deployment: int,
         trials: List[Tuple[AS_ID, AS_ID]]
-) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=RPKIPolicy())
-    for asys in graph.identify_top_isps(deployment):
-        asys.policy = PathEndValidationPolicy()
+) -> List[float]:
+    graph = graph_for(topology)
+    graph.apply_deployment(RPKIPolicy(), [(PathEndValidationPolicy(), as_ids(graph.identify_top_isps(deployment)))])
     return figure2a_experiment(graph, trials, n_hops=1)
 
 def figure2a_line_2_bgpsec_partial(
-        nx_graph: nx.Graph,
+        topology: Topology,
         deployment: int,
         trials: List[Tuple[AS_ID, AS_ID]]
-) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=RPKIPolicy())
-    for asys in graph.identify_top_isps(deployment):
-        asys.policy = BGPsecMedSecPolicy()
+) -> List[float]:
+    graph = graph_for(topology)
+    graph.apply_deployment(RPKIPolicy(), [(BGPsecMedSecPolicy(), as_ids(graph.identify_top_isps(deployment)))])
     return figure2a_experiment(graph, trials, n_hops=1)
 
 def figure2a_line_3_two_hop(
-        nx_graph: nx.Graph,
+        topology: Topology,
         trials: List[Tuple[AS_ID, AS_ID]]
-) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=PathEndValidationPolicy())
+) -> List[float]:
+    graph = graph_for(topology)
+    graph.apply_deployment(PathEndValidationPolicy())
     return figure2a_experiment(graph, trials, n_hops=2)
 
 def figure2a_line_4_rpki(
-        nx_graph: nx.Graph,
+        topology: Topology,
         trials: List[Tuple[AS_ID, AS_ID]]
-) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=RPKIPolicy())
+) -> List[float]:
+    graph = graph_for(topology)
+    graph.apply_deployment(RPKIPolicy())
     return figure2a_experiment(graph, trials, n_hops=1)
 
 def figure2a_line_5_bgpsec_low_full(
-        nx_graph: nx.Graph,
+        topology: Topology,
         trials: List[Tuple[AS_ID, AS_ID]]
-) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=BGPsecLowSecPolicy())
-    for asys in graph.asyss.values():
-        asys.bgp_sec_enabled = True
+) -> List[float]:
+    graph = graph_for(topology)
+    graph.apply_deployment(BGPsecLowSecPolicy(), bgp_sec_enabled=graph.asyss)
     return figure2a_experiment(graph, trials, n_hops=1)
 
 def figure2a_line_5_bgpsec_med_full(
-        nx_graph: nx.Graph,
+        topology: Topology,
         trials: List[Tuple[AS_ID, AS_ID]]
-) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=BGPsecMedSecPolicy())
-    for asys in graph.asyss.values():
-        asys.bgp_sec_enabled = True
+) -> List[float]:
+    graph = graph_for(topology)
+    graph.apply_deployment(BGPsecMedSecPolicy(), bgp_sec_enabled=graph.asyss)
     return figure2a_experiment(graph, trials, n_hops=1)
 
 def figure2a_line_5_bgpsec_high_full(
-        nx_graph: nx.Graph,
+        topology: Topology,
         trials: List[Tuple[AS_ID, AS_ID]]
-) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=BGPsecHighSecPolicy())
-    for asys in graph.asyss.values():
-        asys.bgp_sec_enabled = True
+) -> List[float]:
+    graph = graph_for(topology)
+    graph.apply_deployment(BGPsecHighSecPolicy(), bgp_sec_enabled=graph.asyss)
     return figure2a_experiment(graph, trials, n_hops=1)
 
 def figure2a_line_6_aspa_partial(
-        nx_graph: nx.Graph,
+        topology: Topology,
         deployment: int,
         trials: List[Tuple[AS_ID, AS_ID]]
-) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=ASPAPolicy())
-    for asys in graph.identify_top_isps(deployment):
-        asys.aspa_enabled = True
+) -> List[float]:
+    graph = graph_for(topology)
+    graph.apply_deployment(ASPAPolicy(), aspa_enabled=as_ids(graph.identify_top_isps(deployment)))
     return figure2a_experiment(graph, trials, n_hops=1)
 
 def figure2a_line_7_aspa_optimal(
-        nx_graph: nx.Graph,
+        topology: Topology,
         trials: List[Tuple[AS_ID, AS_ID]]
-) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=ASPAPolicy())
+) -> List[float]:
+    graph = graph_for(topology)
     # Values here have to be set, to use ASPA for the desired percentage by AS categorized in certain Tier
     tierTwo = 50
     tierThree = 50
 
-    for asys in random.sample(graph.get_tierTwo(), int(len(graph.get_tierTwo()) / 100 * tierTwo)):
-        graph.get_asys(asys).aspa_enabled = True
-    for asys in random.sample(graph.get_tierThree(), int(len(graph.get_tierThree()) / 100 * tierThree)):
-        graph.get_asys(asys).aspa_enabled = True
+    aspa_enabled = random.sample(graph.get_tierTwo(), int(len(graph.get_tierTwo()) / 100 * tierTwo))
+    aspa_enabled += random.sample(graph.get_tierThree(), int(len(graph.get_tierThree()) / 100 * tierThree))
+    graph.apply_deployment(ASPAPolicy(), aspa_enabled=aspa_enabled)
 
     return figure2a_experiment(graph, trials, n_hops=1)
 
 
 def figure2a_line_8_aspa_full(
-        nx_graph: nx.Graph,
+        topology: Topology,
         trials: List[Tuple[AS_ID, AS_ID]]
-) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=ASPAPolicy())
-    for asys in graph.asyss.values():
-        asys.aspa_enabled = True
+) -> List[float]:
+    graph = graph_for(topology)
+    graph.apply_deployment(ASPAPolicy(), aspa_enabled=graph.asyss)
     return figure2a_experiment(graph, trials, n_hops=1)
 
-def run_trial(graph, victim_id, attacker_id, n_hops):
+def run_trial(graph, victim_id, attacker_id, n_hops, rng=None):
     victim = graph.get_asys(victim_id)
     if victim is None:
         raise ValueError(f"No AS with ID {victim_id}")
@@ -122,8 +177,9 @@ def run_trial(graph, victim_id, attacker_id, n_hops):
     if attacker is None:
         raise ValueError(f"No AS with ID {attacker_id}")
 
+    graph.start_trial(victim, attacker)
     graph.find_routes_to(victim)
-    graph.hijack_n_hops(victim, attacker, n_hops)
+    graph.hijack_n_hops(victim, attacker, n_hops, rng)
 
     result = attacker_success_rate(graph, attacker, victim)
 
@@ -136,239 +192,672 @@ def figure2a_experiment(
         graph: ASGraph,
         trials: List[Tuple[AS_ID, AS_ID]],
         n_hops: int
-) -> List[Fraction]:
-    trial_queue: mp.Queue = mp.Queue()
-    result_queue: mp.Queue = mp.Queue()
-    workers = [Figure2aExperiment(trial_queue, result_queue, graph, n_hops)
-               for _ in range(PARALLELISM)]
-    for worker in workers:
-        worker.start()
-
-    for trial in trials:
-        trial_queue.put(trial)
-
-    results = []
-    for _ in range(len(trials)):
-        result = result_queue.get()
-        results.append(result)
-
-    for worker in workers:
-        worker.stop()
-    for worker in workers:
-        trial_queue.put(None)
-    for worker in workers:
-        worker.join()
-
+) -> List[float]:
+    """Runs the trials on the graph's current deployment, in the pool of worker_pool if one is open.
+    Results are in the order of the trials.
+
+    With CI_WIDTH, only as many trials run as needed for the confidence interval, in batches drawn
+    in a fixed random order of the trials, so a prefix of a list of trials grouped by victim is not
+    biased; results are then in that order, and the estimate is appended to POINTS.
+
+    While profiling or reporting progress, the call is counted for the line of its caller, see
+    bgpsecsim.profiling and bgpsecsim.progress.
+    """
+    reporting = progress.PROGRESS
+    if not profiling.ENABLED and reporting is None:
+        return _figure2a_experiment(graph, trials, n_hops, None)
+    label = sys._getframe(1).f_code.co_name
+    if reporting is not None:
+        reporting.start_experiment(label, len(trials))
+    start = time.perf_counter()
+    try:
+        return _figure2a_experiment(graph, trials, n_hops, label)
+    finally:
+        if reporting is not None:
+            reporting.finish_experiment()
+        if profiling.ENABLED:
+            line = profiling.PROFILE.line(label)
+            line.calls += 1
+            line.wall_time += time.perf_counter() - start
+
+def _figure2a_experiment(
+        graph: ASGraph,
+        trials: List[Tuple[AS_ID, AS_ID]],
+        n_hops: int,
+        label: Optional[str]
+) -> List[float]:
+    global EXPERIMENT_ID
+    if not trials:
+        return []
+    seed = random.getrandbits(64) if SEED is None else SEED
+    experiment_id = EXPERIMENT_ID
+    trials = [(victim_id, attacker_id, trial_seed(seed, experiment_id, trial_id))
+              for trial_id, (victim_id, attacker_id) in enumerate(trials)]
+    EXPERIMENT_ID += 1
+    if CI_WIDTH is None:
+        return success_rates(run_counts(graph, trials, n_hops, label))
+
+    # Seeded like the trials, so every experiment of a run draws its trials in its own order
+    order = list(range(len(trials)))
+    random.Random(f"{seed}:{experiment_id}:order").shuffle(order)
+    results: List[float] = []
+    while len(results) < len(trials):
+        batch = [trials[trial_id] for trial_id in order[len(results):len(results) + CI_BATCH]]
+        # Later batches of the point continue the first, so workers keep its deployment
+        results.extend(success_rates(run_counts(graph, batch, n_hops, label, same_batch=bool(results))))
+        half_width = confidence_half_width(results, CONFIDENCE)
+        if 2 * half_width <= CI_WIDTH:
+            break
+    point = Point(len(results), statistics.fmean(results), half_width)
+    POINTS.append(point)
     return results
 
-def figure4_k_hop(nx_graph: nx.Graph, trials: List[Tuple[AS_ID, AS_ID]], n_hops: int) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=DefaultPolicy())
+def trial_seed(seed: int, experiment_id: int, trial_id: int) -> int:
+    """Seed of the generator of a trial."""
+    digest = hashlib.sha256(f"{seed}:{experiment_id}:{trial_id}".encode()).digest()
+    return int.from_bytes(digest[:8], 'little')
+
+def run_counts(
+        graph: ASGraph,
+        trials: List[Tuple[AS_ID, AS_ID, int]],
+        n_hops: int,
+        label: Optional[str] = None,
+        same_batch: bool = False
+) -> np.ndarray:
+    if POOL is None:
+        with worker_pool(min(PARALLELISM, len(trials))):
+            return run_counts(graph, trials, n_hops, label)
+    reporting = progress.PROGRESS
+    if reporting is None:
+        return POOL.run(graph, trials, n_hops, label=label, same_batch=same_batch)
+    reporting.start_batch(POOL)
+    counts = POOL.run(graph, trials, n_hops, label=label, same_batch=same_batch)
+    reporting.finish_batch(len(trials))
+    return counts
+
+def success_rates(counts: np.ndarray) -> List[float]:
+    global N_SKIPPED
+    rates = []
+    for n_bad_routes, n_total_routes in counts.tolist():
+        if (n_bad_routes, n_total_routes) == SKIPPED_COUNTS:
+            N_SKIPPED += 1
+            rates.append(0.0)
+        else:
+            rates.append(success_rate(n_bad_routes, n_total_routes))
+    return rates
+
+def confidence_half_width(results: List[float], confidence: float) -> float:
+    """Half the width of the normal confidence interval of the mean of the results."""
+    if len(results) < 2:
+        return math.inf
+    z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+    return z * statistics.stdev(results) / math.sqrt(len(results))
+
+class Point(object):
+    """Estimate of the mean success rate of one figure2a_experiment call in sequential sampling."""
+    __slots__ = ['n_trials', 'mean', 'half_width']
+
+    n_trials: int
+    mean: float
+    half_width: float
+
+    def __init__(self, n_trials: int, mean: float, half_width: float):
+        self.n_trials = n_trials
+        self.mean = mean
+        self.half_width = half_width
+
+    def __str__(self) -> str:
+        return f"{self.n_trials} trials, {self.mean:.2f}% +- {self.half_width:.2f}"
+
+@contextlib.contextmanager
+def worker_pool(n_workers: Optional[int] = None) -> Generator['WorkerPool', None, None]:
+    """Runs all experiments in the block on one pool of workers, instead of starting new workers for
+    each call of figure2a_experiment."""
+    global POOL
+    pool = WorkerPool(n_workers or PARALLELISM, chunk_size=CHUNK_SIZE)
+    previous, POOL = POOL, pool
+    try:
+        yield pool
+    finally:
+        POOL = previous
+        pool.close()
+
+def figure4_k_hop(topology: Topology, trials: List[Tuple[AS_ID, AS_ID]], n_hops: int) -> List[float]:
+    graph = graph_for(topology)
+    graph.apply_deployment(DefaultPolicy())
     return figure2a_experiment(graph, trials, n_hops)
 
 def figure7a(
-        nx_graph: nx.Graph,
+        topology: Topology,
         deployment: int,
         trials: List[Tuple[AS_ID, AS_ID]]
-) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=RPKIPolicy())
-    for asys in graph.identify_top_isps(deployment):
-        asys.policy = PathEndValidationPolicy()
+) -> List[float]:
+    graph = graph_for(topology)
+    graph.apply_deployment(RPKIPolicy(), [(PathEndValidationPolicy(), as_ids(graph.identify_top_isps(deployment)))])
     return figure2a_experiment(graph, trials, n_hops=1)
 
 def figure7b(
-        nx_graph: nx.Graph,
+        topology: Topology,
         deployment: int,
         trials: List[Tuple[AS_ID, AS_ID]]
-) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=RPKIPolicy())
-    for asys in graph.identify_top_isps(deployment):
-        asys.policy = BGPsecMedSecPolicy()
+) -> List[float]:
+    graph = graph_for(topology)
+    graph.apply_deployment(RPKIPolicy(), [(BGPsecMedSecPolicy(), as_ids(graph.identify_top_isps(deployment)))])
     return figure2a_experiment(graph, trials, n_hops=1)
 
 # ASPA deployed by Top 100 providers
 def figure7c(
-        nx_graph: nx.Graph,
+        topology: Topology,
         deployment: int,
         trials: List[Tuple[AS_ID, AS_ID]]
-) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=ASPAPolicy())
-    for asys in graph.identify_top_isps(deployment):
-        asys.aspa_enabled = True
+) -> List[float]:
+    graph = graph_for(topology)
+    graph.apply_deployment(ASPAPolicy(), aspa_enabled=as_ids(graph.identify_top_isps(deployment)))
     return figure2a_experiment(graph, trials, n_hops=1)
 
 # ASPA deployed by 50% of all AS
 def figure7d(
-        nx_graph: nx.Graph,
+        topology: Topology,
         deployment: int,
         trials: List[Tuple[AS_ID, AS_ID]]
-) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=ASPAPolicy())
+) -> List[float]:
+    graph = graph_for(topology)
 
     tierOne = 50
     tierTwo = 50
     tierThree = 50
 
-    for asys in random.sample(graph.get_tierOne(), int(len(graph.get_tierOne()) / 100 * tierOne)):
-        graph.get_asys(asys).aspa_enabled = True
-    for asys in random.sample(graph.get_tierTwo(), int(len(graph.get_tierTwo()) / 100 * tierTwo)):
-        graph.get_asys(asys).aspa_enabled = True
-    for asys in random.sample(graph.get_tierThree(), int(len(graph.get_tierThree()) / 100 * tierThree)):
-        graph.get_asys(asys).aspa_enabled = True
+    aspa_enabled = random.sample(graph.get_tierOne(), int(len(graph.get_tierOne()) / 100 * tierOne))
+    aspa_enabled += random.sample(graph.get_tierTwo(), int(len(graph.get_tierTwo()) / 100 * tierTwo))
+    aspa_enabled += random.sample(graph.get_tierThree(), int(len(graph.get_tierThree()) / 100 * tierThree))
+    graph.apply_deployment(ASPAPolicy(), aspa_enabled=aspa_enabled)
     return figure2a_experiment(graph, trials, n_hops=1)
 
+# In the figure 8 experiments, every round adds the ASs it picks to those of the rounds before
+FIGURE8_ROUNDS = 20
+
 def figure8_line_1_next_as(
-        nx_graph: nx.Graph,
+        topology: Topology,
         deployment: int,
         p: float,
         trials: List[Tuple[AS_ID, AS_ID]]
-) -> List[Fraction]:
+) -> List[float]:
     results = []
-    graph = ASGraph(nx_graph, policy=RPKIPolicy())
-    for _ in range(20):
+    graph = graph_for(topology)
+    deployed = []
+    for _ in range(FIGURE8_ROUNDS):
         for asys in graph.identify_top_isps(int(deployment / p)):
             if random.random() < p:
-                asys.policy = PathEndValidationPolicy()
+                deployed.append(asys.as_id)
+        graph.apply_deployment(RPKIPolicy(), [(PathEndValidationPolicy(), deployed)])
         results.extend(figure2a_experiment(graph, trials, n_hops=1))
     return results
 
 def figure8_line_2_bgpsec_partial(
-        nx_graph: nx.Graph,
+        topology: Topology,
         deployment: int,
         p: float,
         trials: List[Tuple[AS_ID, AS_ID]]
-) -> List[Fraction]:
+) -> List[float]:
     results = []
-    graph = ASGraph(nx_graph, policy=RPKIPolicy())
-    for _ in range(20):
+    graph = graph_for(topology)
+    deployed = []
+    for _ in range(FIGURE8_ROUNDS):
         for asys in graph.identify_top_isps(int(deployment / p)):
             if random.random() < p:
-                asys.policy = BGPsecMedSecPolicy()
+                deployed.append(asys.as_id)
+        graph.apply_deployment(RPKIPolicy(), [(BGPsecMedSecPolicy(), deployed)])
         results.extend(figure2a_experiment(graph, trials, n_hops=1))
     return results
 
 def figure8_line_3_aspa_partial(
-        nx_graph: nx.Graph,
+        topology: Topology,
         deployment: int,
         p: float,
         trials: List[Tuple[AS_ID, AS_ID]]
-) -> List[Fraction]:
+) -> List[float]:
     results = []
-    graph = ASGraph(nx_graph, policy=ASPAPolicy())
-    for _ in range(20):
+    graph = graph_for(topology)
+    deployed = []
+    for _ in range(FIGURE8_ROUNDS):
         for asys in graph.identify_top_isps(int(deployment / p)):
             if random.random() < p:
-                asys.aspa_enabled = True
+                deployed.append(asys.as_id)
+        graph.apply_deployment(ASPAPolicy(), aspa_enabled=deployed)
         results.extend(figure2a_experiment(graph, trials, n_hops=1))
     return results
 
 def figure9_line_1_rpki_partial(
-        nx_graph: nx.Graph,
+        topology: Topology,
         deployment: int,
         trials: List[Tuple[AS_ID, AS_ID]]
-) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=DefaultPolicy())
-    for asys in graph.identify_top_isps(deployment):
-        asys.policy = RPKIPolicy()
+) -> List[float]:
+    graph = graph_for(topology)
+    graph.apply_deployment(DefaultPolicy(), [(RPKIPolicy(), as_ids(graph.identify_top_isps(deployment)))])
     return figure2a_experiment(graph, trials, n_hops=0)
 
 
 def figure10_aspa(
-        nx_graph: nx.Graph,
+        topology: Topology,
         #deployment over AS per percentage in [tier2, tier3]
         deployment: [int, int],
         trials: List[Tuple[AS_ID, AS_ID]],
         tierOne: int
-) -> List[Fraction]:
-    graph = ASGraph(nx_graph, policy=ASPAPolicy())
+) -> List[float]:
+    graph = graph_for(topology)
 
-    for asys in random.sample(graph.get_tierOne(), int(len(graph.get_tierOne())/100*tierOne)):
-        graph.get_asys(asys).aspa_enabled=True
+    aspa_enabled = random.sample(graph.get_tierOne(), int(len(graph.get_tierOne())/100*tierOne))
     if deployment[0] != 0:
-        for asys in random.sample(graph.get_tierTwo(), int(len(graph.get_tierTwo())/100*deployment[0])):
-            graph.get_asys(asys).aspa_enabled=True
+        aspa_enabled += random.sample(graph.get_tierTwo(), int(len(graph.get_tierTwo())/100*deployment[0]))
     if deployment[1] != 0:
-        for asys in random.sample(graph.get_tierThree(), int(len(graph.get_tierThree())/100*deployment[1])):
-            graph.get_asys(asys).aspa_enabled=True
+        aspa_enabled += random.sample(graph.get_tierThree(), int(len(graph.get_tierThree())/100*deployment[1]))
+    graph.apply_deployment(ASPAPolicy(), aspa_enabled=aspa_enabled)
 
     return figure2a_experiment(graph, trials, n_hops=1)
 
-#Result is a fraction, shows the ratio of successfull attacks to not attacked routes
-def attacker_success_rate(graph: ASGraph, attacker: AS, victim: AS) -> Fraction:
+#Result is a percentage, shows the ratio of successfull attacks to not attacked routes
+def attacker_success_rate(graph: ASGraph, attacker: AS, victim: AS) -> float:
+    return success_rate(*attacker_route_counts(graph, attacker, victim))
+
+def attacker_route_counts(graph: ASGraph, attacker: AS, victim: AS) -> Tuple[int, int]:
+    """Number of ASs routing to the victim over the attacker, and number of ASs with a route.
+
+    Counted while routes propagated if the trial was started with ASGraph.start_trial, otherwise
+    by checking the route of every AS.
+    """
+    if graph.tracked == victim.as_id and graph.attacker is attacker:
+        return graph.n_tainted_routes, graph.n_routes
     n_bad_routes = 0
     n_total_routes = 0
     for asys in graph.asyss.values():
         route = asys.get_route(victim.as_id)
         if route:
             n_total_routes += 1
-            if attacker in route.path:
+            if route.contains(attacker):
                 n_bad_routes += 1
-    #Fraction creates a "Bruch" with the first value as numerator and the second as denominator
-    return Fraction(n_bad_routes, n_total_routes)*100
+    return n_bad_routes, n_total_routes
+
+def success_rate(n_bad_routes: int, n_total_routes: int) -> float:
+    # Raises ZeroDivisionError without routes, like the Fraction it replaced: the victim always has
+    # its own route, so a trial without any routes was never run. Skipped trials have
+    # SKIPPED_COUNTS, see success_rates.
+    return n_bad_routes * 100 / n_total_routes
+
+# Route counts fit 32 bits, as there are fewer ASs
+COUNTS_DTYPE = np.dtype(np.int32)
+
+# Kinds of the tasks on the shared queue of a WorkerPool
+TOPOLOGY_TASK = 'topology'
+BATCH_TASK = 'batch'
+TRIAL_TASK = 'trial'
+PROFILE_TASK = 'profile'
+
+class WorkerPool(object):
+    """Long-lived experiment processes, which hold one graph of the current topology each.
+
+    Workers are started on the first batch, so they inherit its graph. After that they receive
+    every new topology and, for every batch of trials, the deployment to apply to their graph.
+    Those are broadcast over the shared task queue as one copy per worker; a worker holding a copy
+    waits at a barrier until every worker holds one, so no worker takes two.
+
+    Trials are sent in chunks tagged with the ids of their trials, with the trials of a victim kept
+    together (see Experiment.trial_victim), so a worker finds the routes to each victim once and
+    restores them for the other trials. Workers write the integer (bad, total) route counts of every
+    trial into a shared memory array at its id, and only report the number of trials done on the
+    result queue. For progress reports, every worker also counts the trials it finishes in its slot
+    of a shared array, which is read without locking.
+    """
+    __slots__ = [
+        'n_workers', 'chunk_size', 'experiment', 'workers', 'task_queue', 'result_queue', 'barrier',
+        'topology_digest', 'counts_memory', 'done'
+    ]
+
+    n_workers: int
+    # Trials per chunk, None for about four chunks per worker and batch
+    chunk_size: Optional[int]
+    experiment: Type['Experiment']
+    workers: List['Experiment']
+    task_queue: mp.Queue
+    result_queue: mp.Queue
+    barrier: mpsync.Barrier
+    # Digest of the topology of the workers' graphs
+    topology_digest: Optional[str]
+    # Route counts of the current batch by trial id, grown when a batch does not fit
+    counts_memory: Optional[shared_memory.SharedMemory]
+    # Trials finished by each worker since it started
+    done: ctypes.Array
+
+    def __init__(
+            self,
+            n_workers: int,
+            experiment: Optional[Type['Experiment']] = None,
+            chunk_size: Optional[int] = None
+    ):
+        if chunk_size is not None and chunk_size < 1:
+            raise ValueError("chunk size must be positive")
+        self.n_workers = n_workers
+        self.chunk_size = chunk_size
+        self.experiment = experiment or Figure2aExperiment
+        self.workers = []
+        self.task_queue = mp.Queue()
+        self.result_queue = mp.Queue()
+        self.barrier = mp.Barrier(n_workers)
+        self.topology_digest = None
+        self.counts_memory = None
+        self.done = mp.RawArray('q', n_workers)
+
+    def trials_done(self) -> int:
+        """Trials finished by the workers so far, counting those of unfinished batches."""
+        return sum(self.done)
+
+    def broadcast(self, kind: str, message) -> None:
+        payload = pickle.dumps(message)
+        for _ in range(self.n_workers):
+            self.task_queue.put((kind, payload))
+
+    def counts_buffer(self, n_trials: int) -> shared_memory.SharedMemory:
+        size = n_trials * COUNTS_DTYPE.itemsize * 2
+        if self.counts_memory is None or self.counts_memory.size < size:
+            self.release_counts_buffer()
+            self.counts_memory = shared_memory.SharedMemory(create=True, size=max(size, 4096))
+        return self.counts_memory
+
+    def release_counts_buffer(self) -> None:
+        if self.counts_memory is not None:
+            self.counts_memory.close()
+            self.counts_memory.unlink()
+            self.counts_memory = None
+
+    def run(
+            self,
+            graph: ASGraph,
+            trials: List,
+            *args,
+            label: Optional[str] = None,
+            same_batch: bool = False
+    ) -> np.ndarray:
+        """Runs the trials on workers with the topology and deployment of the graph. The extra
+        arguments are passed to Experiment.configure for the batch; the label is the line workers
+        profile the batch under. With same_batch, the trials continue the previous batch: its
+        deployment, arguments and label are not broadcast again.
+
+        Returns the (bad, total) route counts of every trial, in trial order.
+        """
+        digest = graph.topology.digest()
+        if not self.workers:
+            # Workers share the resource tracker of this process, or theirs would remove the shared
+            # counts array when they exit
+            resource_tracker.ensure_running()
+            self.workers = [
+                self.experiment(self.task_queue, self.result_queue, self.barrier, graph, self.done, index)
+                for index in range(self.n_workers)
+            ]
+            for worker in self.workers:
+                worker.start()
+            same_batch = False
+        elif digest != self.topology_digest:
+            self.broadcast(TOPOLOGY_TASK, graph.topology)
+            same_batch = False
+        self.topology_digest = digest
+        previous_memory = self.counts_memory
+        memory = self.counts_buffer(len(trials))
+        if not same_batch or memory is not previous_memory:
+            self.broadcast(BATCH_TASK, (Deployment.of(graph), memory.name, args, label))
+
+        chunk_size = self.chunk_size or max(1, math.ceil(len(trials) / (4 * self.n_workers)))
+        for trial_ids in victim_chunks(trials, chunk_size, self.experiment.trial_victim):
+            self.task_queue.put((TRIAL_TASK, (trial_ids, [trials[trial_id] for trial_id in trial_ids])))
+        n_done = 0
+        while n_done < len(trials):
+            n_done += self.result_queue.get()
+        return counts_array(memory, len(trials)).copy()
+
+    def profiles(self) -> Dict[int, 'profiling.Profile']:
+        """The profile of every worker so far by process id, while profiling. Workers dump their
+        cProfile statistics first."""
+        if not self.workers:
+            return {}
+        self.broadcast(PROFILE_TASK, None)
+        return dict(self.result_queue.get() for _ in range(self.n_workers))
+
+    def close(self) -> None:
+        for worker in self.workers:
+            worker.stop()
+        for worker in self.workers:
+            self.task_queue.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.release_counts_buffer()
 
 class Experiment(mp.Process, abc.ABC):
     input_queue: mp.Queue
     output_queue: mp.Queue
+    barrier: mpsync.Barrier
     _stopped: mpsync.Event
-
-    def __init__(self, input_queue: mp.Queue, output_queue: mp.Queue):
+    graph: ASGraph
+    # Trials finished by every worker of the pool, and the index of this worker's count
+    done: ctypes.Array
+    index: int
+    # Shared route counts array of the current batch
+    counts_memory: Optional[shared_memory.SharedMemory]
+    counts: Optional[np.ndarray]
+    # Routing key of the current deployment
+    routing_key: Optional[str]
+    # Routes to recent victims, by victim and routing key, least recently used first
+    routes_cache: 'OrderedDict[Tuple[AS_ID, str], RoutingState]'
+    # While profiling: the worker's profile, the line of the current batch, seconds spent building
+    # a graph for a new topology not yet counted for a line, and the cProfile profiler
+    profile: Optional[profiling.Profile]
+    label: Optional[str]
+    build_time: float
+    profiler: Optional[cProfile.Profile]
+
+    def __init__(
+            self,
+            input_queue: mp.Queue,
+            output_queue: mp.Queue,
+            barrier: mpsync.Barrier,
+            graph: ASGraph,
+            done: ctypes.Array,
+            index: int
+    ):
         super().__init__(daemon=True)
         self.input_queue = input_queue
         self.output_queue = output_queue
+        self.barrier = barrier
         self._stopped = mp.Event()
+        self.graph = graph
+        self.done = done
+        self.index = index
+        self.counts_memory = None
+        self.counts = None
+        self.routing_key = None
+        self.routes_cache = OrderedDict()
+        self.profile = None
+        self.label = None
+        self.build_time = 0.0
+        self.profiler = None
 
     def stop(self):
         self._stopped.set()
 
     def run(self):
         signal.signal(signal.SIGINT, lambda _signo, _frame: self.stop())
+        if profiling.ENABLED:
+            self.profile = profiling.Profile()
+            self.profiler = profiling.start_cprofile()
 
         while not self._stopped.is_set():
-            trial = self.input_queue.get()
+            task = self.input_queue.get()
 
             # A None input is just used to stop blocking on the queue, so we can check stopped.
-            if trial is None:
+            if task is None:
+                continue
+
+            kind, payload = task
+            if kind == TRIAL_TASK:
+                trial_ids, trials = payload
+                done, index = self.done, self.index
+                for trial_id, trial in zip(trial_ids, trials):
+                    self.counts[trial_id] = self.run_trial(trial)
+                    done[index] += 1
+                self.output_queue.put(len(trials))
                 continue
 
-            self.output_queue.put(self.run_trial(trial))
+            start = time.perf_counter()
+            if kind == TOPOLOGY_TASK:
+                self.graph = ASGraph(pickle.loads(payload))
+                self.routes_cache.clear()
+                self.build_time += time.perf_counter() - start
+            elif kind == PROFILE_TASK:
+                if self.profiler is not None:
+                    profiling.dump_cprofile(self.profiler, f"worker-{self.pid}")
+                self.output_queue.put((self.pid, self.profile))
+            else:
+                deployment, memory_name, args, self.label = pickle.loads(payload)
+                deployment.apply(self.graph)
+                if self.profile is not None:
+                    self.profile.line(self.label).stages['graph_build'] += \
+                        self.build_time + time.perf_counter() - start
+                    self.build_time = 0.0
+                self.routing_key = deployment.routing_key()
+                self.attach_counts(memory_name)
+                self.configure(*args)
+            self.barrier.wait()
+
+    def attach_counts(self, name: str) -> None:
+        if self.counts_memory is not None and self.counts_memory.name == name:
+            return
+        if self.counts_memory is not None:
+            self.counts = None
+            self.counts_memory.close()
+        self.counts_memory = shared_memory.SharedMemory(name=name)
+        self.counts = counts_array(self.counts_memory)
+
+    def configure(self, *args) -> None:
+        """Takes the extra arguments of WorkerPool.run for the current batch."""
+        pass
+
+    @staticmethod
+    def trial_victim(trial) -> Any:
+        """The victim of the trial, by which trials are grouped on workers; None if trials share no
+        routes."""
+        return None
+
+    def start_trial(self, victim: AS, attacker: AS) -> bool:
+        """Sets up the graph like ASGraph.start_trial followed by find_routes_to, restoring the
+        routes to the victim if they were found for the same routing decisions before. Returns
+        whether they were restored."""
+        graph = self.graph
+        key = (victim.as_id, self.routing_key)
+        routes = self.routes_cache.get(key)
+        if routes is not None:
+            self.routes_cache.move_to_end(key)
+            graph.restore_routes_to(victim, attacker, routes)
+            return True
+
+        graph.start_trial(victim, attacker)
+        graph.find_routes_to(victim)
+        if ROUTES_CACHE_SIZE > 0:
+            self.routes_cache[key] = graph.routes_to(victim)
+            while len(self.routes_cache) > ROUTES_CACHE_SIZE:
+                self.routes_cache.popitem(last=False)
+        return False
 
     #Creates an abstract class which has to be definded later on
     @abc.abstractmethod
     #raise is used to give own errors, in this case if anythin happens where now error was created for
-    def run_trial(self, trial):
+    def run_trial(self, trial) -> Tuple[int, int]:
+        """Returns the (bad, total) route counts of the trial."""
         raise NotImplementedError()
 
+def victim_chunks(trials: List, chunk_size: int, victim: Callable[[Any], Any]) -> List[List[int]]:
+    """Trial ids in chunks of at most chunk_size, grouped by victim in order of first appearance.
+    A victim's trials are only split when they do not fit in one chunk."""
+    groups: Dict[Any, List[int]] = {}
+    for trial_id, trial in enumerate(trials):
+        groups.setdefault(victim(trial), []).append(trial_id)
+    chunks = []
+    chunk: List[int] = []
+    for trial_ids in groups.values():
+        if chunk and len(chunk) + len(trial_ids) > chunk_size:
+            chunks.append(chunk)
+            chunk = []
+        chunk.extend(trial_ids)
+        while len(chunk) >= chunk_size:
+            chunks.append(chunk[:chunk_size])
+            chunk = chunk[chunk_size:]
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+def counts_array(memory: shared_memory.SharedMemory, n_trials: Optional[int] = None) -> np.ndarray:
+    """(bad, total) route counts by trial id, in the shared memory."""
+    counts = np.ndarray((memory.size // (COUNTS_DTYPE.itemsize * 2), 2), dtype=COUNTS_DTYPE, buffer=memory.buf)
+    return counts if n_trials is None else counts[:n_trials]
+
 class Figure2aExperiment(Experiment):
-    graph: ASGraph
     n_hops: int
 
-    def __init__(self, input_queue: mp.Queue, output_queue: mp.Queue, graph: ASGraph, n_hops: int):
-        super().__init__(input_queue, output_queue)
-        self.graph = graph
+    def configure(self, n_hops: int) -> None:
         self.n_hops = n_hops
 
-    def run_trial(self, trial: Tuple[(AS_ID, AS_ID)]):
+    @staticmethod
+    def trial_victim(trial: Tuple[AS_ID, AS_ID]) -> AS_ID:
+        return trial[0]
+
+    def run_trial(self, trial: Union[Tuple[AS_ID, AS_ID], Tuple[AS_ID, AS_ID, int]]):
+        """Trials are (victim, attacker), or (victim, attacker, seed of the trial's generator)."""
         graph = self.graph
         n_hops = self.n_hops
         #Takes the value passed by the function call by "trial" and assigns them to victim and attacker
-        victim_id, attacker_id = trial
+        victim_id, attacker_id = trial[:2]
+        rng = random.Random(trial[2]) if len(trial) > 2 else None
 
         #Takes the desired AS as victim out of the full graph by its ID
         victim = graph.get_asys(victim_id)
         if victim is None:
             warnings.warn(f"No AS with ID {victim_id}")
-            return Fraction(0, 1)
+            return SKIPPED_COUNTS
 
         #Takes AS of attacker out of graph, like did for the victim
         attacker = graph.get_asys(attacker_id)
         if attacker is None:
             warnings.warn(f"No AS with ID {attacker_id}")
-            return Fraction(0, 1)
+            return SKIPPED_COUNTS
         
-        #starts to find a new routing table and executes the attack onto it by n hops
-        graph.clear_routing_tables()
-        graph.find_routes_to(victim)
-        graph.hijack_n_hops(victim, attacker, n_hops)
+        if self.profile is not None:
+            return self.run_profiled_trial(victim, attacker, rng)
+
+        #starts from the routes to the victim and executes the attack onto it by n hops
+        self.start_trial(victim, attacker)
+        graph.hijack_n_hops(victim, attacker, n_hops, rng)
         
-        result = attacker_success_rate(graph, attacker, victim)
+        result = attacker_route_counts(graph, attacker, victim)
+
+        return result
 
+    def run_profiled_trial(self, victim: AS, attacker: AS, rng: Optional[random.Random]) -> Tuple[int, int]:
+        """run_trial with its stages timed and its routes counted for the line of the batch."""
+        graph = self.graph
+        line = self.profile.line(self.label)
+        start = time.perf_counter()
+        graph.stats = line.legit
+        try:
+            if self.start_trial(victim, attacker):
+                line.restored += 1
+            legit = time.perf_counter()
+            graph.stats = line.hijack
+            graph.hijack_n_hops(victim, attacker, self.n_hops, rng)
+        finally:
+            graph.stats = None
+        hijack = time.perf_counter()
+        result = attacker_route_counts(graph, attacker, victim)
+        end = time.perf_counter()
+
+        stages = line.stages
+        stages['legit_propagation'] += legit - start
+        stages['hijack_propagation'] += hijack - legit
+        stages['success_accounting'] += end - hijack
+        line.trials += 1
         return result
\ No newline at end of file
@@ -1,8 +1,6 @@
-from fractions import Fraction
 import itertools
 import math
 import matplotlib.pyplot as plt
-import networkx as nx
 import numpy as np
 import random
 import statistics
@@ -15,8 +13,15 @@ from bgpsecsim.asys import AS_ID
 import bgpsecsim.as_graph as as_graph
 from bgpsecsim.as_graph import ASGraph
 import bgpsecsim.experiments as experiments
+import bgpsecsim.progress as progress
+import bgpsecsim.result_store as result_store
+import bgpsecsim.topology_cache as topology_cache
+from bgpsecsim.topology import Topology
 import other.evaluation as eval
 
+# Whether figures with a result store continue the run stored in it instead of starting over
+RESUME = False
+
 def get_attacks():
     return [
         ("Syria Telecom attacks Youtube-1", "attacks/STE-1.txt", "caida-data/20141201.as-rel.txt"),
@@ -62,64 +67,64 @@ def get_current_content_providers() -> List[AS_ID]:
         2906   # Netflix
     ]
 
-def target_content_provider_trials(nx_graph: nx.Graph, n_trials: int, providers: List[AS_ID]) -> List[Tuple[AS_ID, AS_ID]]:
+def target_content_provider_trials(topology: Topology, n_trials: int, providers: List[AS_ID]) -> List[Tuple[AS_ID, AS_ID]]:
     content_providers_set = set(providers)
-    asyss_set = set(nx_graph.nodes)
+    asyss_set = set(topology.as_ids())
     assert content_providers_set <= asyss_set
 
     as_ids: List[AS_ID] = list(asyss_set - content_providers_set)
     attackers = random.choices(as_ids, k=math.ceil(n_trials / len(providers)))
     return list(itertools.product(providers, attackers))
 
-def uniform_random_trials(nx_graph: nx.Graph, n_trials: int) -> List[Tuple[AS_ID, AS_ID]]:
-    as_ids: List[AS_ID] = list(nx_graph.nodes)
+def uniform_random_trials(topology: Topology, n_trials: int) -> List[Tuple[AS_ID, AS_ID]]:
+    as_ids: List[AS_ID] = topology.as_ids()
     return [random_pair(as_ids) for _ in range(n_trials)]
 
-def figure2a(filename: str, nx_graph: nx.Graph, n_trials: int):
-    trials = uniform_random_trials(nx_graph, n_trials)
-    return figure2(filename, nx_graph, trials)
+def figure2a(filename: str, topology: Topology, n_trials: int):
+    trials = uniform_random_trials(topology, n_trials)
+    return figure2(filename, topology, trials)
 
-def figure2b(filename: str, nx_graph: nx.Graph, n_trials: int):
+def figure2b(filename: str, topology: Topology, n_trials: int):
     """
     This one is a little weird. The paper says "We evaluated, for each victim content provider, the
     success rate of an attacker drawn uniformly at random." But the graph has only one line, so we
     assume the success rate is averaged over them.
     """
-    trials = target_content_provider_trials(nx_graph, n_trials, get_content_providers())
-    return figure2(filename, nx_graph, trials)
+    trials = target_content_provider_trials(topology, n_trials, get_content_providers())
+    return figure2(filename, topology, trials)
 
-def figure2(filename: str, nx_graph: nx.Graph, trials: List[Tuple[AS_ID, AS_ID]]):
+def figure2(filename: str, topology: Topology, trials: List[Tuple[AS_ID, AS_ID]]):
     #Here the percentage of deployment is set, current from 0 to full deployment by top ISP, incrementing by 10% everytime
     deployments = np.arange(0, 110, 10)
 
     line1_results = []
     for deployment in deployments:
         print(f"Next-AS (deployment = {deployment})")
-        line1_results.append(fmean(experiments.figure2a_line_1_next_as(nx_graph, deployment, trials)))
+        line1_results.append(fmean(experiments.figure2a_line_1_next_as(topology, deployment, trials)))
     print("Next-AS: ", line1_results)
 
     #line2_results = []
     #for deployment in deployments:
     #    print(f"BGPsec in partial deployment (deployment = {deployment})")
-    #    line2_results.append(fmean(experiments.figure2a_line_2_bgpsec_partial(nx_graph, deployment, trials)))
+    #    line2_results.append(fmean(experiments.figure2a_line_2_bgpsec_partial(topology, deployment, trials)))
     #print("BGPsec in partial deployment: ", line2_results)
 
-    #line3_results = fmean(experiments.figure2a_line_3_two_hop(nx_graph, trials))
+    #line3_results = fmean(experiments.figure2a_line_3_two_hop(topology, trials))
     #print("2-hop: ", line3_results)
 
-    line4_results = fmean(experiments.figure2a_line_4_rpki(nx_graph, trials))
+    line4_results = fmean(experiments.figure2a_line_4_rpki(topology, trials))
     print("RPKI (full deployment): ", line4_results)
 
-    line5_results = fmean(experiments.figure2a_line_5_bgpsec_med_full(nx_graph, trials))
+    line5_results = fmean(experiments.figure2a_line_5_bgpsec_med_full(topology, trials))
     print("BGPsec (full deployment, legacy allowed): ", line5_results)
 
     line6_results = []
     for deployment in deployments:
         print(f"ASPA in partial deployment (deployment = {deployment})")
-        line6_results.append(fmean(experiments.figure2a_line_6_aspa_partial(nx_graph, deployment, trials)))
+        line6_results.append(fmean(experiments.figure2a_line_6_aspa_partial(topology, deployment, trials)))
     print("ASPA in partial deployment: ", line6_results)
 
-    line7_results = fmean(experiments.figure2a_line_7_aspa_optimal(nx_graph, trials))
+    line7_results = fmean(experiments.figure2a_line_7_aspa_optimal(topology, trials))
     print("ASPA (50% deployment) ", line7_results)
 
 
@@ -137,37 +142,37 @@ def figure2(filename: str, nx_graph: nx.Graph, trials: List[Tuple[AS_ID, AS_ID]]
     plt.savefig(filename)
 
 
-def figure3a(filename: str, nx_graph: nx.Graph, n_trials: int):
-    large_asyss = list(as_graph.asyss_by_customer_count(nx_graph, 250, None))
-    stub_asyss = list(as_graph.asyss_by_customer_count(nx_graph, 0, 0))
+def figure3a(filename: str, topology: Topology, n_trials: int):
+    large_asyss = list(as_graph.asyss_by_customer_count(topology, 250, None))
+    stub_asyss = list(as_graph.asyss_by_customer_count(topology, 0, 0))
     trials = [(random.choice(stub_asyss), random.choice(large_asyss)) for _ in range(n_trials)]
-    return figure2(filename, nx_graph, trials)
+    return figure2(filename, topology, trials)
 
 
-def figure3b(filename: str, nx_graph: nx.Graph, n_trials: int):
-    large_asyss = list(as_graph.asyss_by_customer_count(nx_graph, 250, None))
-    stub_asyss = list(as_graph.asyss_by_customer_count(nx_graph, 0, 0))
+def figure3b(filename: str, topology: Topology, n_trials: int):
+    large_asyss = list(as_graph.asyss_by_customer_count(topology, 250, None))
+    stub_asyss = list(as_graph.asyss_by_customer_count(topology, 0, 0))
     trials = [(random.choice(large_asyss), random.choice(stub_asyss)) for _ in range(n_trials)]
-    return figure2(filename, nx_graph, trials)
+    return figure2(filename, topology, trials)
 
-def figure4(filename: str, nx_graph: nx.Graph, n_trials: int):
-    trials = uniform_random_trials(nx_graph, n_trials)
+def figure4(filename: str, topology: Topology, n_trials: int):
+    trials = uniform_random_trials(topology, n_trials)
 
     hops = np.arange(0, 11)
 
     line1_results = []
     for n_hops in hops:
         print(f"k-hop attacker (k={n_hops})")
-        line1_results.append(fmean(experiments.figure4_k_hop(nx_graph, trials, n_hops)))
+        line1_results.append(fmean(experiments.figure4_k_hop(topology, trials, n_hops)))
     print("k-hop attacker: ", line1_results)
 
-    line2_results = fmean(experiments.figure2a_line_5_bgpsec_med_full(nx_graph, trials))
+    line2_results = fmean(experiments.figure2a_line_5_bgpsec_med_full(topology, trials))
     print("BGPsec (full deployment, legacy allowed): ", line2_results)
 
-    line3_results = fmean(experiments.figure2a_line_8_aspa_full(nx_graph, trials))
+    line3_results = fmean(experiments.figure2a_line_8_aspa_full(topology, trials))
     print("ASPA (full deployment) ", line3_results)
 
-    line4_results = fmean(experiments.figure2a_line_7_aspa_optimal(nx_graph, trials))
+    line4_results = fmean(experiments.figure2a_line_7_aspa_optimal(topology, trials))
     print("ASPA (50% deployment) ", line4_results)
 
 
@@ -182,12 +187,12 @@ def figure4(filename: str, nx_graph: nx.Graph, n_trials: int):
     plt.savefig(filename)
 
 
-def figure7a(filename: str, nx_graph: nx.Graph, n_trials: int):
+def figure7a(filename: str, topology: Topology, n_trials: int):
     results = []
     attacks = get_attacks()
 
     for (label, filepath, as_rel_file) in attacks:
-        nx_graph = as_graph.parse_as_rel_file(as_rel_file)
+        topology = topology_cache.load_topology(as_rel_file)
         print("Loaded graph for ", label)
 
         with open(filepath) as f:
@@ -208,7 +213,7 @@ def figure7a(filename: str, nx_graph: nx.Graph, n_trials: int):
 
         attack_results = []
         for deployment in deployments:
-            attack_results.append(fmean(experiments.figure7a(nx_graph, deployment, trials)))
+            attack_results.append(fmean(experiments.figure7a(topology, deployment, trials)))
         results.append(attack_results)
         print(label, attack_results)
 
@@ -221,12 +226,12 @@ def figure7a(filename: str, nx_graph: nx.Graph, n_trials: int):
     plt.savefig(filename)
 
 
-def figure7b(filename: str, nx_graph: nx.Graph, n_trials: int):
+def figure7b(filename: str, topology: Topology, n_trials: int):
     results = []
     attacks = get_attacks()
 
     for (label, filepath, as_rel_file) in attacks:
-        nx_graph = as_graph.parse_as_rel_file(as_rel_file)
+        topology = topology_cache.load_topology(as_rel_file)
         print("Loaded graph for ", label)
 
         with open(filepath) as f:
@@ -247,7 +252,7 @@ def figure7b(filename: str, nx_graph: nx.Graph, n_trials: int):
 
         attack_results = []
         for deployment in deployments:
-            attack_results.append(fmean(experiments.figure7b(nx_graph, deployment, trials)))
+            attack_results.append(fmean(experiments.figure7b(topology, deployment, trials)))
         results.append(attack_results)
         print(label, attack_results)
         
@@ -260,12 +265,12 @@ def figure7b(filename: str, nx_graph: nx.Graph, n_trials: int):
     plt.savefig(filename)
 
 
-def figure7c(filename: str, nx_graph: nx.Graph, n_trials: int):
+def figure7c(filename: str, topology: Topology, n_trials: int):
     results = []
     attacks = get_attacks()
 
     for (label, filepath, as_rel_file) in attacks:
-        nx_graph = as_graph.parse_as_rel_file(as_rel_file)
+        topology = topology_cache.load_topology(as_rel_file)
         print("Loaded graph for ", label)
 
         with open(filepath) as f:
@@ -286,7 +291,7 @@ def figure7c(filename: str, nx_graph: nx.Graph, n_trials: int):
 
         attack_results = []
         for deployment in deployments:
-            attack_results.append(fmean(experiments.figure7c(nx_graph, deployment, trials)))
+            attack_results.append(fmean(experiments.figure7c(topology, deployment, trials)))
         results.append(attack_results)
         print(label, attack_results)
 
@@ -299,12 +304,12 @@ def figure7c(filename: str, nx_graph: nx.Graph, n_trials: int):
     plt.savefig(filename)
 
 
-def figure7d(filename: str, nx_graph: nx.Graph, n_trials: int):
+def figure7d(filename: str, topology: Topology, n_trials: int):
     results = []
     attacks = get_attacks()
 
     for (label, filepath, as_rel_file) in attacks:
-        nx_graph = as_graph.parse_as_rel_file(as_rel_file)
+        topology = topology_cache.load_topology(as_rel_file)
         print("Loaded graph for ", label)
 
         with open(filepath) as f:
@@ -325,7 +330,7 @@ def figure7d(filename: str, nx_graph: nx.Graph, n_trials: int):
 
         attack_results = []
         for deployment in deployments:
-            attack_results.append(fmean(experiments.figure7d(nx_graph, deployment, trials)))
+            attack_results.append(fmean(experiments.figure7d(topology, deployment, trials)))
         results.append(attack_results)
         print(label, attack_results)
 
@@ -338,12 +343,15 @@ def figure7d(filename: str, nx_graph: nx.Graph, n_trials: int):
     plt.savefig(filename)
 
 
-def figure8(filename: str, nx_graph: nx.Graph, n_trials: int, p: float):
-    large_asyss = list(as_graph.asyss_by_customer_count(nx_graph, 250, None))
-    stub_asyss = list(as_graph.asyss_by_customer_count(nx_graph, 0, 0))
+def figure8(filename: str, topology: Topology, n_trials: int, p: float):
+    large_asyss = list(as_graph.asyss_by_customer_count(topology, 250, None))
+    stub_asyss = list(as_graph.asyss_by_customer_count(topology, 0, 0))
     trials = [(random.choice(large_asyss), random.choice(stub_asyss)) for _ in range(n_trials)]
 
     deployments = np.arange(0, 110, 10)
+    if progress.PROGRESS is not None:
+        # Three lines of rounds for every deployment, and three full deployments
+        progress.PROGRESS.expect((3 * len(deployments) * experiments.FIGURE8_ROUNDS + 3) * n_trials)
 
     rand_state = random.getstate()
 
@@ -351,33 +359,33 @@ def figure8(filename: str, nx_graph: nx.Graph, n_trials: int, p: float):
     for deployment in deployments:
         print(f"Next-AS (deployment = {deployment})")
         random.setstate(rand_state)
-        line1_results.append(fmean(experiments.figure8_line_1_next_as(nx_graph, deployment, p, trials)))
+        line1_results.append(fmean(experiments.figure8_line_1_next_as(topology, deployment, p, trials)))
     print("Next-AS: ", line1_results)
 
     line2_results = []
     for deployment in deployments:
         print(f"BGPsec in partial deployment (deployment = {deployment})")
         random.setstate(rand_state)
-        line2_results.append(fmean(experiments.figure8_line_2_bgpsec_partial(nx_graph, deployment, p, trials)))
+        line2_results.append(fmean(experiments.figure8_line_2_bgpsec_partial(topology, deployment, p, trials)))
     print("BGPsec in partial deployment: ", line2_results)
 
-    # line3_results = fmean(experiments.figure2a_line_3_two_hop(nx_graph, trials))
+    # line3_results = fmean(experiments.figure2a_line_3_two_hop(topology, trials))
     # print("2-hop: ", line3_results)
 
-    line4_results = fmean(experiments.figure2a_line_4_rpki(nx_graph, trials))
+    line4_results = fmean(experiments.figure2a_line_4_rpki(topology, trials))
     print("RPKI (full deployment): ", line4_results)
 
-    line5_results = fmean(experiments.figure2a_line_5_bgpsec_med_full(nx_graph, trials))
+    line5_results = fmean(experiments.figure2a_line_5_bgpsec_med_full(topology, trials))
     print("BGPsec (full deployment, legacy allowed): ", line5_results)
 
     line6_results = []
     for deployment in deployments:
         print(f"ASPA in partial deployment (deployment = {deployment})")
         random.setstate(rand_state)
-        line6_results.append(fmean(experiments.figure8_line_3_aspa_partial(nx_graph, deployment, p, trials)))
+        line6_results.append(fmean(experiments.figure8_line_3_aspa_partial(topology, deployment, p, trials)))
     print("ASPA in partial deployment: ", line6_results)
 
-    line7_results = fmean(experiments.figure2a_line_7_aspa_optimal(nx_graph, trials))
+    line7_results = fmean(experiments.figure2a_line_7_aspa_optimal(topology, trials))
     print("ASPA (50% deployment): ", line7_results)
 
 
@@ -394,37 +402,37 @@ def figure8(filename: str, nx_graph: nx.Graph, n_trials: int, p: float):
     plt.ylabel("Attacker's Success Rate (in %)")
     plt.savefig(filename)
 
-def figure8a(filename: str, nx_graph: nx.Graph, n_trials: int):
-    figure8(filename, nx_graph, n_trials, p=0.75)
+def figure8a(filename: str, topology: Topology, n_trials: int):
+    figure8(filename, topology, n_trials, p=0.75)
 
-def figure8b(filename: str, nx_graph: nx.Graph, n_trials: int):
-    figure8(filename, nx_graph, n_trials, p=0.50)
+def figure8b(filename: str, topology: Topology, n_trials: int):
+    figure8(filename, topology, n_trials, p=0.50)
 
-def figure8c(filename: str, nx_graph: nx.Graph, n_trials: int):
-    figure8(filename, nx_graph, n_trials, p=0.25)
+def figure8c(filename: str, topology: Topology, n_trials: int):
+    figure8(filename, topology, n_trials, p=0.25)
 
-def figure9a(filename: str, nx_graph: nx.Graph, n_trials: int):
-    trials = uniform_random_trials(nx_graph, n_trials)
-    return figure9(filename, nx_graph, trials)
+def figure9a(filename: str, topology: Topology, n_trials: int):
+    trials = uniform_random_trials(topology, n_trials)
+    return figure9(filename, topology, trials)
 
-def figure9b(filename: str, nx_graph: nx.Graph, n_trials: int):
-    trials = target_content_provider_trials(nx_graph, n_trials, get_content_providers())
-    return figure9(filename, nx_graph, trials)
+def figure9b(filename: str, topology: Topology, n_trials: int):
+    trials = target_content_provider_trials(topology, n_trials, get_content_providers())
+    return figure9(filename, topology, trials)
    
-def figure9b_update(filename: str, nx_graph: nx.Graph, n_trials: int):
-    trials = target_content_provider_trials(nx_graph, n_trials, get_current_content_providers())
-    return figure9(filename, nx_graph, trials)
+def figure9b_update(filename: str, topology: Topology, n_trials: int):
+    trials = target_content_provider_trials(topology, n_trials, get_current_content_providers())
+    return figure9(filename, topology, trials)
 
-def figure9(filename: str, nx_graph: nx.Graph, trials: List[Tuple[AS_ID, AS_ID]]):
+def figure9(filename: str, topology: Topology, trials: List[Tuple[AS_ID, AS_ID]]):
     deployments = np.arange(0, 110, 10)
 
     line1_results = []
     for deployment in deployments:
         print(f"Prefix hijack (deployment = {deployment})")
-        line1_results.append(fmean(experiments.figure9_line_1_rpki_partial(nx_graph, deployment, trials)))
+        line1_results.append(fmean(experiments.figure9_line_1_rpki_partial(topology, deployment, trials)))
     print("Prefix hijack: ", line1_results)
 
-    line2_results = fmean(experiments.figure2a_line_4_rpki(nx_graph, trials))
+    line2_results = fmean(experiments.figure2a_line_4_rpki(topology, trials))
     print("RPKI (full deployment): ", line2_results)
 
     plt.figure(figsize=(10, 5))
@@ -436,8 +444,8 @@ def figure9(filename: str, nx_graph: nx.Graph, trials: List[Tuple[AS_ID, AS_ID]]
     plt.savefig(filename)
 
 
-def figure10(filename: str, nx_graph: nx.Graph, n_trials:int, tierOne:int):
-    trials = uniform_random_trials(nx_graph, n_trials)
+def figure10(filename: str, topology: Topology, n_trials:int, tierOne:int):
+    trials = uniform_random_trials(topology, n_trials)
 
     # Set more detailed eval by setting steps smaller then 10
     deployments = np.arange(0, 110, 10)
@@ -445,27 +453,27 @@ def figure10(filename: str, nx_graph: nx.Graph, n_trials:int, tierOne:int):
     line1_results = []
     for deployment in deployments:
         print(f"ASPA Tier2 (deployment = {deployment})")
-        line1_results.append(fmean(experiments.figure10_aspa(nx_graph, [deployment, 5], trials, tierOne)))
+        line1_results.append(fmean(experiments.figure10_aspa(topology, [deployment, 5], trials, tierOne)))
     line2_results = []
     for deployment in deployments:
         print(f"ASPA Tier2 (deployment = {deployment})")
-        line2_results.append(fmean(experiments.figure10_aspa(nx_graph, [deployment, 10], trials, tierOne)))
+        line2_results.append(fmean(experiments.figure10_aspa(topology, [deployment, 10], trials, tierOne)))
     line3_results = []
     for deployment in deployments:
         print(f"ASPA Tier2 (deployment = {deployment})")
-        line3_results.append(fmean(experiments.figure10_aspa(nx_graph, [deployment, 20], trials, tierOne)))
+        line3_results.append(fmean(experiments.figure10_aspa(topology, [deployment, 20], trials, tierOne)))
     line4_results = []
     for deployment in deployments:
         print(f"ASPA Tier2 (deployment = {deployment})")
-        line4_results.append(fmean(experiments.figure10_aspa(nx_graph, [deployment, 30], trials, tierOne)))
+        line4_results.append(fmean(experiments.figure10_aspa(topology, [deployment, 30], trials, tierOne)))
     line5_results = []
     for deployment in deployments:
         print(f"ASPA Tier2 (deployment = {deployment})")
-        line5_results.append(fmean(experiments.figure10_aspa(nx_graph, [deployment, 50], trials, tierOne)))
+        line5_results.append(fmean(experiments.figure10_aspa(topology, [deployment, 50], trials, tierOne)))
     line6_results = []
     for deployment in deployments:
         print(f"ASPA Tier2 (deployment = {deployment})")
-        line6_results.append(fmean(experiments.figure10_aspa(nx_graph, [deployment, 80], trials, tierOne)))
+        line6_results.append(fmean(experiments.figure10_aspa(topology, [deployment, 80], trials, tierOne)))
 
     plt.figure(figsize=(10, 7))
     plt.plot(deployments, line1_results, label="Tier3: 5%")
@@ -480,22 +488,46 @@ def figure10(filename: str, nx_graph: nx.Graph, n_trials:int, tierOne:int):
     plt.ylabel("Attacker's Success Rate (in %)")
     plt.savefig(filename)
 
-def figure10_3d(filename: str, nx_graph: nx.Graph, n_trials:int):
-    trials = uniform_random_trials(nx_graph, n_trials)
+def figure10_3d(filename: str, topology: Topology, n_trials:int):
+    """Results go to the result store filename.results as they complete, and to filename.csv in grid
+    order at the end. With RESUME, configurations already in the store are skipped; the store must be
+    of the same seed, routing model, topology, trials and sampling settings."""
+    trials = uniform_random_trials(topology, n_trials)
 
     deploymentsTierThree = np.arange(0, 101, 5)
     deploymentsTierTwo = np.arange(0, 101, 5)
     deploymentsTierOne = np.arange(0, 101, 5)
-
-    line1_results = []
-    for deployment in deploymentsTierThree:
-        for deployment2 in deploymentsTierTwo:
-            for deployment3 in deploymentsTierOne:
-                print(f"ASPA deployment = {deployment3, deployment2, deployment})")
-                line1_results.append(fmean(experiments.figure10_aspa(nx_graph, [deployment, deployment2], trials, deployment3)))
-        data_between = np.asarray(line1_results)
-        np.savetxt(filename+'_backup'+str(deployment)+'.csv', data_between, delimiter=',')
-
+    configurations = list(itertools.product(deploymentsTierThree.tolist(), deploymentsTierTwo.tolist(),
+                                            deploymentsTierOne.tolist()))
+
+    meta = {
+        'figure': 'figure10_3d',
+        'seed': experiments.SEED,
+        'model': experiments.MODEL,
+        'topology': topology.digest(),
+        'trials': result_store.trials_digest(trials),
+        'ci_width': experiments.CI_WIDTH,
+        'ci_batch': experiments.CI_BATCH,
+        'confidence': experiments.CONFIDENCE,
+        'columns': ['tier_three', 'tier_two', 'tier_one', 'success_rate'],
+    }
+    with result_store.ResultStore(filename + '.results', meta, resume=RESUME) as store:
+        if len(store):
+            print(f"Resuming with {len(store)} of {len(configurations)} configurations done")
+        if progress.PROGRESS is not None:
+            progress.PROGRESS.expect(sum(key not in store for key in configurations) * len(trials))
+        for i, (deployment, deployment2, deployment3) in enumerate(configurations):
+            key = (deployment, deployment2, deployment3)
+            if key in store:
+                continue
+            # The ASs sampled for a configuration and its experiment id do not depend on the
+            # configurations run before it, so a resumed run gets the results of an uninterrupted one
+            if experiments.SEED is not None:
+                random.seed(f"{experiments.SEED}:{deployment}:{deployment2}:{deployment3}")
+            experiments.EXPERIMENT_ID = i
+            print(f"ASPA deployment = {deployment3, deployment2, deployment})")
+            store.append(key, fmean(experiments.figure10_aspa(topology, [deployment, deployment2], trials, deployment3)))
+        line1_results = [store[key] for key in configurations]
 
     data = np.asarray(line1_results)
     np.savetxt(filename+'.csv', data, delimiter=',')
@@ -507,24 +539,24 @@ def figure10_3d(filename: str, nx_graph: nx.Graph, n_trials:int):
 
 
 
-def figure10_100(filename: str, nx_graph: nx.Graph, n_trials: int):
-    figure10(filename, nx_graph, n_trials, 100)
+def figure10_100(filename: str, topology: Topology, n_trials: int):
+    figure10(filename, topology, n_trials, 100)
 
 
-def figure10_80(filename: str, nx_graph: nx.Graph, n_trials: int):
-    figure10(filename, nx_graph, n_trials, 80)
+def figure10_80(filename: str, topology: Topology, n_trials: int):
+    figure10(filename, topology, n_trials, 80)
 
 
-def figure10_50(filename: str, nx_graph: nx.Graph, n_trials: int):
-    figure10(filename, nx_graph, n_trials, 50)
+def figure10_50(filename: str, topology: Topology, n_trials: int):
+    figure10(filename, topology, n_trials, 50)
 
 
-def figure10_20(filename: str, nx_graph: nx.Graph, n_trials: int):
-    figure10(filename, nx_graph, n_trials, 20)
+def figure10_20(filename: str, topology: Topology, n_trials: int):
+    figure10(filename, topology, n_trials, 20)
 
 
-def fmean(vals: Sequence[Fraction]) -> float:
-    return float(statistics.mean(vals))
+def fmean(vals: Sequence[float]) -> float:
+    return statistics.fmean(vals)
 
 
 def random_pair(as_ids: List[AS_ID]) -> Tuple[AS_ID, AS_ID]:
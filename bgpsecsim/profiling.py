@@ -0,0 +1,166 @@
+import cProfile
+import json
+import os
+import tempfile
+from typing import Any, Dict, Optional
+
+# Profile of generate --profile. While ENABLED, every worker times the stages of its trials and
+# counts the routes propagated by find_routes_to and hijack_n_hops, by experiment line: the
+# experiments function that called figure2a_experiment. The propagations count into the
+# PropagationStats of ASGraph.stats, which AS.learn_route and RoutingState.propagate take as an
+# optional argument.
+
+ENABLED = False
+# Directory the workers dump their cProfile statistics to, None for no cProfile
+CPROFILE_DIR: Optional[str] = None
+
+STAGES = ('graph_build', 'legit_propagation', 'hijack_propagation', 'success_accounting')
+
+
+class PropagationStats(object):
+    """Routes handled by the propagations of one stage.
+
+    Offered routes are those taken off the queue, rejected ones failed the policy's accept_route or
+    lost against the current route in prefer_route, forwarded ones were queued for a neighbor. The
+    stable model counts the offers it settles from and leaves forwarded and peak_queue at 0.
+    """
+    __slots__ = ['offered', 'rejected_accept', 'rejected_prefer', 'forwarded', 'peak_queue']
+
+    offered: int
+    rejected_accept: int
+    rejected_prefer: int
+    forwarded: int
+    # Longest the queue got in any one propagation
+    peak_queue: int
+
+    def __init__(self):
+        self.offered = 0
+        self.rejected_accept = 0
+        self.rejected_prefer = 0
+        self.forwarded = 0
+        self.peak_queue = 0
+
+    def merge(self, other: 'PropagationStats') -> None:
+        self.offered += other.offered
+        self.rejected_accept += other.rejected_accept
+        self.rejected_prefer += other.rejected_prefer
+        self.forwarded += other.forwarded
+        self.peak_queue = max(self.peak_queue, other.peak_queue)
+
+    def to_dict(self) -> Dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class LineProfile(object):
+    """Stage times and propagation counters of one experiment line."""
+    __slots__ = ['calls', 'trials', 'restored', 'wall_time', 'stages', 'legit', 'hijack']
+
+    # figure2a_experiment calls and their seconds, counted by the main process
+    calls: int
+    wall_time: float
+    # Trials run, and those of them that restored cached routes to the victim instead of finding them
+    trials: int
+    restored: int
+    # Seconds by stage, summed over trials
+    stages: Dict[str, float]
+    legit: PropagationStats
+    hijack: PropagationStats
+
+    def __init__(self):
+        self.calls = 0
+        self.wall_time = 0.0
+        self.trials = 0
+        self.restored = 0
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.legit = PropagationStats()
+        self.hijack = PropagationStats()
+
+    def merge(self, other: 'LineProfile') -> None:
+        self.calls += other.calls
+        self.wall_time += other.wall_time
+        self.trials += other.trials
+        self.restored += other.restored
+        for stage, seconds in other.stages.items():
+            self.stages[stage] += seconds
+        self.legit.merge(other.legit)
+        self.hijack.merge(other.hijack)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'wall_time': self.wall_time,
+            'trials': self.trials,
+            'restored': self.restored,
+            'stages': dict(self.stages),
+            'legit': self.legit.to_dict(),
+            'hijack': self.hijack.to_dict(),
+        }
+
+
+class Profile(object):
+    """Line profiles of one process, or merged over several."""
+    __slots__ = ['lines']
+
+    lines: Dict[Optional[str], LineProfile]
+
+    def __init__(self):
+        self.lines = {}
+
+    def line(self, label: Optional[str]) -> LineProfile:
+        line = self.lines.get(label)
+        if line is None:
+            line = self.lines[label] = LineProfile()
+        return line
+
+    def merge(self, other: 'Profile') -> None:
+        for label, line in other.lines.items():
+            self.line(label).merge(line)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {str(label): line.to_dict() for label, line in self.lines.items()}
+
+
+# Profile of the main process: calls and wall time of the lines, and the graphs built for them
+PROFILE = Profile()
+
+
+def start_cprofile() -> Optional[cProfile.Profile]:
+    """A running profiler if CPROFILE_DIR is set."""
+    if CPROFILE_DIR is None:
+        return None
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def dump_cprofile(profiler: cProfile.Profile, name: str) -> str:
+    """Writes the statistics of the profiler so far to CPROFILE_DIR, as name.prof for pstats."""
+    os.makedirs(CPROFILE_DIR, exist_ok=True)
+    filename = os.path.join(CPROFILE_DIR, f"{name}.prof")
+    profiler.disable()
+    try:
+        profiler.dump_stats(filename)
+    finally:
+        profiler.enable()
+    return filename
+
+
+def report(main: Profile, workers: Dict[int, Profile], wall_time: float) -> Dict[str, Any]:
+    """The profile report: the lines totalled over the main process and the workers, and the lines of
+    every worker by process id."""
+    total = Profile()
+    total.merge(main)
+    for profile in workers.values():
+        total.merge(profile)
+    return {
+        'wall_time': wall_time,
+        'lines': total.to_dict(),
+        'workers': {str(pid): profile.to_dict() for pid, profile in sorted(workers.items())},
+    }
+
+
+def write_report(filename: str, data: Dict[str, Any]) -> None:
+    directory = os.path.dirname(filename) or '.'
+    with tempfile.NamedTemporaryFile('w', dir=directory, delete=False) as f:
+        json.dump(data, f, indent=1)
+    os.replace(f.name, filename)
@@ -0,0 +1,243 @@
+import collections
+import contextlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Deque, Dict, Generator, List, Optional, TextIO, Tuple
+
+# Progress of generate: trials done, throughput and ETA, as a line on the terminal and optionally as
+# a status file in the Prometheus text exposition format, e.g. for the textfile collector of the node
+# exporter. Workers count the trials they finish in a shared array, one slot per worker, which a
+# reporting thread of the main process reads; see WorkerPool.trials_done.
+
+# Progress of the innermost open reporting block
+PROGRESS: Optional['Progress'] = None
+# Seconds between two reports
+INTERVAL = 10.0
+# Seconds of history the throughput is averaged over
+RATE_WINDOW = 60.0
+
+
+class Progress(object):
+    """Trials done in the experiments of a run, by experiment line: the experiments function that
+    called figure2a_experiment.
+
+    The main thread reports experiments and batches as they start and finish, a reporting thread
+    reads the trials done by the pool of the current batch.
+    """
+    __slots__ = [
+        'lock', 'start_time', 'expected', 'experiments', 'trials', 'lines', 'label', 'experiment_trials',
+        'experiment_done', 'pool', 'pool_base', 'samples'
+    ]
+
+    lock: threading.Lock
+    start_time: float
+    # Trials the run is expected to take at most, None if unknown
+    expected: Optional[int]
+    # Experiments and trials finished, in total and by line
+    experiments: int
+    trials: int
+    lines: Dict[str, List[int]]
+    # Line and trials of the current experiment, and those of its trials done in finished batches
+    label: Optional[str]
+    experiment_trials: int
+    experiment_done: int
+    # Pool running the current batch and its trials_done when the batch started
+    pool: Any
+    pool_base: int
+    # (time, trials done) of recent reports, for the throughput
+    samples: Deque[Tuple[float, int]]
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+        self.expected = None
+        self.experiments = 0
+        self.trials = 0
+        self.lines = {}
+        self.label = None
+        self.experiment_trials = 0
+        self.experiment_done = 0
+        self.pool = None
+        self.pool_base = 0
+        self.samples = collections.deque([(self.start_time, 0)])
+
+    def expect(self, n_trials: int) -> None:
+        """Sets the trials the rest of the run takes at most, for its ETA."""
+        with self.lock:
+            self.expected = self.trials + n_trials
+
+    def start_experiment(self, label: str, n_trials: int) -> None:
+        with self.lock:
+            self.label = label
+            self.experiment_trials = n_trials
+            self.experiment_done = 0
+
+    def finish_experiment(self) -> None:
+        with self.lock:
+            line = self.lines.setdefault(self.label, [0, 0])
+            line[0] += 1
+            line[1] += self.experiment_done
+            self.experiments += 1
+            self.trials += self.experiment_done
+            self.label = None
+            self.experiment_trials = self.experiment_done = 0
+
+    def start_batch(self, pool: Any) -> None:
+        with self.lock:
+            self.pool = pool
+            self.pool_base = pool.trials_done()
+
+    def finish_batch(self, n_trials: int) -> None:
+        with self.lock:
+            self.pool = None
+            self.experiment_done += n_trials
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Progress so far, with the throughput over the last RATE_WINDOW seconds and the ETAs of
+        the current experiment and of the run, None where unknown."""
+        now = time.time()
+        with self.lock:
+            running = self.pool.trials_done() - self.pool_base if self.pool is not None else 0
+            experiment_done = min(self.experiment_done + running, self.experiment_trials)
+            trials = self.trials + experiment_done
+            samples = self.samples
+            samples.append((now, trials))
+            while len(samples) > 2 and samples[1][0] <= now - RATE_WINDOW:
+                samples.popleft()
+            lines = {label: list(line) for label, line in self.lines.items()}
+            if self.label is not None:
+                line = lines.setdefault(self.label, [0, 0])
+                line[1] += experiment_done
+            first_time, first_trials = samples[0]
+            rate = (trials - first_trials) / (now - first_time) if now > first_time else 0.0
+            return {
+                'time': now,
+                'elapsed': now - self.start_time,
+                'start_time': self.start_time,
+                'trials': trials,
+                'expected': self.expected,
+                'experiments': self.experiments,
+                'rate': rate,
+                'line': self.label,
+                'experiment_trials': self.experiment_trials,
+                'experiment_done': experiment_done,
+                'experiment_eta': eta(self.experiment_trials - experiment_done, rate) if self.label else None,
+                'eta': eta(self.expected - trials, rate) if self.expected is not None else None,
+                'lines': lines,
+            }
+
+
+def eta(n_trials: int, rate: float) -> Optional[float]:
+    if n_trials <= 0:
+        return 0.0
+    return n_trials / rate if rate > 0 else None
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return '?'
+    seconds = int(round(seconds))
+    return f"{seconds // 3600}:{seconds // 60 % 60:02}:{seconds % 60:02}"
+
+
+def format_line(status: Dict[str, Any]) -> str:
+    """One terminal line of the status."""
+    text = f"[{format_duration(status['elapsed'])}] {status['trials']} trials"
+    if status['expected']:
+        text += f" of {status['expected']} ({100 * min(status['trials'] / status['expected'], 1):.1f}%)"
+    text += f", {status['rate']:.1f} trials/s"
+    if status['line'] is not None:
+        text += (f"; {status['line']} #{status['lines'][status['line']][0] + 1}: "
+                 f"{status['experiment_done']}/{status['experiment_trials']}, "
+                 f"ETA {format_duration(status['experiment_eta'])}")
+    if status['expected']:
+        text += f"; run ETA {format_duration(status['eta'])}"
+    return text
+
+
+def format_metrics(status: Dict[str, Any]) -> str:
+    """The status in the Prometheus text exposition format."""
+    def metric(name: str, kind: str, help_text: str, samples: List[Tuple[str, Any]]) -> List[str]:
+        lines = [f"# HELP bgpsecsim_{name} {help_text}", f"# TYPE bgpsecsim_{name} {kind}"]
+        for labels, value in samples:
+            if value is None:
+                text = 'NaN'
+            elif isinstance(value, int):
+                text = str(value)
+            else:
+                text = repr(float(value))
+            lines.append(f"bgpsecsim_{name}{labels} {text}")
+        return lines
+
+    def line_label(label: str) -> str:
+        return '{line="' + label.replace('\\', '\\\\').replace('"', '\\"') + '"}'
+
+    line_items = sorted(status['lines'].items())
+    return '\n'.join(
+        metric('start_time_seconds', 'gauge', "Start of the run, in seconds since the epoch.",
+               [('', status['start_time'])]) +
+        metric('trials_done_total', 'counter', "Trials done.", [('', status['trials'])]) +
+        metric('trials_expected', 'gauge', "Trials the run takes at most, NaN if unknown.",
+               [('', status['expected'])]) +
+        metric('experiments_done_total', 'counter', "Experiments done.", [('', status['experiments'])]) +
+        metric('trials_per_second', 'gauge', f"Trials done per second over the last {RATE_WINDOW:g} seconds.",
+               [('', status['rate'])]) +
+        metric('experiment_trials', 'gauge', "Trials of the current experiment.",
+               [('', status['experiment_trials'])]) +
+        metric('experiment_trials_done', 'gauge', "Trials of the current experiment done.",
+               [('', status['experiment_done'])]) +
+        metric('eta_seconds', 'gauge', "Seconds until the run is done, NaN if unknown.", [('', status['eta'])]) +
+        metric('line_experiments_done_total', 'counter', "Experiments done by line.",
+               [(line_label(label), line[0]) for label, line in line_items]) +
+        metric('line_trials_done_total', 'counter', "Trials done by line.",
+               [(line_label(label), line[1]) for label, line in line_items])
+    ) + '\n'
+
+
+def write_status(filename: str, status: Dict[str, Any]) -> None:
+    """Replaces the status file at once, so scrapers never read half of it. The file is readable by
+    everyone, like files the node exporter's textfile collector reads usually are."""
+    directory = os.path.dirname(filename) or '.'
+    with tempfile.NamedTemporaryFile('w', dir=directory, prefix='.', suffix='.tmp', delete=False) as f:
+        f.write(format_metrics(status))
+    # Temporary files are only readable by their owner
+    os.chmod(f.name, 0o644)
+    os.replace(f.name, filename)
+
+
+@contextlib.contextmanager
+def reporting(
+        interval: float = INTERVAL,
+        status_file: Optional[str] = None,
+        output: Optional[TextIO] = sys.stderr
+) -> Generator[Progress, None, None]:
+    """Reports the progress of the experiments in the block every interval seconds, as a line on
+    output and in the status file, and once more at the end."""
+    global PROGRESS
+    progress = Progress()
+    stopped = threading.Event()
+
+    def report() -> None:
+        status = progress.snapshot()
+        if output is not None:
+            print(format_line(status), file=output, flush=True)
+        if status_file is not None:
+            write_status(status_file, status)
+
+    def run() -> None:
+        while not stopped.wait(interval):
+            report()
+
+    thread = threading.Thread(target=run, daemon=True)
+    previous, PROGRESS = PROGRESS, progress
+    thread.start()
+    try:
+        yield progress
+    finally:
+        PROGRESS = previous
+        stopped.set()
+        thread.join()
+        report()
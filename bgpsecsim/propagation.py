@@ -0,0 +1,196 @@
+from typing import Dict, Iterable, List, Optional, Set, TYPE_CHECKING
+
+from bgpsecsim.asys import AS, AS_ID, RELATIONS, Relation, Route
+from bgpsecsim.routing_policy import (
+    ASPAPolicy, DefaultPolicy, PathEndValidationPolicy, RPKIPolicy, LOCAL_PREF, NEXT_HOP, PATH_LENGTH
+)
+
+if TYPE_CHECKING:
+    from bgpsecsim.as_graph import ASGraph
+    from bgpsecsim.profiling import PropagationStats
+
+# Routing models selectable on an ASGraph. The queue model is the simulator's BGP: routes are learned
+# and passed on in the order they are queued. The stable model computes the routes every AS settles on
+# when routing is stable under valley-free export, a different model with different results.
+QUEUE = 'queue'
+STABLE = 'stable'
+MODELS = (QUEUE, STABLE)
+
+# Policies that forward valley-free. With routes ranked by local preference, then path length, then
+# next hop AS number, routes settle in customer, peer, provider order.
+STABLE_POLICIES = (DefaultPolicy, RPKIPolicy, PathEndValidationPolicy, ASPAPolicy)
+STABLE_PREFERENCE = (LOCAL_PREF, PATH_LENGTH, NEXT_HOP)
+
+
+def supports(graph: 'ASGraph') -> bool:
+    """Whether every AS has a policy of the stable model."""
+    return all(type(asys.policy) in STABLE_POLICIES and asys.policy.preference == STABLE_PREFERENCE
+               for asys in graph.by_index)
+
+
+def find_routes_to(graph: 'ASGraph', target: AS) -> None:
+    """Stable model counterpart of ASGraph.find_routes_to."""
+    _check_supported(graph)
+    _StablePropagation(graph, target.as_id, {target: {neighbor: target.originate_route(neighbor)
+                                                   for neighbor in _all_neighbors(target)}}).run()
+
+
+def hijack(graph: 'ASGraph', victim: AS, attacker: AS, bad_route: Route) -> None:
+    """Stable model counterpart of ASGraph.hijack_n_hops.
+
+    Routes are recomputed for the victim's announcement and the attacker's bad route together. Like
+    in the queue model, the attacker keeps the route it had before the hijack.
+    """
+    _check_supported(graph)
+    _StablePropagation(graph, victim.as_id, {
+        victim: {neighbor: victim.originate_route(neighbor)
+                 for neighbor in _all_neighbors(victim)},
+        attacker: {neighbor: attacker.forward_route(bad_route, neighbor)
+                   for neighbor in _all_neighbors(attacker)
+                   if not bad_route.contains(neighbor)},
+    }).run()
+
+
+def _check_supported(graph: 'ASGraph') -> None:
+    if not supports(graph):
+        raise ValueError("the stable model needs every AS to use DefaultPolicy, RPKIPolicy, "
+                         "PathEndValidationPolicy or ASPAPolicy with the default preference")
+
+
+def _all_neighbors(asys: AS) -> Iterable[AS]:
+    for relation in RELATIONS:
+        yield from asys.get_neighbors(relation)
+
+
+class _StablePropagation(object):
+    """Settle-once propagation of the announcements for one destination.
+
+    Routes learned from customers are preferred over routes learned from peers, which are preferred
+    over routes learned from providers, and valley-free export means a route learned from a peer or
+    provider is only passed on to customers. So every AS settles its best route exactly once if
+    routes are propagated customer to provider first, then across peers, then provider to customer,
+    each phase in order of path length. The next hop AS number breaks ties between equally long
+    routes, which is why offers are tracked by sender and routes are only built while choosing.
+
+    The outcome differs from the queue model's, which lets an AS keep its older, shorter path when
+    its next hop later switches to a longer but more preferred route. Here every route extends the
+    next hop's settled route; on the 19980101 snapshot about a fifth of the legitimate routes differ.
+    """
+    __slots__ = ['graph', 'dest', 'announcements', 'chosen', 'pinned', 'stats']
+
+    graph: 'ASGraph'
+    dest: AS_ID
+    # Routes each origin sends to each of its neighbors
+    announcements: Dict[AS, Dict[AS, Route]]
+    # Settled route of every AS as stored, by index
+    chosen: List[Optional[Route]]
+    # Indices of the origins, which keep their current route
+    pinned: Set[int]
+    # Counters of the graph while profiling
+    stats: Optional['PropagationStats']
+
+    def __init__(self, graph: 'ASGraph', dest: AS_ID, announcements: Dict[AS, Dict[AS, Route]]):
+        self.graph = graph
+        self.dest = dest
+        self.announcements = announcements
+        self.chosen = [None] * len(graph.by_index)
+        self.pinned = set(origin.index for origin in announcements)
+        self.stats = graph.stats
+
+    def run(self) -> None:
+        # Phase 1: customer to provider
+        buckets: Dict[int, Dict[AS, List[AS]]] = {}
+        for origin in self.announcements:
+            for provider in origin.get_neighbors(Relation.PROVIDER):
+                self.add_offer(buckets, origin, provider)
+        uphill = self.walk(buckets, Relation.PROVIDER)
+
+        # Phase 2: across peers, only routes learned from customers and the origins' own
+        offers: Dict[AS, List[AS]] = {}
+        for sender in uphill + list(self.announcements):
+            for peer in sender.get_neighbors(Relation.PEER):
+                if self.is_offered(sender, peer):
+                    offers.setdefault(peer, []).append(sender)
+        for receiver, senders in offers.items():
+            self.settle(receiver, senders)
+
+        # Phase 3: provider to customer, from every AS that has a route
+        buckets = {}
+        for sender in self.graph.by_index:
+            if self.chosen[sender.index] is not None or sender in self.announcements:
+                for customer in sender.get_neighbors(Relation.CUSTOMER):
+                    self.add_offer(buckets, sender, customer)
+        self.walk(buckets, Relation.CUSTOMER)
+
+        for asys in self.graph.by_index:
+            if self.chosen[asys.index] is None and asys.index not in self.pinned:
+                asys.withdraw_route(self.dest)
+
+    def is_settled(self, asys: AS) -> bool:
+        return self.chosen[asys.index] is not None or asys.index in self.pinned
+
+    def is_offered(self, sender: AS, receiver: AS) -> bool:
+        """Whether the sender has a route to offer the receiver, which does not contain it already."""
+        if self.is_settled(receiver):
+            return False
+        announced = self.announcements.get(sender)
+        if announced is not None:
+            return receiver in announced
+        return not self.chosen[sender.index].contains(receiver)
+
+    def offer_length(self, sender: AS, receiver: AS) -> int:
+        announced = self.announcements.get(sender)
+        if announced is not None:
+            return announced[receiver].length
+        return self.chosen[sender.index].length + 1
+
+    def offer(self, sender: AS, receiver: AS) -> Route:
+        announced = self.announcements.get(sender)
+        if announced is not None:
+            return announced[receiver]
+        return sender.forward_route(self.chosen[sender.index], receiver)
+
+    def add_offer(self, buckets: Dict[int, Dict[AS, List[AS]]], sender: AS, receiver: AS) -> None:
+        if self.is_offered(sender, receiver):
+            length = self.offer_length(sender, receiver)
+            buckets.setdefault(length, {}).setdefault(receiver, []).append(sender)
+
+    def settle(self, receiver: AS, senders: List[AS]) -> Optional[Route]:
+        """Chooses the shortest acceptable offer, the one from the lowest AS number on ties."""
+        senders.sort(key=lambda sender: (self.offer_length(sender, receiver), sender.as_id))
+        for n_rejected, sender in enumerate(senders):
+            route = self.offer(sender, receiver)
+            if receiver.policy.accept_route(route):
+                # Routes are stored as they settle, no AS looks at the route of an unsettled AS
+                receiver.force_route(route)
+                route = self.chosen[receiver.index] = receiver.get_route(self.dest)
+                self.count(len(senders), n_rejected, len(senders) - n_rejected - 1)
+                return route
+        self.count(len(senders), len(senders), 0)
+        return None
+
+    def count(self, n_offered: int, n_rejected_accept: int, n_rejected_prefer: int) -> None:
+        """Counts offers into the stats while profiling. Offers ranked behind the settled route, and
+        those to settled ASs, count as rejected by preference."""
+        stats = self.stats
+        if stats is not None:
+            stats.offered += n_offered
+            stats.rejected_accept += n_rejected_accept
+            stats.rejected_prefer += n_rejected_prefer
+
+    def walk(self, buckets: Dict[int, Dict[AS, List[AS]]], relation: Relation) -> List[AS]:
+        """Settles offers in order of path length, passing each settled route on to the neighbors of
+        the given relation. Returns the newly settled ASs."""
+        settled = []
+        while buckets:
+            length = min(buckets)
+            for receiver, senders in buckets.pop(length).items():
+                if self.is_settled(receiver):
+                    self.count(len(senders), 0, len(senders))
+                    continue
+                if self.settle(receiver, senders) is None:
+                    continue
+                settled.append(receiver)
+                for neighbor in receiver.get_neighbors(relation):
+                    self.add_offer(buckets, receiver, neighbor)
+        return settled
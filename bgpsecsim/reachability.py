@@ -0,0 +1,129 @@
+import numpy as np
+from typing import List, Tuple
+
+from bgpsecsim.asys import Relation
+from bgpsecsim.topology import Topology
+
+# An AS can reach a destination if there is a valley-free path to it: up through providers, across
+# at most one peer link, then down through customers. So the ASs that can reach t are the customer
+# cones of t, of its direct and indirect providers and of the peers of all those:
+#   L[a] = {a} | L[customers of a]
+#   R[t] = L[t] | L[peers of t] | R[providers of t]
+# For all ASs at once, L and R are computed as bit matrices with one row per AS, for a block of
+# source ASs (the columns) at a time to bound memory.
+
+# Source ASs per block, a multiple of 64
+BLOCK_SIZE = 4096
+# Rows gathered at a time while combining rows, bounds the temporary arrays
+CHUNK_ROWS = 1 << 16
+
+# Number of set bits of every byte
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+# Rows to update, the rows to OR into each of them and the start of each row's group
+_Step = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def gather(offsets: np.ndarray, indices: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Neighbors of the given rows of a CSR, concatenated, and the offsets of each row's neighbors."""
+    starts = offsets[rows].astype(np.int64)
+    lengths = offsets[rows + 1] - starts
+    segments = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=segments[1:])
+    positions = np.arange(segments[-1]) + np.repeat(starts - segments[:-1], lengths)
+    return indices[positions], segments
+
+
+def reachable_from(topology: Topology, index: int) -> np.ndarray:
+    """Mask of the ASs that can reach the AS with the given index, itself included."""
+    n = len(topology)
+    provider_offsets, provider_indices = topology.partition(Relation.PROVIDER)
+    peer_offsets, peer_indices = topology.partition(Relation.PEER)
+    customer_offsets, customer_indices = topology.partition(Relation.CUSTOMER)
+
+    uphill = np.zeros(n, dtype=bool)
+    uphill[index] = True
+    frontier = np.array([index])
+    while frontier.size:
+        providers, _ = gather(provider_offsets, provider_indices, frontier)
+        frontier = np.unique(providers[~uphill[providers]])
+        uphill[frontier] = True
+
+    reachable = uphill.copy()
+    peers, _ = gather(peer_offsets, peer_indices, np.flatnonzero(uphill))
+    reachable[peers] = True
+    frontier = np.flatnonzero(reachable)
+    while frontier.size:
+        customers, _ = gather(customer_offsets, customer_indices, frontier)
+        frontier = np.unique(customers[~reachable[customers]])
+        reachable[frontier] = True
+    return reachable
+
+
+def _levels(topology: Topology, relation: Relation) -> List[np.ndarray]:
+    """Groups the ASs so that all neighbors of the given relation of an AS are in earlier groups,
+    starting with the ASs that have none."""
+    n = len(topology)
+    reverse_offsets, reverse_indices = topology.partition(
+        Relation.PROVIDER if relation == Relation.CUSTOMER else Relation.CUSTOMER)
+    remaining = topology.degrees(relation).astype(np.int64)
+    level = np.flatnonzero(remaining == 0)
+    levels = []
+    done = 0
+    while level.size:
+        levels.append(level)
+        done += level.size
+        dependents, _ = gather(reverse_offsets, reverse_indices, level)
+        remaining -= np.bincount(dependents, minlength=n)
+        dependents = np.unique(dependents)
+        level = dependents[remaining[dependents] == 0]
+    if done != n:
+        raise ValueError("the topology has a customer-provider cycle")
+    return levels
+
+
+def _steps(topology: Topology, relation: Relation, groups: List[np.ndarray]) -> List[_Step]:
+    """Splits the groups of rows into steps of at most about CHUNK_ROWS neighbors."""
+    offsets, indices = topology.partition(relation)
+    steps = []
+    for rows in groups:
+        rows = rows[offsets[rows + 1] > offsets[rows]]
+        ends = np.cumsum(offsets[rows + 1] - offsets[rows])
+        start = 0
+        while start < len(rows):
+            gathered = ends[start - 1] if start else 0
+            end = max(start + 1, int(np.searchsorted(ends, gathered + CHUNK_ROWS, side='right')))
+            neighbors, segments = gather(offsets, indices, rows[start:end])
+            steps.append((rows[start:end], neighbors, segments[:-1]))
+            start = end
+    return steps
+
+
+def _apply(source: np.ndarray, target: np.ndarray, steps: List[_Step]) -> None:
+    for rows, neighbors, segments in steps:
+        target[rows] |= np.bitwise_or.reduceat(source[neighbors], segments, axis=0)
+
+
+def reachable_counts(topology: Topology, block_size: int = BLOCK_SIZE) -> np.ndarray:
+    """Number of ASs that can reach each AS, themselves included, by AS index."""
+    if block_size < 1 or block_size % 64:
+        raise ValueError("block_size must be a positive multiple of 64")
+    n = len(topology)
+    # Customers before their providers for L, providers before their customers for R
+    cone_steps = _steps(topology, Relation.CUSTOMER, _levels(topology, Relation.CUSTOMER)[1:])
+    peer_steps = _steps(topology, Relation.PEER, [np.arange(n)])
+    uphill_steps = _steps(topology, Relation.PROVIDER, _levels(topology, Relation.PROVIDER)[1:])
+
+    counts = np.zeros(n, dtype=np.int64)
+    for start in range(0, n, block_size):
+        width = min(block_size, n - start)
+        columns = np.arange(width)
+        cones = np.zeros((n, (width + 63) // 64), dtype=np.uint64)
+        cones[start + columns, columns // 64] = np.left_shift(np.uint64(1), (columns % 64).astype(np.uint64))
+        _apply(cones, cones, cone_steps)
+
+        reachable = cones.copy()
+        _apply(cones, reachable, peer_steps)
+        _apply(reachable, reachable, uphill_steps)
+        counts += _POPCOUNT[reachable.view(np.uint8)].sum(axis=1, dtype=np.int64)
+    return counts
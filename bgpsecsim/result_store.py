@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterator, List, Tuple
+
+from bgpsecsim.error import ResultStoreMismatch
+
+# First line of a store, followed by the JSON of its metadata
+HEADER = '# bgpsecsim results '
+# Rows written between two fsyncs
+SYNC_EVERY = 16
+
+Key = Tuple[int, ...]
+
+
+def trials_digest(trials: List[Tuple[Any, ...]]) -> str:
+    """SHA-256 of a trial list, equal for equal trials in equal order."""
+    sha = hashlib.sha256()
+    for trial in trials:
+        sha.update((','.join(str(value) for value in trial) + '\n').encode())
+    return sha.hexdigest()
+
+
+def is_store(filename: str) -> bool:
+    with open(filename) as f:
+        return f.readline().startswith(HEADER)
+
+
+def read(filename: str) -> Tuple[Dict[str, Any], Dict[Key, float]]:
+    """Metadata and results of a store. A last row without a line end, cut off by a crash, is
+    ignored."""
+    results: Dict[Key, float] = {}
+    with open(filename) as f:
+        header = f.readline()
+        if not header.startswith(HEADER):
+            raise ResultStoreMismatch(filename, "not a result store")
+        meta = json.loads(header[len(HEADER):])
+        for line in f:
+            if not line.endswith('\n'):
+                break
+            *key, value = line.split(',')
+            results[tuple(int(field) for field in key)] = float(value)
+    return meta, results
+
+
+class ResultStore(object):
+    """Append-only CSV file of the result of every completed configuration of an experiment grid.
+
+    The first line holds the metadata of the run (seed, topology digest, trials digest, ...), every
+    further line one configuration as its integer key fields followed by its result. Rows are
+    fsynced in batches of sync_every, so a crash loses at most the last batch. A store opened with
+    resume keeps the rows of an earlier run with the same metadata, so that run is continued
+    instead of started over.
+    """
+    __slots__ = ['filename', 'meta', 'results', 'file', 'sync_every', 'n_unsynced']
+
+    filename: str
+    meta: Dict[str, Any]
+    results: Dict[Key, float]
+    file: Any
+    sync_every: int
+    # Rows written since the last fsync
+    n_unsynced: int
+
+    def __init__(self, filename: str, meta: Dict[str, Any], resume: bool = False, sync_every: int = SYNC_EVERY):
+        self.filename = filename
+        self.meta = json.loads(json.dumps(meta))
+        self.results = {}
+        self.sync_every = sync_every
+        self.n_unsynced = 0
+
+        if resume and os.path.exists(filename):
+            stored_meta, self.results = read(filename)
+            if stored_meta != self.meta:
+                differences = sorted(key for key in set(stored_meta) | set(self.meta)
+                                     if stored_meta.get(key) != self.meta.get(key))
+                raise ResultStoreMismatch(filename, "stored for a different run: " + ", ".join(differences))
+            self.file = open(filename, 'r+')
+            # Drop a row cut off by a crash
+            self.file.seek(0)
+            end = 0
+            for line in iter(self.file.readline, ''):
+                if line.endswith('\n'):
+                    end = self.file.tell()
+            self.file.seek(end)
+            self.file.truncate()
+        else:
+            self.file = open(filename, 'w')
+            self.file.write(HEADER + json.dumps(self.meta, sort_keys=True) + '\n')
+            self.sync()
+
+    def __contains__(self, key: Key) -> bool:
+        return key in self.results
+
+    def __getitem__(self, key: Key) -> float:
+        return self.results[key]
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def __iter__(self) -> Iterator[Key]:
+        return iter(self.results)
+
+    def __enter__(self) -> 'ResultStore':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def append(self, key: Key, result: float) -> None:
+        key = tuple(int(field) for field in key)
+        result = float(result)
+        if key in self.results:
+            raise ValueError(f"{key} is already stored")
+        self.file.write(','.join(str(field) for field in key) + f',{result!r}\n')
+        self.results[key] = result
+        self.n_unsynced += 1
+        if self.n_unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self) -> None:
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.n_unsynced = 0
+
+    def close(self) -> None:
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
@@ -1,9 +1,42 @@
-from typing import Callable, Generator
+import operator
+from typing import Any, Callable, Optional, Sequence, Tuple
 
 from bgpsecsim.asys import Relation, Route, RoutingPolicy
 
+# Criteria routes are ranked by. For each, routes with lower values are preferred:
+# Authenticated routes (0) over unauthenticated ones (1)
+AUTHENTICATED = 'authenticated'
+# Local preference, routes from customers over routes from peers over routes from providers
+LOCAL_PREF = 'local_pref'
+# Shorter AS paths
+PATH_LENGTH = 'path_length'
+# Lower AS number of the next hop, the final tie-break
+NEXT_HOP = 'next_hop'
+
+PREFERENCE_CRITERIA = (AUTHENTICATED, LOCAL_PREF, PATH_LENGTH, NEXT_HOP)
+
+
+def compile_preference(preference: Sequence[str]) -> Callable[[tuple], Any]:
+    """Compiles a rule order into a function that picks the values of the given criteria, in that
+    order, from a tuple holding the values of all PREFERENCE_CRITERIA. The result of the function is
+    compared as a whole."""
+    if not preference:
+        raise ValueError("preference needs at least one criterion")
+    unknown = [criterion for criterion in preference if criterion not in PREFERENCE_CRITERIA]
+    if unknown:
+        raise ValueError(f"unknown preference criteria: {', '.join(unknown)}")
+    return operator.itemgetter(*(PREFERENCE_CRITERIA.index(criterion) for criterion in preference))
+
 
 class DefaultPolicy(RoutingPolicy):
+    # Order in which routes are compared, subclasses or the preference argument may reorder it
+    preference: Tuple[str, ...] = (LOCAL_PREF, PATH_LENGTH, NEXT_HOP)
+
+    def __init__(self, preference: Optional[Sequence[str]] = None):
+        if preference is not None:
+            self.preference = tuple(preference)
+        self._arrange = compile_preference(self.preference)
+
     def accept_route(self, route: Route) -> bool:
         # not in combination with return, inverts the value
         return not route.contains_cycle()
@@ -14,18 +47,18 @@ class DefaultPolicy(RoutingPolicy):
         # assert triggers error as soon as condition is false, in this case, if both final AS aren't the same
         assert current.final == new.final, "routes must have same final AS"
 
-        for rule in self.preference_rules():
-            current_val = rule(current)
-            new_val = rule(new)
+        return self.preference_key(new) < self.preference_key(current)
 
-            if current_val is not None:
-                if new_val is not None:
-                    if current_val < new_val:
-                        return False
-                    if new_val < current_val:
-                        return True
-
-        return False
+    def preference_key(self, route: Route) -> Any:
+        """Key of a route, of two routes at the same AS the one with the lower key is preferred."""
+        first_hop = route.first_hop
+        relation = route.final.get_relation(first_hop)
+        return self._arrange((
+            not route.authenticated,
+            relation.value if relation else -1,
+            route.length,
+            first_hop.as_id,
+        ))
 
     def forward_to(self, route: Route, relation: Relation) -> bool:
         asys = route.final
@@ -34,19 +67,6 @@ class DefaultPolicy(RoutingPolicy):
 
         return first_hop_rel == Relation.CUSTOMER or relation == Relation.CUSTOMER
 
-    # Generators are iterators, a kind of iterable you can only iterate over once.
-    # Generators do not store all the values in memory, they generate the values on the fly:
-    def preference_rules(self) -> Generator[Callable[[Route], int], None, None]:
-        # 1. Local preferences
-        def local_pref(route):
-            relation = route.final.get_relation(route.first_hop)
-            return relation.value if relation else -1
-        yield local_pref
-        # 2. AS-path length
-        yield lambda route: route.length
-        # 3. Next hop AS number
-        yield lambda route: route.first_hop.as_id
-
 
 class RPKIPolicy(DefaultPolicy):
     def accept_route(self, route: Route) -> bool:
@@ -59,111 +79,38 @@ class PathEndValidationPolicy(DefaultPolicy):
 
 
 class BGPsecHighSecPolicy(DefaultPolicy):
+    # Prefer authenticated routes above all
+    preference = (AUTHENTICATED, LOCAL_PREF, PATH_LENGTH, NEXT_HOP)
+
     def accept_route(self, route: Route) -> bool:
         # Rule should actually be to reject unauthenticated routes if all ASs on it have
         # bgp_sec_enabled, but that is less convenient in our simulation.
         return super().accept_route(route) and not route.origin_invalid
 
-    # Lambda takes several arguments, but only has one expression
-    def preference_rules(self) -> Generator[Callable[[Route], int], None, None]:
-        # Prefer authenticated routes
-        yield lambda route: not route.authenticated
-
-        # 1. Local preferences
-        def local_pref(route):
-            relation = route.final.get_relation(route.first_hop)
-            return relation.value if relation else -1
-        yield local_pref
-        # 2. AS-path length
-        yield lambda route: route.length
-        # 3. Next hop AS number
-        yield lambda route: route.first_hop.as_id
-
 
 class BGPsecMedSecPolicy(DefaultPolicy):
+    # Prefer authenticated routes after local preferences
+    preference = (LOCAL_PREF, AUTHENTICATED, PATH_LENGTH, NEXT_HOP)
+
     def accept_route(self, route: Route) -> bool:
         # Rule should actually be to reject unauthenticated routes if all ASs on it have
         # bgp_sec_enabled, but that is less convenient in our simulation.
         return super().accept_route(route) and not route.origin_invalid
 
-    def preference_rules(self) -> Generator[Callable[[Route], int], None, None]:
-        # 1. Local preferences
-        def local_pref(route):
-            relation = route.final.get_relation(route.first_hop)
-            return relation.value if relation else -1
-        yield local_pref
-        # Prefer authenticated routes
-        yield lambda route: not route.authenticated
-        # 2. AS-path length
-        yield lambda route: route.length
-        # 3. Next hop AS number
-        yield lambda route: route.first_hop.as_id
-
 
 class BGPsecLowSecPolicy(DefaultPolicy):
+    # Prefer authenticated routes only over equally long ones
+    preference = (LOCAL_PREF, PATH_LENGTH, AUTHENTICATED, NEXT_HOP)
+
     def accept_route(self, route: Route) -> bool:
         # Rule should actually be to reject unauthenticated routes if all ASs on it have
         # bgp_sec_enabled, but that is less convenient in our simulation.
         return super().accept_route(route) and not route.origin_invalid
 
-    def preference_rules(self) -> Generator[Callable[[Route], int], None, None]:
-        # 1. Local preferences
-        def local_pref(route):
-            relation = route.final.get_relation(route.first_hop)
-            return relation.value if relation else -1
-        yield local_pref
-        # 2. AS-path length
-        yield lambda route: route.length
-        # Prefer authenticated routes
-        yield lambda route: not route.authenticated
-        # 3. Next hop AS number
-        yield lambda route: route.first_hop.as_id
-
 
 class ASPAPolicy(DefaultPolicy):
 
     def accept_route(self, route: Route) -> bool:
-        aspa_unknown = False
-        aspa_valid = False
-        aspa_invalid = False
-        aspa_valley_down = False
-
-        for index, r in enumerate(route.path):
-            if index + 1 < len(route.path):
-                # prev_el = route.path[index - 1]
-                curr_el = r
-                next_el = route.path[index + 1]
-            else:
-                break
-            if curr_el.aspa_enabled:
-                a = curr_el.get_aspa_providers()
-                # No ASPA Object present for current AS, in reality does not implement ASPA
-                if len(a) == 0:
-                    aspa_unknown = True
-                else:
-                    for elements in a:
-                        # Next AS is provider of the current AS, UPSTREAM
-                        if next_el.as_id == elements:
-                            if not aspa_valley_down:
-                                aspa_valid = True
-                            else:
-                                aspa_invalid = True
-                        # Current and Next AS are PEERs
-                        elif next_el.get_relation(curr_el) == 2:
-                            aspa_valid = True
-                            aspa_valley_down = True
-                        # Current AS is provider of the next AS, DOWNSTREAM
-                        else:
-                            for elementsNew in next_el.get_aspa_providers():
-                                if curr_el.as_id == elementsNew:
-                                    aspa_valid = True
-                                    aspa_valley_down = True
-                                    break
-                                else:
-                                    aspa_invalid = True
-            # If ASPA Flag is not set, so AS is seen as not implementing ASPA currently, returns status UNKNOWN
-            else:
-                aspa_unknown = True
-
-            # Accepts the route if none of the elements with ASPA activated has returned INVALID
-        return super().accept_route(route) and not route.origin_invalid and not aspa_invalid
\ No newline at end of file
+        # Accepts the route unless the hops of the ASs with ASPA enabled on it show a valley
+        return (super().accept_route(route) and not route.origin_invalid
+                and route.final.graph.get_aspa_index().verify(route))
@@ -0,0 +1,537 @@
+from collections import deque
+from itertools import chain
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple, Union, TYPE_CHECKING
+
+from bgpsecsim.asys import AS, AS_ID, PATH_FILTER_BITS, Relation, Route, RoutingPolicy
+from bgpsecsim.error import StaleRouteError
+from bgpsecsim.routing_policy import (
+    ASPAPolicy, BGPsecHighSecPolicy, BGPsecLowSecPolicy, BGPsecMedSecPolicy, DefaultPolicy, PathEndValidationPolicy,
+    RPKIPolicy, compile_preference
+)
+
+if TYPE_CHECKING:
+    from bgpsecsim.as_graph import ASGraph
+    from bgpsecsim.profiling import PropagationStats
+
+# Bits of RoutingState.flags
+ORIGIN_INVALID = 1
+PATH_END_INVALID = 2
+AUTHENTICATED = 4
+# The attacker of the graph's current trial is on the path
+TAINTED = 8
+# Some AS appears on the path more than once
+CYCLIC = 16
+
+# Next hop and predecessor of routes that extend no other route
+NONE = -1
+
+# Fields of the records of replaced routes
+_NEXT_HOP, _LENGTH, _FLAGS, _PATH_FILTER, _PREDECESSOR = range(5)
+Record = Tuple[int, int, int, int, int]
+
+# Flags of the routes each policy's accept_route rejects, for the policies RoutingState.propagate
+# applies itself; they must agree with accept_route. ASPAPolicy also checks the path against ASPA.
+POLICY_REJECTS = {
+    DefaultPolicy: CYCLIC,
+    RPKIPolicy: CYCLIC | ORIGIN_INVALID,
+    PathEndValidationPolicy: CYCLIC | PATH_END_INVALID,
+    BGPsecHighSecPolicy: CYCLIC | ORIGIN_INVALID,
+    BGPsecMedSecPolicy: CYCLIC | ORIGIN_INVALID,
+    BGPsecLowSecPolicy: CYCLIC | ORIGIN_INVALID,
+    ASPAPolicy: CYCLIC | ORIGIN_INVALID,
+}
+
+# What RoutingState.propagate applies for a policy: the flags it rejects, its preference and whether
+# it checks routes against ASPA
+PolicyRule = Tuple[int, Callable[[tuple], Any], bool]
+
+# Queued route of RoutingState.propagate: reference of the route it extends, index of the AS passing
+# it on, index of the AS it is passed to, relation value of the former to the latter (-1 if they are
+# no neighbors), flags, length and path filter
+Offer = Tuple[int, int, int, int, int, int, int]
+
+
+def policy_rules(policies: List[RoutingPolicy]) -> Optional[List[PolicyRule]]:
+    """Rules of the given policies, None if one of them is not in POLICY_REJECTS."""
+    by_policy: Dict[int, PolicyRule] = {}
+    rules = []
+    for policy in policies:
+        rule = by_policy.get(id(policy))
+        if rule is None:
+            rejects = POLICY_REJECTS.get(type(policy))
+            if rejects is None:
+                return None
+            rule = by_policy[id(policy)] = (
+                rejects, compile_preference(policy.preference), type(policy) is ASPAPolicy)
+        rules.append(rule)
+    return rules
+
+
+def route_flags(route: Route) -> int:
+    """Flags of a route, as stored in RoutingState.flags."""
+    flags = 0
+    if route.origin_invalid:
+        flags |= ORIGIN_INVALID
+    if route.path_end_invalid:
+        flags |= PATH_END_INVALID
+    if route.authenticated:
+        flags |= AUTHENTICATED
+    if route.tainted:
+        flags |= TAINTED
+    if route.cyclic:
+        flags |= CYCLIC
+    return flags
+
+
+class RoutingState(object):
+    """Routes of every AS to one destination, in parallel lists indexed by AS index.
+
+    A route is stored as the AS it was learned from, its length, its flags and a reference to the
+    route it extends, so paths are rebuilt by following references. Reference version * N + index
+    refers to the route the AS with that index had at that version; the version of an AS is raised
+    whenever its route is replaced or withdrawn, and the route it had is kept in replaced for the
+    routes that extend it. Route objects that are not views of the state, like the bad route of a
+    hijack, are kept in replaced under negative references. Once routes have settled, compact drops
+    the replaced routes no route extends any more; following a reference to a dropped route raises
+    StaleRouteError.
+    """
+    __slots__ = [
+        'graph', 'dest', 'size', 'next_hop', 'length', 'flags', 'path_filter', 'predecessor', 'version',
+        'replaced', 'references', 'last_reference'
+    ]
+
+    graph: 'ASGraph'
+    dest: AS_ID
+    # Number of ASs
+    size: int
+    # Index of the AS the route was learned from
+    next_hop: List[int]
+    # Length of the path, 0 if the AS has no route
+    length: List[int]
+    flags: List[int]
+    # See Route.path_filter
+    path_filter: List[int]
+    # Reference of the route the route extends
+    predecessor: List[int]
+    version: List[int]
+    replaced: Dict[int, Union[Record, Route]]
+    # References of the Route objects in replaced, by id, and the last reference given out
+    references: Dict[int, int]
+    last_reference: int
+
+    def __init__(self, graph: 'ASGraph', dest: AS_ID):
+        n = len(graph.by_index)
+        self.graph = graph
+        self.dest = dest
+        self.size = n
+        self.next_hop = [NONE] * n
+        self.length = [0] * n
+        self.flags = [0] * n
+        self.path_filter = [0] * n
+        self.predecessor = [NONE] * n
+        self.version = [0] * n
+        self.replaced = {}
+        self.references = {}
+        self.last_reference = NONE
+
+    def copy(self) -> 'RoutingState':
+        state = RoutingState.__new__(RoutingState)
+        state.graph = self.graph
+        state.dest = self.dest
+        state.size = self.size
+        state.next_hop = self.next_hop.copy()
+        state.length = self.length.copy()
+        state.flags = self.flags.copy()
+        state.path_filter = self.path_filter.copy()
+        state.predecessor = self.predecessor.copy()
+        state.version = self.version.copy()
+        state.replaced = self.replaced.copy()
+        state.references = self.references.copy()
+        state.last_reference = self.last_reference
+        return state
+
+    def route(self, index: int) -> Optional['RouteView']:
+        """The route of the AS with the given index."""
+        if not self.length[index]:
+            return None
+        return RouteView(self, self.version[index] * self.size + index)
+
+    def resolve(self, ref: int) -> Optional[Route]:
+        """The route a reference refers to."""
+        if ref >= 0:
+            return RouteView(self, ref)
+        if ref == NONE:
+            return None
+        return self.replaced[ref]
+
+    def reference(self, route: Route) -> int:
+        if type(route) is RouteView and route.state is self:
+            return route.ref
+        ref = self.references.get(id(route))
+        if ref is None:
+            self.last_reference -= 1
+            ref = self.references[id(route)] = self.last_reference
+            self.replaced[ref] = route
+        return ref
+
+    def store(self, index: int, route: Route) -> None:
+        """Makes the route the route of the AS with the given index, counting it for the graph."""
+        graph = self.graph
+        if self.length[index]:
+            if self.flags[index] & TAINTED:
+                graph.n_tainted_routes -= 1
+            self._replace(index)
+        else:
+            graph.n_routes += 1
+
+        flags = route_flags(route)
+        if flags & TAINTED:
+            graph.n_tainted_routes += 1
+        parent = route.parent
+        self.next_hop[index] = NONE if parent is None else parent.final.index
+        self.length[index] = route.length
+        self.flags[index] = flags
+        self.path_filter[index] = route.path_filter
+        self.predecessor[index] = NONE if parent is None else self.reference(parent)
+
+    def withdraw(self, index: int) -> None:
+        if not self.length[index]:
+            return
+        graph = self.graph
+        graph.n_routes -= 1
+        if self.flags[index] & TAINTED:
+            graph.n_tainted_routes -= 1
+        self._replace(index)
+        self.length[index] = 0
+
+    def _replace(self, index: int) -> None:
+        self.replaced[self.version[index] * self.size + index] = (
+            self.next_hop[index], self.length[index], self.flags[index], self.path_filter[index],
+            self.predecessor[index])
+        self.version[index] += 1
+
+    def compact(self) -> None:
+        """Drops the replaced routes that no current route extends, directly or through other
+        replaced routes. Only called once no routes are queued, as queued routes may extend any
+        route; views of dropped routes must not be used afterwards."""
+        replaced = self.replaced
+        if not replaced:
+            return
+        predecessor = self.predecessor
+        kept: Dict[int, Union[Record, Route]] = {}
+        for index, length in enumerate(self.length):
+            if not length:
+                continue
+            # Replaced routes up to the first current or already kept one
+            ref = predecessor[index]
+            while ref in replaced and ref not in kept:
+                record = kept[ref] = replaced[ref]
+                if ref < 0:
+                    break
+                ref = record[_PREDECESSOR]
+        if len(kept) < len(replaced):
+            self.replaced = kept
+            self.references = {key: ref for key, ref in self.references.items() if ref in kept}
+
+    def check(self, ref: int) -> None:
+        """Raises StaleRouteError if the reference refers to a route compact has dropped."""
+        if ref >= 0 and ref not in self.replaced and ref // self.size != self.version[ref % self.size]:
+            raise StaleRouteError(f"route {ref} of the routing state to AS {self.dest} was dropped")
+
+    def contains(self, ref: int, asys: AS) -> bool:
+        """Whether the AS is on the path of the route the reference refers to."""
+        index = asys.index
+        n = self.size
+        replaced = self.replaced
+        predecessor = self.predecessor
+        version = self.version
+        while ref >= 0:
+            if ref % n == index:
+                return True
+            record = replaced.get(ref)
+            if record is None:
+                if ref // n != version[ref % n]:
+                    self.check(ref)
+                ref = predecessor[ref % n]
+            else:
+                ref = record[_PREDECESSOR]
+        return ref != NONE and replaced[ref].contains(asys)
+
+    def path(self, ref: int) -> List[AS]:
+        """The path of the route the reference refers to."""
+        path = list(self.walk_back(ref))
+        path.reverse()
+        return path
+
+    def walk_back(self, ref: int) -> Iterator[AS]:
+        """The ASs on the path of the route the reference refers to, from its final AS back to the
+        origin."""
+        by_index = self.graph.by_index
+        n = self.size
+        replaced = self.replaced
+        predecessor = self.predecessor
+        version = self.version
+        while ref >= 0:
+            yield by_index[ref % n]
+            record = replaced.get(ref)
+            if record is None:
+                if ref // n != version[ref % n]:
+                    self.check(ref)
+                ref = predecessor[ref % n]
+            else:
+                ref = record[_PREDECESSOR]
+        if ref != NONE:
+            yield from reversed(replaced[ref].path)
+
+    def taint(self, attacker: Optional[AS]) -> None:
+        """Sets the tainted flag of every route by whether the attacker is on its path, and counts the
+        routes for the graph."""
+        n = self.size
+        target = NONE if attacker is None else attacker.index
+        replaced = self.replaced
+        predecessor = self.predecessor
+        # Whether the route of each reference is tainted, filled in along the paths
+        tainted: Dict[int, bool] = {NONE: False}
+        for ref, route in replaced.items():
+            if ref < 0:
+                tainted[ref] = attacker is not None and route.contains(attacker)
+
+        def is_tainted(ref: int) -> bool:
+            chain = []
+            while ref not in tainted:
+                if ref % n == target:
+                    tainted[ref] = True
+                    break
+                chain.append(ref)
+                record = replaced.get(ref)
+                ref = predecessor[ref % n] if record is None else record[_PREDECESSOR]
+            value = tainted[ref]
+            for ref in chain:
+                tainted[ref] = value
+            return value
+
+        for ref, record in list(replaced.items()):
+            if ref >= 0:
+                flags = record[_FLAGS] & ~TAINTED | (TAINTED if is_tainted(ref) else 0)
+                replaced[ref] = record[:_FLAGS] + (flags,) + record[_FLAGS + 1:]
+
+        n_routes = 0
+        n_tainted_routes = 0
+        flags = self.flags
+        for index, (version, length) in enumerate(zip(self.version, self.length)):
+            if not length:
+                continue
+            n_routes += 1
+            if is_tainted(version * n + index):
+                flags[index] |= TAINTED
+                n_tainted_routes += 1
+            else:
+                flags[index] &= ~TAINTED
+        self.graph.n_routes = n_routes
+        self.graph.n_tainted_routes = n_tainted_routes
+
+    def propagate(self, routes: Deque[Route], stats: Optional['PropagationStats'] = None) -> bool:
+        """Passes the queued routes to the destination on like ASGraph._propagate, to the same routes
+        and counts, but works on indices: queued routes are Offer tuples and stored routes are
+        written to the lists directly, so no Route objects are made along the way.
+
+        Returns False without propagating if an AS has a policy not in POLICY_REJECTS, whose
+        accept_route may reject other routes.
+        """
+        graph = self.graph
+        by_index = graph.by_index
+        topology = graph.topology
+        policies = [asys.policy for asys in by_index]
+        if graph.policy_rules is None or graph.policy_rules[0] != policies:
+            rules = policy_rules(policies)
+            if rules is None:
+                return False
+            graph.policy_rules = (policies, rules, any(rule[2] for rule in rules))
+        _, rules, checks_aspa = graph.policy_rules
+        # Paths pass ASPA unless an AS on them has it enabled
+        aspa_index = None
+        if checks_aspa and any(asys.aspa_enabled for asys in by_index):
+            aspa_index = graph.get_aspa_index()
+        dest = graph.asyss[self.dest].index if self.dest in graph.asyss else NONE
+        attacker = NONE if graph.attacker is None else graph.attacker.index
+        # Whether each AS has BGPsec enabled, once an authenticated route is forwarded
+        bgp_sec: Optional[List[bool]] = None
+        customer, peer, provider = Relation.CUSTOMER.value, Relation.PEER.value, Relation.PROVIDER.value
+        # Neighbors a route is passed on to, as the relation of the AS passing it on seen from them:
+        # every neighbor if learned from a customer, only the customers otherwise
+        to_customers = (provider,) + topology.neighbor_lists(Relation.CUSTOMER)
+        to_all = (
+            to_customers,
+            (peer,) + topology.neighbor_lists(Relation.PEER),
+            (customer,) + topology.neighbor_lists(Relation.PROVIDER),
+        )
+        to_customers = (to_customers,)
+
+        n = self.size
+        next_hop = self.next_hop
+        length = self.length
+        flags = self.flags
+        path_filter = self.path_filter
+        predecessor = self.predecessor
+        version = self.version
+        replaced = self.replaced
+        # Preference keys of the current routes, computed when first needed
+        keys: List[Any] = [None] * n
+        # Upstream hops from the origin of the routes checked against ASPA, by reference
+        ups: Dict[int, int] = {}
+        n_routes = graph.n_routes
+        n_tainted_routes = graph.n_tainted_routes
+
+        queue: Deque[Offer] = deque()
+        for route in routes:
+            sender = route.first_hop.index
+            receiver = route.final.index
+            relation = topology.relation(receiver, sender)
+            queue.append((
+                self.reference(route.parent), sender, receiver, relation.value if relation else -1,
+                route_flags(route), route.length, route.path_filter))
+        routes.clear()
+        popleft = queue.popleft
+        append = queue.append
+        offered = rejected_accept = rejected_prefer = forwarded = 0
+        peak_queue = len(queue)
+        while queue:
+            ref, sender, receiver, relation, new_flags, new_length, new_filter = popleft()
+            offered += 1
+            if receiver == dest:
+                continue
+            rejects, arrange, aspa = rules[receiver]
+            if new_flags & rejects:
+                rejected_accept += 1
+                continue
+            up = None
+            if aspa and aspa_index is not None:
+                # The hops that may go upstream from the origin only grow at the end of the path, so
+                # they are kept for the stored routes
+                up = ups.get(ref)
+                if up is None:
+                    up = ups[ref] = aspa_index.count_up(self.path(ref))
+                if up == new_length - 2 and aspa_index.may_go_up(by_index[sender], by_index[receiver]):
+                    up += 1
+                if not aspa_index.verify_back(up, new_length - 1, chain((by_index[receiver],), self.walk_back(ref))):
+                    rejected_accept += 1
+                    continue
+            key = arrange((not new_flags & AUTHENTICATED, relation, new_length, sender))
+            if length[receiver]:
+                current = keys[receiver]
+                if current is None:
+                    hop = next_hop[receiver]
+                    hop_relation = topology.relation(receiver, hop)
+                    current = arrange((
+                        not flags[receiver] & AUTHENTICATED, hop_relation.value if hop_relation else -1,
+                        length[receiver], hop))
+                if not key < current:
+                    keys[receiver] = current
+                    rejected_prefer += 1
+                    continue
+                if flags[receiver] & TAINTED:
+                    n_tainted_routes -= 1
+                replaced[version[receiver] * n + receiver] = (
+                    next_hop[receiver], length[receiver], flags[receiver], path_filter[receiver],
+                    predecessor[receiver])
+                version[receiver] += 1
+            else:
+                n_routes += 1
+            if new_flags & TAINTED:
+                n_tainted_routes += 1
+            next_hop[receiver] = sender
+            length[receiver] = new_length
+            flags[receiver] = new_flags
+            path_filter[receiver] = new_filter
+            predecessor[receiver] = ref
+            keys[receiver] = key
+
+            # Extend the stored route to the neighbors not on its path
+            ref = version[receiver] * n + receiver
+            if up is not None:
+                ups[ref] = up
+            new_length += 1
+            authenticated = new_flags & AUTHENTICATED
+            if authenticated:
+                new_flags &= ~AUTHENTICATED
+                if bgp_sec is None:
+                    bgp_sec = [asys.bgp_sec_enabled for asys in by_index]
+            queued = len(queue)
+            for back, offsets, neighbors in to_all if relation == customer else to_customers:
+                for neighbor in neighbors[offsets[receiver]:offsets[receiver + 1]]:
+                    bit = 1 << (neighbor % PATH_FILTER_BITS)
+                    if new_filter & bit and self.contains(ref, by_index[neighbor]):
+                        continue
+                    offer_flags = new_flags
+                    if authenticated and bgp_sec[neighbor]:
+                        offer_flags |= AUTHENTICATED
+                    if neighbor == attacker:
+                        offer_flags |= TAINTED
+                    append((ref, receiver, neighbor, back, offer_flags, new_length, new_filter | bit))
+            if len(queue) > queued:
+                forwarded += len(queue) - queued
+                if len(queue) > peak_queue:
+                    peak_queue = len(queue)
+
+        graph.n_routes = n_routes
+        graph.n_tainted_routes = n_tainted_routes
+        if stats is not None:
+            stats.offered += offered
+            stats.rejected_accept += rejected_accept
+            stats.rejected_prefer += rejected_prefer
+            stats.forwarded += forwarded
+            stats.peak_queue = max(stats.peak_queue, peak_queue)
+        return True
+
+
+class RouteView(Route):
+    """A route of a routing state. The fields of a route never change, so they are read from the state
+    when the view is created; the path is only followed through the state when it is needed."""
+    __slots__ = ['state', 'ref', 'index', 'next_hop', 'predecessor']
+
+    state: RoutingState
+    ref: int
+    index: int
+    next_hop: int
+    predecessor: int
+
+    def __init__(self, state: RoutingState, ref: int):
+        self.state = state
+        self.ref = ref
+        self.index = index = ref % state.size
+        record = state.replaced.get(ref)
+        if record is None:
+            state.check(ref)
+            self.next_hop = state.next_hop[index]
+            self.length = state.length[index]
+            flags = state.flags[index]
+            self.path_filter = state.path_filter[index]
+            self.predecessor = state.predecessor[index]
+        else:
+            self.next_hop, self.length, flags, self.path_filter, self.predecessor = record
+        self.dest = state.dest
+        self.final = state.graph.by_index[index]
+        self.cyclic = bool(flags & CYCLIC)
+        self.tainted = bool(flags & TAINTED)
+        self.origin_invalid = bool(flags & ORIGIN_INVALID)
+        self.path_end_invalid = bool(flags & PATH_END_INVALID)
+        self.authenticated = bool(flags & AUTHENTICATED)
+
+    @property
+    def parent(self) -> Optional[Route]:
+        return self.state.resolve(self.predecessor)
+
+    @property
+    def path(self) -> List[AS]:
+        return self.state.path(self.ref)
+
+    @property
+    def first_hop(self) -> AS:
+        if self.next_hop == NONE:
+            raise IndexError("route has no first hop")
+        return self.state.graph.by_index[self.next_hop]
+
+    def contains(self, asys: AS) -> bool:
+        if not (self.path_filter >> (asys.index % PATH_FILTER_BITS)) & 1:
+            return False
+        return self.state.contains(self.ref, asys)
@@ -0,0 +1,292 @@
+from bisect import bisect_left
+import hashlib
+import networkx as nx
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from bgpsecsim.asys import AS_ID, Relation
+
+# Dense AS indices fit comfortably in 32 bits, ASNs themselves do not (4-byte ASNs go up to 2^32 - 1).
+INDEX_DTYPE = np.int32
+ASN_DTYPE = np.int64
+
+# Relation by value, e.g. _RELATIONS[1] is Relation.CUSTOMER
+_RELATIONS = (None,) + tuple(Relation)
+
+
+def _csr_order(rows: np.ndarray, cols: np.ndarray, n: int) -> np.ndarray:
+    """Order of the entries sorted by row, then column."""
+    return np.argsort(rows.astype(np.int64) * n + cols, kind='stable')
+
+
+def _csr(
+        rows: np.ndarray,
+        cols: np.ndarray,
+        n: int,
+        order: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Builds CSR offset/neighbor arrays, with the entries in the given order, which must be sorted
+    by row; by default the neighbors of every row are sorted by index."""
+    if order is None:
+        order = _csr_order(rows, cols, n)
+    offsets = np.zeros(n + 1, dtype=INDEX_DTYPE)
+    np.cumsum(np.bincount(rows, minlength=n), out=offsets[1:])
+    return offsets, cols[order].astype(INDEX_DTYPE)
+
+
+def _edge_order(
+        rows: np.ndarray,
+        cols: np.ndarray,
+        rank: np.ndarray,
+        added: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Order of the entries sorted by row, then in the order networkx iterates the edges: by the
+    first-seen rank of the earlier seen end, then in the order the pairs were added, which is their
+    position unless given."""
+    if added is None:
+        added = np.arange(len(rows))
+    return np.lexsort((added, np.minimum(rank[rows], rank[cols]), rows))
+
+
+_PICKLED_SLOTS = (
+    'asns', 'order',
+    'customer_offsets', 'customer_indices',
+    'peer_offsets', 'peer_indices',
+    'provider_offsets', 'provider_indices',
+)
+# The adjacency arrays can be rebuilt from the pickled ones, but storing them makes opening a
+# stored topology cheaper than rebuilding them.
+_STORED_SLOTS = _PICKLED_SLOTS + ('adjacency_offsets', 'adjacency_indices', 'adjacency_relations')
+
+
+class Topology(object):
+    """Compact AS-level topology.
+
+    ASes are identified by dense indices 0..N-1, assigned in ascending ASN order, so comparing
+    indices is the same as comparing ASNs. Neighbors are stored as one CSR offset/neighbor array
+    pair per relation, seen from the AS owning the row: row i of the customer arrays lists the
+    customers of AS i, and so on.
+
+    Rows keep the order networkx iterates the edges of the graph in (see _edge_order), which is the
+    order the ASs always had their neighbors in. Results depend on it, as ASPAPolicy checks the
+    providers of an AS in order.
+    """
+    __slots__ = [
+        'asns', 'index', 'order',
+        'customer_offsets', 'customer_indices',
+        'peer_offsets', 'peer_indices',
+        'provider_offsets', 'provider_indices',
+        'adjacency_offsets', 'adjacency_indices', 'adjacency_relations', '_lookup', '_lists',
+    ]
+
+    # ASN of every AS, sorted ascending; position is the AS index.
+    asns: np.ndarray
+    index: Dict[AS_ID, int]
+    # AS indices in the order the ASes were first seen in the input, which is the order ASGraph
+    # iterates them in (keeps tie-breaks such as identify_top_isps stable across loaders).
+    order: np.ndarray
+    customer_offsets: np.ndarray
+    customer_indices: np.ndarray
+    peer_offsets: np.ndarray
+    peer_indices: np.ndarray
+    provider_offsets: np.ndarray
+    provider_indices: np.ndarray
+    # All neighbors of every AS in one CSR, sorted by index, with the relation of each in a
+    # parallel array. Only used to answer relation(i, j) with a single binary search.
+    adjacency_offsets: np.ndarray
+    adjacency_indices: np.ndarray
+    adjacency_relations: np.ndarray
+    # Memoryviews of the CSR arrays by relation value, plus the adjacency arrays: indexing them
+    # yields plain ints, which makes the scalar accessors several times faster. Not pickled.
+    _lookup: Optional[Dict[int, Tuple[memoryview, ...]]]
+    # The CSR arrays by relation value as lists, see neighbor_lists. Not pickled.
+    _lists: Optional[Dict[int, Tuple[List[int], List[int]]]]
+
+    def __init__(
+        self,
+        asns: Iterable[AS_ID],
+        provider_customer: np.ndarray,
+        peer: np.ndarray,
+    ):
+        """Creates the topology from relation-typed edges.
+
+        asns lists every AS in first-seen order. provider_customer is an (E, 2) array of
+        <provider-as>, <customer-as> pairs and peer an (E, 2) array of <peer-as>, <peer-as> pairs,
+        each in the order the pairs were first added to the graph. Every pair must be listed once.
+        """
+        order_asns = np.fromiter(asns, dtype=ASN_DTYPE)
+        self.asns = np.sort(order_asns)
+        if np.any(self.asns[1:] == self.asns[:-1]):
+            raise ValueError("ASNs must be unique")
+        self.order = self.indices_of(order_asns)
+        n = len(self.asns)
+
+        provider_customer = self.indices_of(np.asarray(provider_customer, dtype=ASN_DTYPE).reshape(-1, 2))
+        peer = self.indices_of(np.asarray(peer, dtype=ASN_DTYPE).reshape(-1, 2))
+        providers, customers = provider_customer[:, 0], provider_customer[:, 1]
+        # Position of every AS in first-seen order
+        rank = np.empty(n, dtype=np.int64)
+        rank[self.order] = np.arange(n)
+
+        self.customer_offsets, self.customer_indices = _csr(
+            providers, customers, n, _edge_order(providers, customers, rank))
+        self.provider_offsets, self.provider_indices = _csr(
+            customers, providers, n, _edge_order(customers, providers, rank))
+        peer_rows = np.concatenate((peer[:, 0], peer[:, 1]))
+        peer_cols = np.concatenate((peer[:, 1], peer[:, 0]))
+        added = np.tile(np.arange(len(peer)), 2)
+        self.peer_offsets, self.peer_indices = _csr(
+            peer_rows, peer_cols, n, _edge_order(peer_rows, peer_cols, rank, added))
+
+        self._build_lookup_tables()
+
+    def _build_lookup_tables(self) -> None:
+        """Derives the ASN index and adjacency arrays, which are cheap to rebuild and not pickled."""
+        self._build_index()
+        self._build_adjacency()
+
+    def _build_index(self) -> None:
+        self.index = dict(zip(self.asns.tolist(), range(len(self.asns))))
+        self._lookup = None
+        self._lists = None
+
+    def _build_adjacency(self) -> None:
+        n = len(self.asns)
+        rows = []
+        cols = []
+        relations = []
+        for relation in Relation:
+            edges = self.edges(relation)
+            rows.append(edges[:, 0])
+            cols.append(edges[:, 1])
+            relations.append(np.full(len(edges), relation.value, dtype=np.int8))
+        rows = np.concatenate(rows)
+        cols = np.concatenate(cols)
+        order = _csr_order(rows, cols, n)
+        self.adjacency_offsets, self.adjacency_indices = _csr(rows, cols, n)
+        self.adjacency_relations = np.concatenate(relations)[order]
+
+    def __getstate__(self):
+        return {slot: getattr(self, slot) for slot in _PICKLED_SLOTS}
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+        self._build_lookup_tables()
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """The arrays that make up the topology, by name, as taken by from_arrays."""
+        return {slot: getattr(self, slot) for slot in _STORED_SLOTS}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> 'Topology':
+        """Creates a topology from the arrays returned by arrays(), which are used as they are, so
+        they may be read-only memory maps."""
+        missing = set(_STORED_SLOTS) - set(arrays)
+        if missing:
+            raise ValueError(f"missing topology arrays: {', '.join(sorted(missing))}")
+        n = len(arrays['asns'])
+        for slot in _STORED_SLOTS:
+            if slot.endswith('_offsets') and len(arrays[slot]) != n + 1:
+                raise ValueError(f"{slot} does not match the number of ASs")
+        topology = cls.__new__(cls)
+        for slot in _STORED_SLOTS:
+            setattr(topology, slot, arrays[slot])
+        topology._build_index()
+        return topology
+
+    def digest(self) -> str:
+        """SHA-256 of the topology's contents, equal for equal topologies."""
+        sha = hashlib.sha256()
+        for slot in _PICKLED_SLOTS:
+            sha.update(getattr(self, slot).tobytes())
+        return sha.hexdigest()
+
+    @classmethod
+    def from_networkx(cls, graph: nx.Graph) -> 'Topology':
+        """Converts a graph as returned by parse_as_rel_file."""
+        provider_customer = []
+        peer = []
+        for (as_id1, as_id2, customer) in graph.edges(data='customer'):
+            if customer is None:
+                peer.append((as_id1, as_id2))
+            elif customer == as_id1:
+                provider_customer.append((as_id2, as_id1))
+            elif customer == as_id2:
+                provider_customer.append((as_id1, as_id2))
+        return cls(graph.nodes, np.array(provider_customer), np.array(peer))
+
+    def __len__(self) -> int:
+        return len(self.asns)
+
+    def as_ids(self) -> List[AS_ID]:
+        """ASNs in first-seen order."""
+        return self.asns[self.order].tolist()
+
+    def indices_of(self, asns: np.ndarray) -> np.ndarray:
+        """Maps an array of ASNs to AS indices."""
+        asns = np.asarray(asns, dtype=ASN_DTYPE)
+        indices = np.searchsorted(self.asns, asns)
+        if asns.size and (np.any(indices >= len(self.asns)) or
+                          np.any(self.asns[np.minimum(indices, len(self.asns) - 1)] != asns)):
+            raise KeyError("unknown ASN")
+        return indices.astype(INDEX_DTYPE)
+
+    def partition(self, relation: Relation) -> Tuple[np.ndarray, np.ndarray]:
+        """CSR offset/neighbor arrays of the given relation."""
+        if relation == Relation.CUSTOMER:
+            return self.customer_offsets, self.customer_indices
+        if relation == Relation.PEER:
+            return self.peer_offsets, self.peer_indices
+        return self.provider_offsets, self.provider_indices
+
+    def _views(self) -> Dict[int, Tuple[memoryview, ...]]:
+        if self._lookup is None:
+            self._lookup = {
+                relation.value: tuple(map(memoryview, self.partition(relation)))
+                for relation in Relation
+            }
+            self._lookup[0] = (memoryview(self.adjacency_offsets),
+                               memoryview(self.adjacency_indices),
+                               memoryview(self.adjacency_relations))
+        return self._lookup
+
+    def neighbors(self, i: int, relation: Relation) -> List[int]:
+        """Indices of the neighbors of AS i that stand in the given relation to it."""
+        offsets, indices = self._views()[relation.value]
+        return indices[offsets[i]:offsets[i + 1]].tolist()
+
+    def neighbor_lists(self, relation: Relation) -> Tuple[List[int], List[int]]:
+        """CSR offset/neighbor arrays of the given relation as lists, for loops that slice them for
+        one AS after another: slicing a list is cheaper than slicing an array and converting it."""
+        if self._lists is None:
+            self._lists = {
+                relation.value: tuple(array.tolist() for array in self.partition(relation))
+                for relation in Relation
+            }
+        return self._lists[relation.value]
+
+    def degree(self, i: int, relation: Relation) -> int:
+        offsets, _ = self._views()[relation.value]
+        return offsets[i + 1] - offsets[i]
+
+    def degrees(self, relation: Relation) -> np.ndarray:
+        """Number of neighbors of the given relation, for every AS."""
+        offsets, _ = self.partition(relation)
+        return np.diff(offsets)
+
+    def relation(self, i: int, j: int) -> Optional[Relation]:
+        """Relation of AS j to AS i, i.e. Relation.CUSTOMER if j is a customer of i."""
+        lookup = self._lookup if self._lookup is not None else self._views()
+        offsets, indices, relations = lookup[0]
+        hi = offsets[i + 1]
+        k = bisect_left(indices, j, offsets[i], hi)
+        if k < hi and indices[k] == j:
+            return _RELATIONS[relations[k]]
+        return None
+
+    def edges(self, relation: Relation) -> np.ndarray:
+        """All (i, j) index pairs where j stands in the given relation to i."""
+        offsets, indices = self.partition(relation)
+        rows = np.repeat(np.arange(len(self.asns), dtype=INDEX_DTYPE), np.diff(offsets))
+        return np.stack((rows, indices), axis=1)
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+from typing import Any, Dict, List, Optional
+
+import bgpsecsim.as_graph as as_graph
+from bgpsecsim.topology import Topology
+
+# Directory of the cached topologies; None parses files on every load
+CACHE_DIR: Optional[str] = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.expanduser(os.path.join('~', '.cache')),
+    'bgpsecsim', 'topologies',
+)
+
+META_FILE = 'meta.json'
+# Prefix of entries still being written
+TEMP_PREFIX = '.tmp-'
+# Age after which an entry still being written is considered abandoned, in seconds
+TEMP_MAX_AGE = 3600
+
+# Status of a cache entry. Only entries of the current parser version are ever loaded, and entries
+# are keyed by the contents of their source file, so none of these can give a stale topology.
+OK = 'ok'
+OUTDATED = 'outdated parser'
+SOURCE_CHANGED = 'source changed'
+SOURCE_MISSING = 'source missing'
+BROKEN = 'broken'
+
+
+def file_digest(filename: str) -> str:
+    """SHA-256 of the contents of a file."""
+    sha = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def entry_key(digest: str, parser_version: Optional[int] = None) -> str:
+    if parser_version is None:
+        parser_version = as_graph.PARSER_VERSION
+    return f"{digest}-{parser_version}"
+
+
+class CacheEntry(object):
+    """Topology of one as-rel file, as one .npy file per topology array plus a metadata file."""
+    __slots__ = ['path', 'meta']
+
+    path: str
+    meta: Dict[str, Any]
+
+    def __init__(self, path: str, meta: Dict[str, Any]):
+        self.path = path
+        self.meta = meta
+
+    @property
+    def key(self) -> str:
+        return os.path.basename(self.path)
+
+    def status(self) -> str:
+        """Whether the entry is still in use, checking the contents of its source file."""
+        meta = self.meta
+        if 'sha256' not in meta or self.key != entry_key(meta['sha256'], meta.get('parser_version')):
+            return BROKEN
+        if meta['parser_version'] != as_graph.PARSER_VERSION:
+            return OUTDATED
+        source = meta.get('source')
+        if source is None or not os.path.isfile(source):
+            return SOURCE_MISSING
+        if file_digest(source) != meta['sha256']:
+            return SOURCE_CHANGED
+        return OK
+
+    def size(self) -> int:
+        """Bytes used on disk."""
+        return sum(entry.stat().st_size for entry in os.scandir(self.path) if entry.is_file())
+
+    def open(self) -> Topology:
+        """Memory-maps the arrays of the topology, read-only."""
+        arrays = {}
+        for name in os.listdir(self.path):
+            if name.endswith('.npy'):
+                arrays[name[:-len('.npy')]] = np.load(os.path.join(self.path, name), mmap_mode='r',
+                                                      allow_pickle=False)
+        return Topology.from_arrays(arrays)
+
+    def remove(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def _read_entry(path: str) -> CacheEntry:
+    try:
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        meta = {}
+    return CacheEntry(path, meta)
+
+
+def find(cache_dir: str, digest: str) -> Optional[CacheEntry]:
+    """Entry of the current parser version for a file with the given contents, if any."""
+    path = os.path.join(cache_dir, entry_key(digest))
+    if not os.path.isdir(path):
+        return None
+    entry = _read_entry(path)
+    if entry.meta.get('sha256') != digest:
+        entry.remove()
+        return None
+    return entry
+
+
+def store(cache_dir: str, filename: str, digest: str, topology: Topology) -> CacheEntry:
+    """Adds the topology of a file to the cache."""
+    os.makedirs(cache_dir, exist_ok=True)
+    meta = {
+        'sha256': digest,
+        'parser_version': as_graph.PARSER_VERSION,
+        'source': os.path.abspath(filename),
+        'n_ases': len(topology),
+        'topology_digest': topology.digest(),
+        'created': time.time(),
+    }
+    path = os.path.join(cache_dir, entry_key(digest))
+    # Written to a temporary directory first, so no one ever opens a partly written entry
+    temp = tempfile.mkdtemp(prefix=TEMP_PREFIX, dir=cache_dir)
+    try:
+        for name, array in topology.arrays().items():
+            np.save(os.path.join(temp, name + '.npy'), np.ascontiguousarray(array), allow_pickle=False)
+        with open(os.path.join(temp, META_FILE), 'w') as f:
+            json.dump(meta, f, indent=2)
+        try:
+            os.rename(temp, path)
+        except OSError:
+            # Another process has stored the same file in the meantime
+            if not os.path.isdir(path):
+                raise
+    finally:
+        shutil.rmtree(temp, ignore_errors=True)
+    return CacheEntry(path, meta)
+
+
+def build(filename: str, cache_dir: str) -> CacheEntry:
+    """Entry for the contents of a file, parsing and storing them unless already cached."""
+    digest = file_digest(filename)
+    entry = find(cache_dir, digest)
+    if entry is None:
+        entry = store(cache_dir, filename, digest, as_graph.load_topology(filename))
+    return entry
+
+
+def load_topology(filename: str, cache_dir: Optional[str] = None) -> Topology:
+    """Reads an as-rel file like as_graph.load_topology does, through the cache in cache_dir or
+    CACHE_DIR. Files are only parsed the first time their contents are seen."""
+    if cache_dir is None:
+        cache_dir = CACHE_DIR
+    if cache_dir is None:
+        return as_graph.load_topology(filename)
+
+    entry = build(filename, cache_dir)
+    try:
+        return entry.open()
+    except (OSError, ValueError):
+        # Damaged on disk, e.g. an array removed by hand
+        entry.remove()
+        return build(filename, cache_dir).open()
+
+
+def entries(cache_dir: str) -> List[CacheEntry]:
+    """All entries of the cache, oldest first."""
+    if not os.path.isdir(cache_dir):
+        return []
+    found = [_read_entry(entry.path) for entry in os.scandir(cache_dir)
+             if entry.is_dir() and not entry.name.startswith(TEMP_PREFIX)]
+    return sorted(found, key=lambda entry: (entry.meta.get('created', 0), entry.key))
+
+
+def prune(cache_dir: str, everything: bool = False) -> List[CacheEntry]:
+    """Removes the entries that are no longer in use, or all of them, and abandoned temporary
+    directories. Returns the removed entries."""
+    removed = []
+    for entry in entries(cache_dir):
+        if everything or entry.status() != OK:
+            entry.remove()
+            removed.append(entry)
+    if os.path.isdir(cache_dir):
+        for temp in os.scandir(cache_dir):
+            if temp.name.startswith(TEMP_PREFIX) and (
+                    everything or time.time() - temp.stat().st_mtime > TEMP_MAX_AGE):
+                shutil.rmtree(temp.path, ignore_errors=True)
+    return removed
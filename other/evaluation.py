@@ -2,8 +2,21 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib import cm
 
+import bgpsecsim.result_store as result_store
+
 
 def evaluate(input: str, output: str, threshold: int) -> None:
+    if result_store.is_store(input):
+        # The rows of a result store carry their (tier three, tier two, tier one) deployment, so a
+        # run still in progress can be evaluated as well
+        _, results = result_store.read(input)
+        data = np.array(list(results.values()))
+        x = [deployment3 for _, _, deployment3 in results]
+        y = [deployment2 for _, deployment2, _ in results]
+        z = [deployment for deployment, _, _ in results]
+        plot(data, x, y, z, output, threshold)
+        return
+
     data = np.loadtxt(input, delimiter=',')
     area = []
     x = []
@@ -26,8 +39,10 @@ def evaluate(input: str, output: str, threshold: int) -> None:
         y.append(elements[2])
     for elements in area:
         z.append(elements[1])
+    plot(data, x, y, z, output, threshold)
 
 
+def plot(data: np.ndarray, x: list, y: list, z: list, output: str, threshold: int) -> None:
     #Evaluate first bare figure
     fig = plt.figure(figsize=(10, 10))
     ax = fig.add_subplot(111, projection='3d')
@@ -1,10 +1,20 @@
 import unittest
 import sys
 import os
+import tempfile
+import pickle
+from unittest import mock
+import random
+import networkx as nx
 
 import bgpsecsim.as_graph as as_graph
-from bgpsecsim.asys import Relation
+import bgpsecsim.propagation as propagation
+import bgpsecsim.reachability as reachability
+from bgpsecsim.asys import Relation, Route
 from bgpsecsim.as_graph import ASGraph
+from bgpsecsim.error import InvalidASRelFile
+from bgpsecsim.profiling import PropagationStats
+from bgpsecsim.topology import Topology
 
 AS_REL_FILEPATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'as-rel.txt')
 
@@ -19,6 +29,69 @@ class TestASGraph(unittest.TestCase):
         assert graph.edges[(2, 6)]['customer'] == 6
         assert graph.edges[(2, 3)]['customer'] is None
 
+    def test_load_topology(self):
+        topology = as_graph.load_topology(AS_REL_FILEPATH)
+        assert topology.digest() == Topology.from_networkx(as_graph.parse_as_rel_file(AS_REL_FILEPATH)).digest()
+        assert topology.as_ids() == list(as_graph.parse_as_rel_file(AS_REL_FILEPATH).nodes)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'as-rel.txt')
+            with open(filename, 'w') as f:
+                # The last line of a pair wins
+                f.write("# comment\n7|3|-1\n5|7|0\n3|7|-1\n7|5|0\n")
+            topology = as_graph.load_topology(filename)
+            assert topology.as_ids() == [7, 3, 5]
+            index = topology.index
+            assert topology.relation(index[3], index[7]) == Relation.CUSTOMER
+            assert topology.relation(index[5], index[7]) == Relation.PEER
+            assert len(topology.edges(Relation.CUSTOMER)) == 1
+
+            with open(filename, 'w') as f:
+                f.write("1|2|-1\n3|4\n")
+            with self.assertRaises(InvalidASRelFile):
+                as_graph.load_topology(filename)
+
+    def test_parse_as_rel_file_pickle(self):
+        # Edges point from customer to provider, peers have edges both ways
+        digraph = nx.DiGraph()
+        digraph.add_nodes_from([5, 1])
+        digraph.add_edges_from([(2, 1), (3, 1), (1, 3), (4, 2), (5, 2), (2, 5)])
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'G.pickle')
+            with open(filename, 'wb') as f:
+                pickle.dump(digraph, f)
+            graph = as_graph.parse_as_rel_file(filename)
+            topology = as_graph.load_topology(filename)
+
+        # Every AS is followed by its new customers, then its new peers
+        assert list(graph.nodes) == [5, 2, 1, 3, 4]
+        assert graph.edges[(1, 2)]['customer'] == 2
+        assert graph.edges[(2, 4)]['customer'] == 4
+        assert graph.edges[(1, 3)]['customer'] is None
+        assert graph.edges[(2, 5)]['customer'] is None
+        assert graph.number_of_edges() == 4
+
+        assert topology.as_ids() == list(graph.nodes)
+        assert topology.digest() == Topology.from_networkx(graph).digest()
+
+    def test_parse_as_rel_file_pickle_self_loop(self):
+        digraph = nx.DiGraph()
+        digraph.add_edges_from([(2, 1), (2, 2), (3, 1)])
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'G.pickle')
+            with open(filename, 'wb') as f:
+                pickle.dump(digraph, f)
+            graph = as_graph.parse_as_rel_file(filename)
+            topology = as_graph.load_topology(filename)
+
+        # A self-loop is its own reverse edge, but no peer link
+        assert not graph.has_edge(2, 2)
+        assert graph.number_of_edges() == 2
+        assert topology.degree(topology.indices_of([2])[0], Relation.PEER) == 0
+        assert topology.digest() == Topology.from_networkx(graph).digest()
+
     def test_ASGraph_constructor(self):
         graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
         for i in range(1, 14):
@@ -40,6 +113,26 @@ class TestASGraph(unittest.TestCase):
         graph = ASGraph(nx_graph)
         self.assertTrue(graph.any_customer_provider_cycles())
 
+    def test_determine_reachability(self):
+        # 1 > 2 > 3 and 6 > 4 > 5 are provider-customer chains, 2 and 4 are peers
+        topology = Topology(range(1, 7), [(1, 2), (2, 3), (4, 5), (6, 4)], [(2, 4)])
+        expected = {1: 3, 2: 5, 3: 5, 4: 5, 5: 5, 6: 3}
+        graph = ASGraph(topology)
+        assert {as_id: graph.determine_reachability_one(as_id) for as_id in graph.asyss} == expected
+        # Asked again, one AS is not searched for again
+        with mock.patch.object(reachability, 'reachable_from') as reachable_from:
+            assert graph.determine_reachability_one(2) == 5
+        reachable_from.assert_not_called()
+        assert graph.determine_reachability_all() == expected
+        assert graph.reachability_counts is not None
+        assert reachability.reachable_counts(topology, block_size=64).tolist() == list(expected.values())
+
+        graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+        assert set(graph.determine_reachability_all().values()) == {13}
+
+        with self.assertRaises(ValueError):
+            reachability.reachable_counts(Topology(range(1, 4), [(1, 2), (2, 3), (3, 1)], []))
+
     def test_learn_routes(self):
         graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
         asys_8 = graph.get_asys(8)
@@ -51,6 +144,84 @@ class TestASGraph(unittest.TestCase):
             route = asys.routing_table[8]
             assert route.final == asys
 
+    def test_propagation_stats(self):
+        graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+        victim = graph.get_asys(1)
+        attacker = graph.get_asys(6)
+        graph.start_trial(victim, attacker)
+        graph.stats = PropagationStats()
+        graph.find_routes_to(victim)
+        # The four announcements of the victim and the eight routes forwarded
+        assert graph.stats.to_dict() == {
+            'offered': 12, 'rejected_accept': 0, 'rejected_prefer': 0, 'forwarded': 8, 'peak_queue': 8}
+        graph.stats = PropagationStats()
+        graph.hijack_n_hops(victim, attacker, 1)
+        assert graph.stats.to_dict() == {
+            'offered': 5, 'rejected_accept': 0, 'rejected_prefer': 3, 'forwarded': 4, 'peak_queue': 2}
+
+    def test_start_trial_counts_routes(self):
+        for model in propagation.MODELS:
+            graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH), model=model)
+            victim = graph.get_asys(1)
+            attacker = graph.get_asys(6)
+            graph.start_trial(victim, attacker)
+            graph.find_routes_to(victim)
+            # Legitimate routes through the attacker are tainted as well
+            assert graph.n_routes == 13
+            assert graph.n_tainted_routes == 1
+            graph.hijack_n_hops(victim, attacker, 0)
+
+            routes = [asys.get_route(1) for asys in graph.asyss.values()]
+            assert graph.n_routes == len([route for route in routes if route])
+            tainted = [route for route in routes if route and route.contains(attacker)]
+            assert graph.n_tainted_routes == len(tainted) > 1
+            assert all(route.tainted for route in tainted)
+
+            graph.clear_routing_tables()
+            assert graph.tracked is None
+
+    def test_restore_routes_to(self):
+        graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+        victim = graph.get_asys(1)
+        graph.start_trial(victim, graph.get_asys(6))
+        graph.find_routes_to(victim)
+        routes = graph.routes_to(victim)
+        graph.hijack_n_hops(victim, graph.get_asys(6), 1)
+
+        for attacker_id in (6, 2, 13):
+            attacker = graph.get_asys(attacker_id)
+            graph.restore_routes_to(victim, attacker, routes)
+            graph.hijack_n_hops(victim, attacker, 1)
+            restored = {asys.as_id: str(asys.get_route(1)) for asys in graph.asyss.values()}
+            counts = (graph.n_routes, graph.n_tainted_routes)
+
+            graph.start_trial(victim, attacker)
+            graph.find_routes_to(victim)
+            graph.hijack_n_hops(victim, attacker, 1)
+            assert restored == {asys.as_id: str(asys.get_route(1)) for asys in graph.asyss.values()}
+            assert counts == (graph.n_routes, graph.n_tainted_routes)
+
+    def test_hijack_n_hops_middle(self):
+        graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+        victim = graph.get_asys(1)
+        attacker = graph.get_asys(6)
+
+        def forged_path(n, seed):
+            graph.start_trial(victim, attacker)
+            graph.find_routes_to(victim)
+            with mock.patch.object(as_graph, 'Route', wraps=Route) as route:
+                graph.hijack_n_hops(victim, attacker, n, random.Random(seed))
+            return route.call_args.args[1]
+
+        for seed in range(10):
+            path = forged_path(4, seed)
+            assert path == forged_path(4, seed)
+            assert path[0] == victim and path[-1] == attacker and len(path) == 5
+            assert len(set(path)) == 5
+        assert len(set(path) | set(forged_path(12, 0))) == 13
+        with self.assertRaises(ValueError):
+            graph.hijack_n_hops(victim, attacker, 13, random.Random(0))
+
     def test_aspa_object_creation(self):
         graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
         asys_8 = graph.get_asys(8)
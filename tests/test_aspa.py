@@ -0,0 +1,133 @@
+import unittest
+import os
+import tempfile
+
+import bgpsecsim.as_graph as as_graph
+from bgpsecsim.aspa import NOT_PROVIDER, PEER, PROVIDER, UNKNOWN
+from bgpsecsim.asys import Route
+from bgpsecsim.as_graph import ASGraph
+from bgpsecsim.routing_policy import ASPAPolicy
+
+AS_REL_FILEPATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'as-rel.txt')
+
+
+class TestASPAIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH), policy=ASPAPolicy())
+        for asys in self.graph.asyss.values():
+            asys.aspa_enabled = True
+
+    def route(self, *as_ids):
+        return Route(as_ids[0], [self.graph.get_asys(as_id) for as_id in as_ids],
+                     origin_invalid=False, path_end_invalid=False, authenticated=False)
+
+    def verdict(self, as_id, next_as_id):
+        index = self.graph.get_aspa_index()
+        return index.verdict(self.graph.get_asys(as_id).index, self.graph.get_asys(next_as_id).index)
+
+    def test_created_on_demand(self):
+        graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+        assert graph.aspa_index is None
+        assert graph.get_asys(6).get_aspa_providers() == [2]
+        assert graph.aspa_index is graph.get_aspa_index()
+
+    def test_verdicts(self):
+        assert self.verdict(6, 2) == PROVIDER
+        assert self.verdict(2, 6) == NOT_PROVIDER
+        assert self.verdict(1, 2) == UNKNOWN
+        assert self.verdict(2, 3) == PEER
+        assert self.verdict(6, 7) == NOT_PROVIDER
+
+    def test_accept_route(self):
+        policy = ASPAPolicy()
+        assert policy.accept_route(self.route(6, 2, 1))
+        assert policy.accept_route(self.route(1, 2, 6))
+        assert policy.accept_route(self.route(6, 2, 7))
+        # Across a peer at the top
+        assert policy.accept_route(self.route(6, 2, 3, 8))
+        assert policy.accept_route(self.route(8, 3, 2, 6))
+        # Forged hop from the origin to an AS that is not its provider
+        assert not policy.accept_route(self.route(8, 6, 2))
+
+        # Verdicts are cached, whether an AS has ASPA enabled is not
+        self.graph.get_asys(8).aspa_enabled = False
+        assert policy.accept_route(self.route(8, 6, 2))
+
+
+class TestASPAVerify(unittest.TestCase):
+    # 1 publishes no providers, 20 has the providers 2 and 3, 3 has the providers 1 and 5
+    AS_REL = ["1|2|-1", "1|3|-1", "1|5|-1", "5|3|-1", "2|3|0", "2|6|-1", "2|20|-1", "3|20|-1", "3|9|-1"]
+
+    def graph(self, lines):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'as-rel.txt')
+            with open(filename, 'w') as f:
+                f.write("\n".join(lines) + "\n")
+            graph = ASGraph(as_graph.parse_as_rel_file(filename), policy=ASPAPolicy())
+        for asys in graph.asyss.values():
+            asys.aspa_enabled = True
+        return graph
+
+    def accepted(self, graph, *as_ids):
+        route = Route(as_ids[0], [graph.get_asys(as_id) for as_id in as_ids],
+                      origin_invalid=False, path_end_invalid=False, authenticated=False)
+        return ASPAPolicy().accept_route(route)
+
+    def check(self, graph):
+        assert self.accepted(graph, 20, 2, 1)
+        assert self.accepted(graph, 20, 3, 1)
+        assert self.accepted(graph, 1, 2, 20)
+        assert self.accepted(graph, 1, 3, 20)
+        assert self.accepted(graph, 20, 2, 3, 9)
+        assert self.accepted(graph, 6, 2, 3, 20)
+        # Down from a provider and up to the other one, a route leak
+        assert not self.accepted(graph, 2, 20, 3)
+        assert not self.accepted(graph, 9, 3, 20, 2, 6)
+        # Up again after a peer
+        assert not self.accepted(graph, 6, 2, 3, 5)
+
+    def test_multiple_providers(self):
+        graph = self.graph(self.AS_REL)
+        assert graph.get_asys(20).get_aspa_providers() == [2, 3]
+        index = graph.get_aspa_index()
+        assert index.verdict(graph.get_asys(20).index, graph.get_asys(2).index) == PROVIDER
+        assert index.verdict(graph.get_asys(20).index, graph.get_asys(3).index) == PROVIDER
+        assert index.verdict(graph.get_asys(3).index, graph.get_asys(20).index) == NOT_PROVIDER
+        self.check(graph)
+
+    def test_checked_by_record_of_customer_side(self):
+        # 20 leaks a route from its provider 2 to its provider 3. The record of 3 does not list 20, so
+        # the hop to 3 can not go down, whether or not 20 has ASPA enabled
+        graph = self.graph(self.AS_REL)
+        for as_id in (1, 5, 6, 9, 20):
+            graph.get_asys(as_id).aspa_enabled = False
+        assert not self.accepted(graph, 2, 20, 3)
+        # Without the record of 3, the one of 20 lists both as providers
+        graph.get_asys(20).aspa_enabled = True
+        graph.get_asys(3).aspa_enabled = False
+        assert self.accepted(graph, 2, 20, 3)
+
+    def test_verify_back(self):
+        graph = self.graph(self.AS_REL)
+        index = graph.get_aspa_index()
+        for as_ids, valid in (((20, 2, 1), True), ((1, 3, 20), True), ((2, 20, 3), False), ((6, 2, 3, 5), False)):
+            path = [graph.get_asys(as_id) for as_id in as_ids]
+            back = iter(reversed(path))
+            assert index.verify_back(index.count_up(path), len(path) - 1, back) == valid
+        # The downstream pass stops where the upstream one ended
+        path = [graph.get_asys(as_id) for as_id in (20, 2, 1)]
+        back = iter(reversed(path))
+        assert index.verify_back(index.count_up(path), len(path) - 1, back)
+        assert list(back) == path[:1]
+
+    def test_independent_of_record_order(self):
+        lines = list(self.AS_REL)
+        lines.remove("3|20|-1")
+        lines.insert(0, "3|20|-1")
+        graph = self.graph(lines)
+        assert graph.get_asys(20).get_aspa_providers() == [3, 2]
+        self.check(graph)
+
+if __name__ == '__main__':
+    unittest.main()
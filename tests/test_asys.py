@@ -0,0 +1,75 @@
+import unittest
+import os
+
+import bgpsecsim.as_graph as as_graph
+from bgpsecsim.asys import Relation, Route
+from bgpsecsim.as_graph import ASGraph
+
+AS_REL_FILEPATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'as-rel.txt')
+
+
+class TestRoute(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+
+    def asyss(self, *as_ids):
+        return [self.graph.get_asys(as_id) for as_id in as_ids]
+
+    def test_path(self):
+        route = Route(8, self.asyss(8, 3, 1), origin_invalid=False, path_end_invalid=False, authenticated=False)
+        assert route.path == self.asyss(8, 3, 1)
+        assert route.length == 3
+        assert route.origin == self.graph.get_asys(8)
+        assert route.first_hop == self.graph.get_asys(3)
+        assert route.final == self.graph.get_asys(1)
+        assert str(route) == '8,3,1'
+
+    def test_forward_shares_path(self):
+        [asys_8, asys_3, asys_1, asys_2, asys_4] = self.asyss(8, 3, 1, 2, 4)
+        route = asys_8.originate_route(asys_3)
+        route = asys_3.forward_route(route, asys_1)
+        via_2 = asys_1.forward_route(route, asys_2)
+        via_4 = asys_1.forward_route(route, asys_4)
+
+        assert via_2.parent is route and via_4.parent is route
+        assert via_2.path == [asys_8, asys_3, asys_1, asys_2]
+        assert via_4.path == [asys_8, asys_3, asys_1, asys_4]
+        assert via_4.length == 4
+        assert via_4.origin == asys_8
+        assert via_4.first_hop == asys_1
+        # Forwarding does not change the route forwarded from
+        assert route.path == [asys_8, asys_3, asys_1]
+
+    def test_contains_cycle(self):
+        [asys_8, asys_3, asys_1] = self.asyss(8, 3, 1)
+        route = asys_8.originate_route(asys_3)
+        route = asys_3.forward_route(route, asys_1)
+        assert not route.contains_cycle()
+        assert asys_1.forward_route(route, asys_3).contains_cycle()
+        assert Route(8, [asys_8, asys_3, asys_8, asys_1], False, False, False).contains_cycle()
+
+    def test_contains(self):
+        [asys_8, asys_3, asys_1, asys_2] = self.asyss(8, 3, 1, 2)
+        route = Route(8, [asys_8, asys_3, asys_1], False, False, False)
+        assert all(route.contains(asys) for asys in (asys_8, asys_3, asys_1))
+        assert not any(route.contains(asys) for asys in self.graph.asyss.values()
+                       if asys not in (asys_8, asys_3, asys_1))
+        assert asys_1.forward_route(route, asys_2).contains(asys_2)
+        assert not route.contains(asys_2)
+
+    def test_learn_route_skips_path(self):
+        [asys_8, asys_3, asys_1] = self.asyss(8, 3, 1)
+        route = asys_3.forward_route(asys_8.originate_route(asys_3), asys_1)
+        neighbors = asys_1.learn_route(route)
+        assert asys_3 not in neighbors
+        assert neighbors == [asys for asys in asys_1.get_neighbors(Relation.CUSTOMER) if asys != asys_3]
+
+    def test_first_hop_of_origin(self):
+        route = Route(8, self.asyss(8), origin_invalid=False, path_end_invalid=False, authenticated=True)
+        with self.assertRaises(IndexError):
+            route.first_hop
+
+
+if __name__ == '__main__':
+    unittest.main()
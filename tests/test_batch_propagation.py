@@ -0,0 +1,65 @@
+import unittest
+import os
+import random
+import numpy as np
+
+import bgpsecsim.as_graph as as_graph
+import bgpsecsim.batch_propagation as batch_propagation
+import bgpsecsim.propagation as propagation
+from bgpsecsim.as_graph import ASGraph
+from bgpsecsim.topology import Topology
+
+AS_REL_FILEPATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'as-rel.txt')
+
+
+def random_topology(n_ases, seed):
+    """Providers have lower AS numbers than their customers, so there are no customer-provider cycles."""
+    rng = random.Random(seed)
+    provider_customer = set()
+    peer = set()
+    for customer in range(2, n_ases + 1):
+        for provider in rng.sample(range(1, customer), min(customer - 1, rng.randint(1, 3))):
+            provider_customer.add((provider, customer))
+    while len(peer) < n_ases // 2:
+        as1, as2 = sorted(rng.sample(range(1, n_ases + 1), 2))
+        if (as1, as2) not in provider_customer:
+            peer.add((as1, as2))
+    return Topology(range(1, n_ases + 1), sorted(provider_customer), sorted(peer))
+
+
+class TestBatchPropagation(unittest.TestCase):
+
+    def assert_same_routes(self, topology):
+        graph = ASGraph(topology, model=propagation.STABLE)
+        next_hops, lengths = batch_propagation.routes_to(topology, np.arange(len(topology)))
+        for target in graph.by_index:
+            graph.clear_routing_tables()
+            graph.find_routes_to(target)
+            for asys in graph.by_index:
+                route = asys.get_route(target.as_id)
+                if route is None:
+                    expected = (batch_propagation.NO_ROUTE, 0)
+                elif route.parent is None:
+                    expected = (batch_propagation.NO_ROUTE, 1)
+                else:
+                    expected = (route.first_hop.index, route.length)
+                assert (next_hops[target.index, asys.index], lengths[target.index, asys.index]) == expected
+
+    def test_same_routes_as_stable_model(self):
+        self.assert_same_routes(as_graph.load_topology(AS_REL_FILEPATH))
+        for seed in range(3):
+            self.assert_same_routes(random_topology(40, seed))
+
+    def test_route_blocks(self):
+        topology = random_topology(30, 0)
+        next_hops, lengths = batch_propagation.routes_to(topology, np.arange(len(topology)))
+        targets = np.array([3, 17, 4, 29, 0])
+        blocks = list(batch_propagation.route_blocks(topology, targets, block_size=2))
+        assert [block.tolist() for block, _, _ in blocks] == [[3, 17], [4, 29], [0]]
+        assert np.array_equal(np.concatenate([block_next_hops for _, block_next_hops, _ in blocks]), next_hops[targets])
+        assert np.array_equal(np.concatenate([block_lengths for _, _, block_lengths in blocks]), lengths[targets])
+        assert sum(len(block) for block, _, _ in batch_propagation.route_blocks(topology)) == len(topology)
+
+
+if __name__ == '__main__':
+    unittest.main()
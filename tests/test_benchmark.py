@@ -0,0 +1,49 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+import bgpsecsim.benchmark as benchmark
+import bgpsecsim.experiments as experiments
+
+AS_REL_FILEPATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'as-rel.txt')
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_run(self):
+        benchmarks = benchmark.snapshot_benchmarks(AS_REL_FILEPATH, n_pairs=3, trial_counts=(4,))
+        with experiments.worker_pool(1):
+            results = benchmark.run(benchmarks, repeat=2)
+        assert list(results) == [b.name for b in benchmarks]
+        assert 'hijack_n_hops[as-rel,ASPAPolicy]' in results
+        assert 'figure2a_experiment[as-rel,4]' in results
+        for result in results.values():
+            assert 0 < result['min'] <= result['median'] and result['repeat'] == 2
+        # Every route of the three victims, forwarded to every neighbor
+        assert 0 < results['ASPAPolicy.accept_route[as-rel]']['ops'] < benchmark.MAX_ASPA_ROUTES
+
+        assert list(benchmark.run(benchmarks, repeat=1, only='find_routes_to')) == ['find_routes_to[as-rel]']
+
+    def test_history(self):
+        filename = os.path.join(self.dir, 'bench', 'history.json')
+        assert benchmark.load_history(filename) == []
+        old = benchmark.record({'a': {'min': 1.0}, 'b': {'min': 1.0}, 'c': {'min': 1.0}}, 'old')
+        new = benchmark.record({'a': {'min': 1.05}, 'b': {'min': 1.5}, 'd': {'min': 1.0}})
+        benchmark.append_history(filename, old)
+        benchmark.append_history(filename, new)
+        assert benchmark.load_history(filename) == [old, new]
+        assert old['label'] == 'old' and old['python']
+
+        assert benchmark.compare(old, new, threshold=0.1) == [('a', 1.0, 1.05, False), ('b', 1.0, 1.5, True)]
+        assert benchmark.compare(old, new, threshold=0.01)[0][3]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+import multiprocessing as mp
+import os
+import shutil
+import tempfile
+
+import bgpsecsim.as_graph as as_graph
+import bgpsecsim.cluster as cluster
+import bgpsecsim.experiments as experiments
+from bgpsecsim.as_graph import ASGraph
+from bgpsecsim.error import ClusterError
+from bgpsecsim.routing_policy import PathEndValidationPolicy, RPKIPolicy
+from bgpsecsim.topology import Topology
+
+AS_REL_FILEPATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'as-rel.txt')
+AUTHKEY = b'test'
+
+TRIALS = [(victim, attacker) for victim in (1, 6, 9, 12) for attacker in (2, 7, 13)]
+
+
+def serial_results(graph, trials, n_hops):
+    return [experiments.run_trial(graph, victim, attacker, n_hops) for victim, attacker in trials]
+
+
+def run_worker(address, chunks):
+    """Puts the number of chunks run on the queue."""
+    chunks.put(cluster.run_worker(address, AUTHKEY, as_graph.load_topology(AS_REL_FILEPATH), 1, connect_timeout=10))
+
+
+def run_lost_worker(address, lost):
+    """Takes a chunk and disappears without running it."""
+    conn = cluster.connect(address, AUTHKEY, 10)
+    conn.send((cluster.HELLO, as_graph.load_topology(AS_REL_FILEPATH).digest(), 1))
+    conn.recv()
+    while conn.recv()[0] != cluster.CHUNK:
+        pass
+    lost.set()
+    conn.close()
+
+
+class TestCluster(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.topology = as_graph.load_topology(AS_REL_FILEPATH)
+        self.processes = []
+
+    def tearDown(self):
+        for process in self.processes:
+            process.join(10)
+            if process.is_alive():
+                process.terminate()
+        shutil.rmtree(self.dir)
+
+    def start(self, target, *args):
+        process = mp.Process(target=target, args=args)
+        process.start()
+        self.processes.append(process)
+        return process
+
+    def test_parse_address(self):
+        assert cluster.parse_address('node1:9000') == ('node1', 9000)
+        assert cluster.parse_address(':9000') == ('localhost', 9000)
+        assert cluster.parse_address('/tmp/bgpsecsim.sock') == '/tmp/bgpsecsim.sock'
+        with self.assertRaises(ValueError):
+            cluster.parse_address('node1:port')
+
+    def test_same_results_as_one_machine(self):
+        graph = ASGraph(self.topology, policy=RPKIPolicy())
+        chunks = mp.Queue()
+        with cluster.coordinator(('localhost', 0), AUTHKEY, self.topology, chunk_size=2) as coord:
+            for _ in range(2):
+                self.start(run_worker, coord.address, chunks)
+            for deployment in (0, 2):
+                graph.apply_deployment(RPKIPolicy(), [(PathEndValidationPolicy(), experiments.as_ids(
+                    graph.identify_top_isps(deployment)))])
+                assert experiments.figure2a_experiment(graph, TRIALS, n_hops=1) == serial_results(graph, TRIALS, 1)
+        assert experiments.POOL is None
+        n_chunks = [chunks.get(timeout=10) for _ in range(2)]
+        assert all(type(n) is int for n in n_chunks)
+        # Two experiments of four victims with three trials each, in chunks of two and one
+        assert sum(n_chunks) == 16
+
+    def test_reassigns_chunks_of_lost_workers(self):
+        graph = ASGraph(self.topology)
+        expected = serial_results(graph, TRIALS, 1)
+        address = os.path.join(self.dir, 'coordinator.sock')
+        lost = mp.Event()
+        chunks = mp.Queue()
+        with cluster.coordinator(address, AUTHKEY, self.topology, chunk_size=3) as coord:
+            self.start(run_lost_worker, address, lost)
+            # The first worker takes a chunk before the second one joins
+            coord._add_joined()
+            self.start(run_worker, address, chunks)
+            assert experiments.figure2a_experiment(graph, TRIALS, n_hops=1) == expected
+            assert lost.is_set()
+        # The second worker runs all chunks, including the one the first took
+        assert chunks.get(timeout=10) == 4
+
+    def test_different_topology_rejected(self):
+        topology = Topology(range(1, 4), [(1, 2), (1, 3)], [])
+        with cluster.coordinator(('localhost', 0), AUTHKEY, topology) as coord:
+            with self.assertRaises(ClusterError):
+                cluster.run_worker(coord.address, AUTHKEY, self.topology, 1, connect_timeout=10)
+            with self.assertRaises(ClusterError):
+                cluster.run_worker(coord.address, b'other', topology, 1, connect_timeout=10)
+            with self.assertRaises(ClusterError):
+                coord.run(ASGraph(self.topology), TRIALS, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
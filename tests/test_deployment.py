@@ -0,0 +1,90 @@
+import unittest
+import os
+import pickle
+
+import bgpsecsim.as_graph as as_graph
+import bgpsecsim.propagation as propagation
+from bgpsecsim.as_graph import ASGraph
+from bgpsecsim.deployment import Deployment
+from bgpsecsim.routing_policy import (
+    ASPAPolicy, BGPsecMedSecPolicy, DefaultPolicy, PathEndValidationPolicy, RPKIPolicy
+)
+
+AS_REL_FILEPATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'as-rel.txt')
+
+
+class TestDeployment(unittest.TestCase):
+
+    def test_apply(self):
+        nx_graph = as_graph.parse_as_rel_file(AS_REL_FILEPATH)
+        graph = ASGraph(nx_graph, policy=RPKIPolicy(), model=propagation.STABLE)
+        bgpsec = BGPsecMedSecPolicy()
+        for as_id in (1, 2):
+            graph.get_asys(as_id).policy = bgpsec
+            graph.get_asys(as_id).bgp_sec_enabled = True
+        graph.get_asys(3).policy = ASPAPolicy()
+        graph.get_asys(3).aspa_enabled = True
+
+        deployment = Deployment.of(graph)
+        assert isinstance(deployment.policy, RPKIPolicy)
+        assert len(deployment.overrides) == 2
+        assert deployment.bgp_sec_enabled.tolist() == [graph.get_asys(1).index, graph.get_asys(2).index]
+
+        other = ASGraph(nx_graph, policy=BGPsecMedSecPolicy())
+        for asys in other.asyss.values():
+            asys.aspa_enabled = True
+        pickle.loads(pickle.dumps(deployment)).apply(other)
+        assert other.model == propagation.STABLE
+        for asys in graph.asyss.values():
+            copy = other.get_asys(asys.as_id)
+            assert type(copy.policy) == type(asys.policy)
+            assert copy.bgp_sec_enabled == asys.bgp_sec_enabled
+            assert copy.aspa_enabled == asys.aspa_enabled
+
+    def test_apply_deployment(self):
+        graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH), policy=BGPsecMedSecPolicy())
+        asyss = list(graph.asyss.values())
+        for asys in asyss:
+            asys.bgp_sec_enabled = True
+        graph.get_asys(6).policy = ASPAPolicy()
+
+        rpki = RPKIPolicy()
+        graph.apply_deployment(ASPAPolicy(), [(rpki, [1, 2]), (BGPsecMedSecPolicy(), [2])], aspa_enabled=[2, 3])
+        assert graph.get_asys(1).policy is rpki
+        assert isinstance(graph.get_asys(2).policy, BGPsecMedSecPolicy)
+        assert all(isinstance(asys.policy, ASPAPolicy) for asys in asyss[2:])
+        assert [asys.as_id for asys in asyss if asys.aspa_enabled] == [2, 3]
+        assert not any(asys.bgp_sec_enabled for asys in asyss)
+        # The AS objects are kept
+        assert list(graph.asyss.values()) == asyss
+
+        with self.assertRaises(ValueError):
+            graph.apply_deployment(ASPAPolicy(), aspa=[2])
+        with self.assertRaises(KeyError):
+            graph.apply_deployment(ASPAPolicy(), aspa_enabled=[99])
+
+    def test_routing_key(self):
+        topology = as_graph.load_topology(AS_REL_FILEPATH)
+
+        def key(policy, overrides=(), **flags):
+            return Deployment.create(topology, propagation.QUEUE, policy, overrides, **flags).routing_key()
+
+        # Routes from the victim are never origin or path-end invalid
+        rpki = key(RPKIPolicy())
+        assert key(RPKIPolicy(), [(PathEndValidationPolicy(), [1, 2])]) == rpki
+        assert key(DefaultPolicy(), [(RPKIPolicy(), [3])], publishes_rpki=[3]) == rpki
+        assert key(RPKIPolicy(), bgp_sec_enabled=[1]) == rpki
+        assert Deployment.create(topology, propagation.STABLE, RPKIPolicy()).routing_key() != rpki
+
+        bgpsec = key(RPKIPolicy(), [(BGPsecMedSecPolicy(), [1])])
+        assert bgpsec != rpki
+        assert key(RPKIPolicy(), [(BGPsecMedSecPolicy(), [1])], bgp_sec_enabled=[1, 2]) != bgpsec
+
+        aspa = key(ASPAPolicy())
+        assert aspa != rpki
+        assert key(ASPAPolicy(), aspa_enabled=[1]) != aspa
+        assert key(RPKIPolicy(), aspa_enabled=[1]) == rpki
+
+
+if __name__ == '__main__':
+    unittest.main()
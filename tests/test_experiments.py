@@ -0,0 +1,245 @@
+import unittest
+import contextlib
+import io
+import math
+import os
+import shutil
+import statistics
+import tempfile
+import warnings
+from unittest import mock
+
+import bgpsecsim.as_graph as as_graph
+import bgpsecsim.experiments as experiments
+import bgpsecsim.profiling as profiling
+from bgpsecsim.as_graph import ASGraph
+from bgpsecsim.routing_policy import PathEndValidationPolicy, RPKIPolicy
+from bgpsecsim.topology import Topology
+
+AS_REL_FILEPATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'as-rel.txt')
+
+TRIALS = [(victim, attacker) for victim in (1, 6, 9, 12) for attacker in (2, 7, 13)]
+
+
+def serial_results(graph, trials, n_hops):
+    return [experiments.run_trial(graph, victim, attacker, n_hops) for victim, attacker in trials]
+
+
+def serial_counts(graph, victim_id, attacker_id, n_hops):
+    victim = graph.get_asys(victim_id)
+    attacker = graph.get_asys(attacker_id)
+    graph.clear_routing_tables()
+    graph.find_routes_to(victim)
+    graph.hijack_n_hops(victim, attacker, n_hops)
+    return experiments.attacker_route_counts(graph, attacker, victim)
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    def test_reused_across_deployments_and_topologies(self):
+        nx_graph = as_graph.parse_as_rel_file(AS_REL_FILEPATH)
+        with experiments.worker_pool(2) as pool:
+            assert experiments.POOL is pool
+            graph = ASGraph(nx_graph, policy=RPKIPolicy())
+            for deployment in (0, 2, 5):
+                for asys in graph.identify_top_isps(deployment):
+                    asys.policy = PathEndValidationPolicy()
+                expected = serial_results(graph, TRIALS, 1)
+                assert experiments.figure2a_experiment(graph, TRIALS, n_hops=1) == expected
+
+            # A different topology: AS 6 moves from provider 2 to provider 3
+            topology = Topology(
+                [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13],
+                [(1, 2), (1, 3), (1, 4), (1, 5), (3, 6), (2, 7), (3, 8), (3, 9), (4, 10), (4, 11), (5, 12),
+                 (5, 13)],
+                [(2, 3), (4, 5)],
+            )
+            graph = ASGraph(topology)
+            expected = serial_results(graph, TRIALS, 0)
+            assert experiments.figure2a_experiment(graph, TRIALS, n_hops=0) == expected
+        assert experiments.POOL is None
+
+    def test_chunked_counts(self):
+        graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+        trials = TRIALS * 20
+        expected = [serial_counts(graph, victim, attacker, 1) for victim, attacker in trials]
+        for chunk_size in (None, 1, 7, 1000):
+            pool = experiments.WorkerPool(3, chunk_size=chunk_size)
+            try:
+                counts = pool.run(graph, trials, 1)
+                assert counts.shape == (len(trials), 2)
+                assert [tuple(trial_counts) for trial_counts in counts.tolist()] == expected
+                # The shared counts array grows for larger batches
+                assert len(pool.run(graph, trials * 3, 1)) == len(trials) * 3
+            finally:
+                pool.close()
+        with self.assertRaises(ValueError):
+            experiments.WorkerPool(3, chunk_size=0)
+
+    def test_seeded_trials_reproducible(self):
+        graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+        results = []
+        try:
+            experiments.SEED = 7
+            for n_workers, chunk_size in ((1, None), (3, 1), (2, 5)):
+                experiments.EXPERIMENT_ID = 0
+                with experiments.worker_pool(n_workers) as pool:
+                    pool.chunk_size = chunk_size
+                    results.append([experiments.figure2a_experiment(graph, TRIALS, n_hops=3) for _ in range(2)])
+                assert experiments.EXPERIMENT_ID == 2
+        finally:
+            experiments.SEED = None
+        assert results[0] == results[1] == results[2]
+        # Every experiment and trial draws its own forged hops
+        assert results[0][0] != results[0][1]
+
+    def test_victim_chunks(self):
+        trials = [(1, 2), (6, 2), (1, 7), (9, 2), (6, 7), (1, 13), (9, 7)]
+        victim = experiments.Figure2aExperiment.trial_victim
+        assert experiments.victim_chunks(trials, 3, victim) == [[0, 2, 5], [1, 4], [3, 6]]
+        assert experiments.victim_chunks(trials, 4, victim) == [[0, 2, 5], [1, 4, 3, 6]]
+        # Victims with more trials than fit in a chunk are split
+        assert experiments.victim_chunks(trials, 2, victim) == [[0, 2], [5], [1, 4], [3, 6]]
+        assert experiments.victim_chunks(trials, 100, experiments.Experiment.trial_victim) == [list(range(7))]
+        assert experiments.victim_chunks([], 3, victim) == []
+
+    def test_without_pool(self):
+        graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+        assert experiments.figure2a_experiment(graph, TRIALS[:3], n_hops=1) == serial_results(graph, TRIALS[:3], 1)
+        assert experiments.figure2a_experiment(graph, [], n_hops=1) == []
+
+    def test_profile(self):
+        topology = as_graph.load_topology(AS_REL_FILEPATH)
+        expected = experiments.figure2a_line_4_rpki(topology, TRIALS)
+        cprofile_dir = tempfile.mkdtemp()
+        try:
+            profiling.ENABLED = True
+            profiling.CPROFILE_DIR = cprofile_dir
+            profiling.PROFILE = profiling.Profile()
+            with experiments.worker_pool(2) as pool:
+                assert experiments.figure2a_line_4_rpki(topology, TRIALS) == expected
+                workers = pool.profiles()
+            assert sorted(os.listdir(cprofile_dir)) == sorted(f"worker-{pid}.prof" for pid in workers)
+            report = profiling.report(profiling.PROFILE, workers, 1.0)
+        finally:
+            profiling.ENABLED = False
+            profiling.CPROFILE_DIR = None
+            profiling.PROFILE = profiling.Profile()
+            shutil.rmtree(cprofile_dir)
+
+        assert len(report['workers']) == 2
+        line = report['lines']['figure2a_line_4_rpki']
+        assert line['calls'] == 1 and line['trials'] == len(TRIALS) and line['wall_time'] > 0
+        assert all(seconds > 0 for seconds in line['stages'].values())
+        # Routes to a victim are found once per worker and restored for its other attackers
+        assert len(TRIALS) - 2 * 4 <= line['restored'] < len(TRIALS)
+        for stats in (line['legit'], line['hijack']):
+            assert stats['offered'] >= stats['rejected_accept'] + stats['rejected_prefer']
+            assert stats['forwarded'] > 0 and stats['peak_queue'] > 0
+        assert sum(worker['figure2a_line_4_rpki']['trials'] for worker in report['workers'].values()) == len(TRIALS)
+
+
+class TestExperiments(unittest.TestCase):
+
+    def test_sequential_sampling(self):
+        graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+        trials = TRIALS * 10
+        expected = serial_results(graph, trials, 1)
+        try:
+            experiments.CI_BATCH = 12
+            with experiments.worker_pool(1):
+                # Stops after the first batch
+                experiments.CI_WIDTH = 1000.0
+                results = experiments.figure2a_experiment(graph, trials, n_hops=1)
+                assert len(results) == 12
+                # Drawn in a random order of the trials, not the first ones
+                assert sorted(results) != sorted(expected[:12])
+                # Runs every trial, in another order, broadcasting the deployment for the first batch only
+                experiments.CI_WIDTH = 0.001
+                with mock.patch.object(experiments.WorkerPool, 'broadcast', autospec=True,
+                                       side_effect=experiments.WorkerPool.broadcast) as broadcast:
+                    results = experiments.figure2a_experiment(graph, trials, n_hops=1)
+                assert sorted(results) == sorted(expected)
+                assert [call.args[1] for call in broadcast.call_args_list] == [experiments.BATCH_TASK]
+            first, last = experiments.POINTS[-2:]
+            assert first.n_trials == 12 and 2 * first.half_width <= 1000.0
+            assert last.n_trials == len(trials) and last.mean == statistics.fmean(expected)
+            assert 2 * last.half_width > 0.001
+        finally:
+            experiments.CI_WIDTH = None
+            experiments.CI_BATCH = 100
+            experiments.POINTS.clear()
+
+    def test_sequential_sampling_order(self):
+        graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+        trials = TRIALS * 10
+
+        def first_batch(experiment_id):
+            experiments.EXPERIMENT_ID = experiment_id
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                results = experiments.figure2a_experiment(graph, trials, n_hops=1)
+            # Points are printed by the CLI only
+            assert output.getvalue() == ''
+            return results
+
+        try:
+            experiments.SEED = 1
+            experiments.CI_WIDTH = 1000.0
+            experiments.CI_BATCH = 12
+            # The order of the trials depends on the seed and the experiment, not only on their number
+            assert first_batch(0) == first_batch(0)
+            assert first_batch(0) != first_batch(1)
+            experiments.SEED = 2
+            assert first_batch(0) != first_batch(1)
+        finally:
+            experiments.SEED = None
+            experiments.EXPERIMENT_ID = 0
+            experiments.CI_WIDTH = None
+            experiments.CI_BATCH = 100
+            experiments.POINTS.clear()
+
+    def test_confidence_half_width(self):
+        assert experiments.confidence_half_width([50.0], 0.95) == math.inf
+        assert experiments.confidence_half_width([0.0, 0.0, 0.0], 0.95) == 0.0
+        assert abs(experiments.confidence_half_width([0.0, 100.0] * 50, 0.95) - 9.85) < 0.01
+
+    def test_success_rate(self):
+        assert experiments.success_rate(3, 12) == 25.0
+        with self.assertRaises(ZeroDivisionError):
+            experiments.success_rate(0, 0)
+
+    def test_unknown_as_skipped(self):
+        graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+        trials = [(1, 6), (99, 6), (1, 99), (9, 2)]
+        n_skipped = experiments.N_SKIPPED
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)
+            results = experiments.figure2a_experiment(graph, trials, n_hops=1)
+        # Trials with an AS not in the graph are skipped and count as 0%
+        assert results == [serial_results(graph, [(1, 6)], 1)[0], 0.0, 0.0, serial_results(graph, [(9, 2)], 1)[0]]
+        assert results[0] > 0
+        assert experiments.N_SKIPPED == n_skipped + 2
+
+    def test_graph_reused(self):
+        topology = as_graph.load_topology(AS_REL_FILEPATH)
+        graph = experiments.graph_for(topology)
+        with experiments.worker_pool(1):
+            results = experiments.figure2a_line_1_next_as(topology, 2, TRIALS)
+            assert experiments.graph_for(topology) is graph
+            assert len([asys for asys in graph.asyss.values()
+                        if type(asys.policy) is PathEndValidationPolicy]) == 2
+
+            expected = ASGraph(topology, policy=RPKIPolicy())
+            for asys in expected.identify_top_isps(2):
+                asys.policy = PathEndValidationPolicy()
+            assert results == serial_results(expected, TRIALS, 1)
+
+            # The next experiment resets the deployment
+            experiments.figure2a_line_4_rpki(topology, TRIALS[:1])
+            assert all(type(asys.policy) is RPKIPolicy for asys in graph.asyss.values())
+        assert experiments.graph_for(as_graph.load_topology(AS_REL_FILEPATH)) is not graph
+
+
+if __name__ == '__main__':
+    unittest.main()
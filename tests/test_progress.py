@@ -0,0 +1,78 @@
+import unittest
+import io
+import os
+import shutil
+import tempfile
+
+import bgpsecsim.as_graph as as_graph
+import bgpsecsim.experiments as experiments
+import bgpsecsim.progress as progress
+
+AS_REL_FILEPATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'as-rel.txt')
+
+TRIALS = [(victim, attacker) for victim in (1, 6, 9, 12) for attacker in (2, 7, 13)]
+
+
+class FakePool(object):
+    def __init__(self):
+        self.done = 0
+
+    def trials_done(self):
+        return self.done
+
+
+class TestProgress(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_snapshot(self):
+        p = progress.Progress()
+        pool = FakePool()
+        pool.done = 5
+        p.expect(40)
+        p.start_experiment('line_a', 10)
+        p.start_batch(pool)
+        pool.done = 9
+        status = p.snapshot()
+        assert status['trials'] == 4 and status['experiment_done'] == 4 and status['expected'] == 40
+        assert status['lines'] == {'line_a': [0, 4]} and status['rate'] > 0
+        p.finish_batch(10)
+        p.finish_experiment()
+        p.start_experiment('line_b', 10)
+        status = p.snapshot()
+        assert status['trials'] == 10 and status['experiments'] == 1
+        assert status['lines'] == {'line_a': [1, 10], 'line_b': [0, 0]}
+        assert 'line_b #1: 0/10' in progress.format_line(status)
+
+        metrics = progress.format_metrics(status)
+        assert 'bgpsecsim_trials_done_total 10\n' in metrics
+        assert 'bgpsecsim_line_trials_done_total{line="line_a"} 10\n' in metrics
+        assert progress.format_metrics(progress.Progress().snapshot()).count(' NaN\n') == 2
+
+    def test_reporting(self):
+        topology = as_graph.load_topology(AS_REL_FILEPATH)
+        status_file = os.path.join(self.dir, 'status.prom')
+        output = io.StringIO()
+        with experiments.worker_pool(2) as pool:
+            with progress.reporting(3600, status_file, output) as p:
+                assert progress.PROGRESS is p
+                experiments.figure2a_line_4_rpki(topology, TRIALS)
+                experiments.figure2a_line_4_rpki(topology, TRIALS[:5])
+            assert pool.trials_done() == len(TRIALS) + 5
+        assert progress.PROGRESS is None
+        # The final report
+        assert output.getvalue().startswith(f"[0:00:00] {len(TRIALS) + 5} trials")
+        with open(status_file) as f:
+            metrics = f.read()
+        assert 'bgpsecsim_line_experiments_done_total{line="figure2a_line_4_rpki"} 2\n' in metrics
+        assert f'bgpsecsim_line_trials_done_total{{line="figure2a_line_4_rpki"}} {len(TRIALS) + 5}\n' in metrics
+        assert os.listdir(self.dir) == ['status.prom']
+        assert os.stat(status_file).st_mode & 0o777 == 0o644
+
+
+if __name__ == '__main__':
+    unittest.main()
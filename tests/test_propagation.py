@@ -0,0 +1,98 @@
+import unittest
+import os
+
+import bgpsecsim.as_graph as as_graph
+import bgpsecsim.propagation as propagation
+from bgpsecsim.as_graph import ASGraph
+from bgpsecsim.routing_policy import (
+    DefaultPolicy, RPKIPolicy, PathEndValidationPolicy, ASPAPolicy, BGPsecMedSecPolicy,
+    AUTHENTICATED, LOCAL_PREF, PATH_LENGTH, NEXT_HOP
+)
+
+AS_REL_FILEPATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'as-rel.txt')
+SNAPSHOT_FILEPATH = os.path.join(os.path.dirname(__file__), os.pardir, 'caida-data', '19980101.as-rel.txt')
+
+
+def routes_to(graph, as_id):
+    return {asys.as_id: str(asys.get_route(as_id)) for asys in graph.asyss.values()}
+
+
+class TestStablePropagation(unittest.TestCase):
+
+    def test_same_routes_as_queue_on_fixture(self):
+        # The two models agree on the small fixture, but not in general, see test_differs_from_queue
+        nx_graph = as_graph.parse_as_rel_file(AS_REL_FILEPATH)
+        for policy in (DefaultPolicy, RPKIPolicy, PathEndValidationPolicy, ASPAPolicy):
+            queue = ASGraph(nx_graph, policy=policy())
+            stable = ASGraph(nx_graph, policy=policy(), model=propagation.STABLE)
+            for as_id in queue.asyss:
+                queue.clear_routing_tables()
+                queue.find_routes_to(queue.get_asys(as_id))
+                stable.clear_routing_tables()
+                stable.find_routes_to(stable.get_asys(as_id))
+                assert routes_to(queue, as_id) == routes_to(stable, as_id)
+
+    def test_differs_from_queue(self):
+        # On a real snapshot the models differ: the queue model leaves ASs with paths their next hop
+        # has since replaced, the stable model's routes always extend the next hop's route
+        nx_graph = as_graph.parse_as_rel_file(SNAPSHOT_FILEPATH)
+        queue = ASGraph(nx_graph)
+        stable = ASGraph(nx_graph, model=propagation.STABLE)
+        queue.find_routes_to(queue.get_asys(7))
+        stable.find_routes_to(stable.get_asys(7))
+
+        def stale(graph):
+            count = 0
+            for asys in graph.asyss.values():
+                route = asys.get_route(7)
+                if route is not None and route.length > 1:
+                    next_hop = route.path[-2]
+                    count += route.path[:-1] != next_hop.get_route(7).path
+            return count
+
+        queue_routes = routes_to(queue, 7)
+        stable_routes = routes_to(stable, 7)
+        assert len(queue_routes) == 3233
+        assert sum(1 for as_id in queue_routes if queue_routes[as_id] != stable_routes[as_id]) == 1139
+        assert stale(queue) == 711
+        assert stale(stable) == 0
+
+    def test_hijack(self):
+        graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH), model=propagation.STABLE)
+        victim = graph.get_asys(1)
+        attacker = graph.get_asys(6)
+        graph.find_routes_to(victim)
+        graph.hijack_n_hops(victim, attacker, 0)
+
+        routes = routes_to(graph, 1)
+        # The attacker keeps its own route
+        assert routes[6] == '1,2,6'
+        assert routes[2] == '6,2'
+        assert routes[3] == '6,2,3'
+        # Routes of the provider's customers follow the provider's new route
+        assert routes[7] == '6,2,7'
+        assert routes[8] == '6,2,3,8'
+        assert routes[4] == '1,4'
+        assert routes[10] == '1,4,10'
+
+    def test_unsupported_policies(self):
+        graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH), model=propagation.STABLE)
+        assert propagation.supports(graph)
+        graph.get_asys(2).policy = DefaultPolicy(preference=(AUTHENTICATED, LOCAL_PREF, PATH_LENGTH, NEXT_HOP))
+        assert not propagation.supports(graph)
+        graph.get_asys(2).policy = BGPsecMedSecPolicy()
+        assert not propagation.supports(graph)
+
+        # The queue model is not silently used instead
+        with self.assertRaises(ValueError):
+            graph.find_routes_to(graph.get_asys(8))
+        with self.assertRaises(ValueError):
+            graph.hijack_n_hops(graph.get_asys(8), graph.get_asys(6), 1)
+
+    def test_unknown_model(self):
+        with self.assertRaises(ValueError):
+            ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH), model='fifo')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+import bgpsecsim.result_store as result_store
+from bgpsecsim.error import ResultStoreMismatch
+from bgpsecsim.result_store import ResultStore
+
+META = {'figure': 'figure10_3d', 'seed': 1, 'topology': 'abc', 'trials': result_store.trials_digest([(1, 2)])}
+
+
+class TestResultStore(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'figure.results')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_resume(self):
+        with ResultStore(self.filename, META, sync_every=2) as store:
+            store.append((0, 5, 10), 12.5)
+            store.append((0, 5, 15), 1 / 3)
+            with self.assertRaises(ValueError):
+                store.append((0, 5, 10), 0.0)
+        # A row cut off by a crash
+        with open(self.filename, 'a') as f:
+            f.write('0,10,0,4')
+
+        assert result_store.is_store(self.filename)
+        meta, results = result_store.read(self.filename)
+        assert meta == META
+        assert results == {(0, 5, 10): 12.5, (0, 5, 15): 1 / 3}
+
+        with ResultStore(self.filename, META, resume=True) as store:
+            assert len(store) == 2 and (0, 5, 15) in store and (0, 10, 0) not in store
+            store.append((0, 10, 0), 7.0)
+        assert result_store.read(self.filename)[1] == {(0, 5, 10): 12.5, (0, 5, 15): 1 / 3, (0, 10, 0): 7.0}
+
+        # Without resume the run starts over
+        with ResultStore(self.filename, META) as store:
+            assert len(store) == 0
+        assert result_store.read(self.filename)[1] == {}
+
+    def test_mismatch(self):
+        with ResultStore(self.filename, META) as store:
+            store.append((0, 0, 0), 1.0)
+        with self.assertRaises(ResultStoreMismatch) as cm:
+            ResultStore(self.filename, dict(META, seed=2), resume=True)
+        assert cm.exception.message.endswith('seed')
+        with self.assertRaises(ResultStoreMismatch):
+            ResultStore(self.filename, dict(META, trials=result_store.trials_digest([(2, 1)])), resume=True)
+
+        csv_file = os.path.join(self.dir, 'figure.csv')
+        with open(csv_file, 'w') as f:
+            f.write('1.0\n')
+        assert not result_store.is_store(csv_file)
+        with self.assertRaises(ResultStoreMismatch):
+            result_store.read(csv_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import os
+import pickle
+
+import bgpsecsim.as_graph as as_graph
+from bgpsecsim.asys import Route
+from bgpsecsim.as_graph import ASGraph
+from bgpsecsim.routing_policy import (
+    DefaultPolicy, BGPsecHighSecPolicy, BGPsecMedSecPolicy, BGPsecLowSecPolicy,
+    AUTHENTICATED, LOCAL_PREF, PATH_LENGTH, NEXT_HOP
+)
+
+AS_REL_FILEPATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'as-rel.txt')
+
+
+class TestPreference(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = ASGraph(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+
+    def route(self, as_ids, authenticated=False):
+        return Route(as_ids[0], [self.graph.get_asys(as_id) for as_id in as_ids],
+                     origin_invalid=False, path_end_invalid=False, authenticated=authenticated)
+
+    def test_default_preference(self):
+        policy = DefaultPolicy()
+        # Customer route over the shorter provider route
+        assert policy.prefer_route(self.route([1, 2]), self.route([13, 6, 2]))
+        # Shorter route from the same relation
+        assert policy.prefer_route(self.route([8, 3, 1]), self.route([2, 1]))
+        # Lower next hop AS on ties
+        assert policy.prefer_route(self.route([13, 5, 1]), self.route([9, 3, 1]))
+        assert not policy.prefer_route(self.route([9, 3, 1]), self.route([13, 5, 1]))
+        # Authentication is ignored
+        assert not policy.prefer_route(self.route([9, 3, 1]), self.route([13, 5, 1], authenticated=True))
+
+    def test_bgpsec_preferences(self):
+        provider_route = self.route([13, 5, 1, 2], authenticated=True)
+        long_route = self.route([12, 5, 4, 1, 2])
+        customer_route = self.route([7, 2])
+        short_route = self.route([3, 2])
+
+        assert BGPsecHighSecPolicy().prefer_route(customer_route, provider_route)
+        assert not BGPsecMedSecPolicy().prefer_route(customer_route, provider_route)
+        assert BGPsecMedSecPolicy().prefer_route(long_route, provider_route)
+        assert not BGPsecLowSecPolicy().prefer_route(short_route, provider_route)
+        assert not BGPsecLowSecPolicy().prefer_route(self.route([8, 3, 2]), self.route([1, 2], authenticated=True))
+
+    def test_declared_preference(self):
+        policy = DefaultPolicy(preference=(AUTHENTICATED, LOCAL_PREF, PATH_LENGTH, NEXT_HOP))
+        assert policy.preference == BGPsecHighSecPolicy.preference
+        customer_route = self.route([7, 2])
+        provider_route = self.route([13, 5, 1, 2], authenticated=True)
+        assert policy.prefer_route(customer_route, provider_route)
+        assert policy.preference_key(customer_route) == BGPsecHighSecPolicy().preference_key(customer_route)
+
+        # Policies stay picklable
+        copy = pickle.loads(pickle.dumps(policy))
+        assert copy.prefer_route(customer_route, provider_route)
+
+    def test_unknown_criterion(self):
+        with self.assertRaises(ValueError):
+            DefaultPolicy(preference=(LOCAL_PREF, 'origin'))
+        with self.assertRaises(ValueError):
+            DefaultPolicy(preference=())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,216 @@
+import unittest
+import gc
+import os
+import random
+from collections import deque
+from unittest import mock
+
+import bgpsecsim.as_graph as as_graph
+import bgpsecsim.propagation as propagation
+from bgpsecsim.asys import Route
+from bgpsecsim.as_graph import ASGraph
+from bgpsecsim.error import StaleRouteError
+from bgpsecsim.profiling import PropagationStats
+from bgpsecsim.routing_policy import ASPAPolicy, BGPsecHighSecPolicy, DefaultPolicy, RPKIPolicy
+from bgpsecsim.routing_state import CYCLIC, NONE, ORIGIN_INVALID, RoutingState, RouteView, _PREDECESSOR
+
+AS_REL_FILEPATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'as-rel.txt')
+
+
+def routes_to(graph, as_id):
+    return {asys.as_id: repr(asys.get_route(as_id)) for asys in graph.asyss.values()}
+
+
+class TestRoutingState(unittest.TestCase):
+
+    def setUp(self):
+        self.nx_graph = as_graph.parse_as_rel_file(AS_REL_FILEPATH)
+
+    def test_same_routes_as_routing_tables(self):
+        for model in propagation.MODELS:
+            tables = ASGraph(self.nx_graph, model=model)
+            state = ASGraph(self.nx_graph, model=model)
+            for as_id in tables.asyss:
+                tables.clear_routing_tables()
+                tables.find_routes_to(tables.get_asys(as_id))
+                state.start_trial(state.get_asys(as_id), state.get_asys(13 if as_id != 13 else 12))
+                state.find_routes_to(state.get_asys(as_id))
+                assert state.state is not None
+                assert routes_to(state, as_id) == routes_to(tables, as_id)
+                assert all(len(asys.routing_table) == 1 for asys in state.asyss.values())
+
+    def test_views(self):
+        graph = ASGraph(self.nx_graph)
+        victim = graph.get_asys(1)
+        graph.start_trial(victim, graph.get_asys(6))
+        graph.find_routes_to(victim)
+
+        route = graph.get_asys(8).get_route(1)
+        assert isinstance(route, RouteView) and isinstance(route, Route)
+        assert str(route) == '1,3,8'
+        assert route.length == 3
+        assert route.origin == victim
+        assert route.first_hop == graph.get_asys(3)
+        assert isinstance(route.parent, RouteView) and str(route.parent) == '1,3'
+        assert route.contains(graph.get_asys(3)) and not route.contains(graph.get_asys(2))
+        forwarded = route.final.forward_route(route, graph.get_asys(9))
+        assert str(forwarded) == '1,3,8,9' and forwarded.parent is route
+        own = victim.get_route(1)
+        assert str(own) == '1' and own.authenticated and own.parent is None
+        with self.assertRaises(IndexError):
+            own.first_hop
+
+    def test_replaced_routes(self):
+        graph = ASGraph(self.nx_graph)
+        victim = graph.get_asys(1)
+        attacker = graph.get_asys(6)
+        graph.start_trial(victim, attacker)
+        graph.find_routes_to(victim)
+        before = graph.get_asys(3).get_route(1)
+        graph.hijack_n_hops(victim, attacker, 0)
+
+        # A view keeps showing the route it was created for
+        assert str(before) == '1,3' and not before.tainted
+        after = graph.get_asys(3).get_route(1)
+        assert str(after) == '6,2,3' and after.tainted and after.origin_invalid
+        assert after.first_hop == graph.get_asys(2)
+        # Routes extending a replaced route keep their path
+        route = graph.get_asys(8).get_route(1)
+        assert str(route) == '1,3,8' and not route.tainted
+        assert not route.contains(attacker) and route.contains(graph.get_asys(3))
+        assert str(attacker.get_route(1)) == '1,2,6'
+        assert (graph.n_routes, graph.n_tainted_routes) == (13, 3)
+
+    def test_restore_taints_copy(self):
+        graph = ASGraph(self.nx_graph)
+        victim = graph.get_asys(1)
+        graph.start_trial(victim, graph.get_asys(6))
+        graph.find_routes_to(victim)
+        routes = graph.routes_to(victim)
+
+        graph.restore_routes_to(victim, graph.get_asys(2), routes)
+        assert graph.get_asys(7).get_route(1).tainted
+        assert (graph.n_routes, graph.n_tainted_routes) == (13, 3)
+        graph.restore_routes_to(victim, graph.get_asys(6), routes)
+        assert not graph.get_asys(7).get_route(1).tainted
+        assert (graph.n_routes, graph.n_tainted_routes) == (13, 1)
+
+        with self.assertRaises(ValueError):
+            graph.restore_routes_to(graph.get_asys(2), graph.get_asys(6), routes)
+        graph.clear_routing_tables()
+        with self.assertRaises(ValueError):
+            graph.routes_to(victim)
+
+    def test_stale_view(self):
+        graph = ASGraph(self.nx_graph)
+        victim = graph.get_asys(1)
+        attacker = graph.get_asys(2)
+        graph.start_trial(victim, attacker)
+        graph.find_routes_to(victim)
+        before = graph.get_asys(6).get_route(1)
+        graph.hijack_n_hops(victim, attacker, 0)
+
+        # No route extends the replaced route any more, so it was dropped
+        assert str(graph.get_asys(6).get_route(1)) == '2,6'
+        with self.assertRaises(StaleRouteError):
+            before.path
+        with self.assertRaises(StaleRouteError):
+            graph.state.resolve(before.ref)
+
+    def test_same_routes_as_route_objects(self):
+        def propagate(policy, aspa_enabled):
+            graph = ASGraph(self.nx_graph, policy=policy)
+            for asys in graph.asyss.values():
+                asys.aspa_enabled = asys.as_id in aspa_enabled
+                asys.bgp_sec_enabled = asys.as_id % 2 == 0
+            graph.stats = PropagationStats()
+            results = []
+            for victim_id, attacker_id, n_hops in ((1, 6, 0), (1, 9, 1), (3, 12, 2), (13, 4, 1)):
+                victim = graph.get_asys(victim_id)
+                graph.start_trial(victim, graph.get_asys(attacker_id))
+                graph.find_routes_to(victim)
+                graph.hijack_n_hops(victim, graph.get_asys(attacker_id), n_hops, random.Random(0))
+                routes = [(str(route), route.tainted, route.authenticated) if route else None
+                          for route in (asys.get_route(victim_id) for asys in graph.by_index)]
+                results.append((routes, graph.n_routes, graph.n_tainted_routes))
+            return results, graph.stats.to_dict()
+
+        for policy in (DefaultPolicy(), RPKIPolicy(), BGPsecHighSecPolicy(), ASPAPolicy()):
+            for aspa_enabled in ((), (2, 3, 4, 5, 6, 9), range(1, 14)):
+                indices = propagate(policy, aspa_enabled)
+                with mock.patch.object(RoutingState, 'propagate', return_value=False) as fallback:
+                    objects = propagate(policy, aspa_enabled)
+                assert fallback.called
+                assert indices == objects
+
+    def test_other_policies_use_route_objects(self):
+        class Picky(DefaultPolicy):
+            def accept_route(self, route):
+                return super().accept_route(route) and route.length < 3
+
+        graph = ASGraph(self.nx_graph, policy=Picky())
+        victim = graph.get_asys(1)
+        graph.start_trial(victim, graph.get_asys(6))
+        assert not graph.state.propagate(deque([victim.originate_route(graph.get_asys(2))]))
+        graph.find_routes_to(victim)
+        assert str(graph.get_asys(2).get_route(1)) == '1,2'
+        assert graph.get_asys(6).get_route(1) is None
+
+    def test_policy_rules_follow_policies(self):
+        graph = ASGraph(self.nx_graph)
+        victim = graph.get_asys(1)
+        graph.start_trial(victim, graph.get_asys(6))
+        graph.find_routes_to(victim)
+        rules = graph.policy_rules
+        graph.hijack_n_hops(victim, graph.get_asys(6), 0)
+        assert graph.policy_rules is rules
+
+        graph.get_asys(2).policy = RPKIPolicy()
+        graph.start_trial(victim, graph.get_asys(6))
+        graph.find_routes_to(victim)
+        assert graph.policy_rules is not rules
+        assert graph.policy_rules[1][graph.get_asys(2).index][0] == CYCLIC | ORIGIN_INVALID
+        assert graph.policy_rules[1][graph.get_asys(3).index][0] == CYCLIC
+
+    def test_replaced_routes_bounded(self):
+        graph = ASGraph(self.nx_graph)
+        victim = graph.get_asys(1)
+        graph.start_trial(victim, graph.get_asys(6))
+        graph.find_routes_to(victim)
+        state = graph.state
+        for _ in range(10):
+            for as_id, n_hops in ((6, 3), (13, 2), (9, 1), (7, 0), (12, 0), (8, 0)):
+                graph.hijack_n_hops(victim, graph.get_asys(as_id), n_hops)
+                # Only the replaced routes that current routes extend are kept
+                extended = set()
+                for index, length in enumerate(state.length):
+                    ref = state.predecessor[index] if length else NONE
+                    while ref in state.replaced and ref not in extended:
+                        extended.add(ref)
+                        ref = state.replaced[ref][_PREDECESSOR] if ref >= 0 else NONE
+                assert set(state.replaced) == extended
+                assert len(state.references) == sum(1 for ref in state.replaced if ref < 0)
+                assert len(state.replaced) <= 2 * len(graph.by_index)
+        # Paths still resolve through the kept routes
+        for asys in graph.asyss.values():
+            route = asys.get_route(1)
+            assert len(route.path) == route.length and route.path[-1] == asys
+
+    def test_no_route_objects_kept(self):
+        def count_routes():
+            gc.collect()
+            return len([obj for obj in gc.get_objects() if isinstance(obj, Route)])
+
+        graph = ASGraph(self.nx_graph)
+        victim = graph.get_asys(1)
+        attacker = graph.get_asys(6)
+        before = count_routes()
+        graph.start_trial(victim, attacker)
+        graph.find_routes_to(victim)
+        graph.hijack_n_hops(victim, attacker, 1)
+        # Only the announcements of the victim and the attacker are kept
+        assert count_routes() - before <= len(victim.neighbors) + 2
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import os
+import pickle
+import tempfile
+
+import bgpsecsim.as_graph as as_graph
+from bgpsecsim.asys import Relation
+from bgpsecsim.topology import Topology
+
+AS_REL_FILEPATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'as-rel.txt')
+
+
+class TestTopology(unittest.TestCase):
+
+    def test_from_networkx(self):
+        topology = Topology.from_networkx(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+        assert len(topology) == 13
+        assert topology.asns.tolist() == list(range(1, 14))
+        # Order of first appearance in the file
+        assert topology.asns[topology.order].tolist()[:6] == [1, 2, 3, 4, 5, 6]
+
+        index = topology.index
+        assert topology.neighbors(index[1], Relation.CUSTOMER) == [index[2], index[3], index[4], index[5]]
+        assert topology.neighbors(index[2], Relation.PEER) == [index[3]]
+        assert topology.neighbors(index[6], Relation.PROVIDER) == [index[2]]
+        assert topology.degrees(Relation.CUSTOMER).tolist() == [4, 2, 2, 2, 2, 0, 0, 0, 0, 0, 0, 0, 0]
+
+    def test_relation(self):
+        topology = Topology.from_networkx(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+        index = topology.index
+        assert topology.relation(index[1], index[2]) == Relation.CUSTOMER
+        assert topology.relation(index[2], index[1]) == Relation.PROVIDER
+        assert topology.relation(index[4], index[5]) == Relation.PEER
+        assert topology.relation(index[6], index[7]) is None
+
+    def test_pickle(self):
+        topology = Topology.from_networkx(as_graph.parse_as_rel_file(AS_REL_FILEPATH))
+        index = topology.index
+        assert topology.relation(index[2], index[3]) == Relation.PEER
+        copy = pickle.loads(pickle.dumps(topology))
+        assert copy.asns.tolist() == topology.asns.tolist()
+        assert copy.relation(index[2], index[3]) == Relation.PEER
+        assert copy.neighbors(index[3], Relation.CUSTOMER) == [index[8], index[9]]
+
+    def test_neighbor_order(self):
+        # Neighbors keep the order networkx iterates the edges in, which ASPAPolicy depends on
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, 'as-rel.txt')
+            with open(filename, 'w') as f:
+                f.write("9|4|-1\n2|4|-1\n4|8|0\n6|4|0\n4|1|-1\n4|3|-1\n9|4|-1\n2|8|-1\n")
+            nx_graph = as_graph.parse_as_rel_file(filename)
+            topologies = [Topology.from_networkx(nx_graph), as_graph.load_topology(filename)]
+
+        expected = {as_id: {relation: [] for relation in Relation} for as_id in nx_graph.nodes}
+        for as_id1, as_id2, customer in nx_graph.edges(data='customer'):
+            if customer is None:
+                relations = (Relation.PEER, Relation.PEER)
+            elif customer == as_id2:
+                relations = (Relation.CUSTOMER, Relation.PROVIDER)
+            else:
+                relations = (Relation.PROVIDER, Relation.CUSTOMER)
+            expected[as_id1][relations[0]].append(as_id2)
+            expected[as_id2][relations[1]].append(as_id1)
+        assert expected[4][Relation.PROVIDER] == [9, 2]
+        assert expected[2][Relation.CUSTOMER] == [4, 8]
+
+        for topology in topologies:
+            for as_id, by_relation in expected.items():
+                for relation, as_ids in by_relation.items():
+                    assert topology.asns[topology.neighbors(topology.index[as_id], relation)].tolist() == as_ids
+        assert topologies[0].digest() == topologies[1].digest()
+
+    def test_duplicate_asns(self):
+        with self.assertRaises(ValueError):
+            Topology([1, 2, 1], [(1, 2)], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
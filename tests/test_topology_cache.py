@@ -0,0 +1,72 @@
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+
+import bgpsecsim.as_graph as as_graph
+import bgpsecsim.topology_cache as topology_cache
+
+AS_REL_FILEPATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'as-rel.txt')
+
+
+class TestTopologyCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.dir, 'cache')
+        self.as_rel_file = os.path.join(self.dir, 'as-rel.txt')
+        shutil.copy(AS_REL_FILEPATH, self.as_rel_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_load_topology(self):
+        expected = as_graph.load_topology(AS_REL_FILEPATH)
+        for _ in range(2):
+            topology = topology_cache.load_topology(self.as_rel_file, self.cache_dir)
+            assert isinstance(topology.asns, np.memmap)
+            assert topology.digest() == expected.digest()
+            assert topology.as_ids() == expected.as_ids()
+            assert topology.relation(topology.index[1], topology.index[2]) == expected.relation(
+                expected.index[1], expected.index[2])
+        assert len(topology_cache.entries(self.cache_dir)) == 1
+
+    def test_changed_source(self):
+        entry = topology_cache.build(self.as_rel_file, self.cache_dir)
+        with open(self.as_rel_file, 'a') as f:
+            f.write("13|14|-1\n")
+        assert entry.status() == topology_cache.SOURCE_CHANGED
+
+        topology = topology_cache.load_topology(self.as_rel_file, self.cache_dir)
+        assert len(topology) == 14
+        assert [entry.status() for entry in topology_cache.entries(self.cache_dir)] == [
+            topology_cache.SOURCE_CHANGED, topology_cache.OK]
+
+        assert topology_cache.prune(self.cache_dir)[0].key == entry.key
+        assert [entry.status() for entry in topology_cache.entries(self.cache_dir)] == [topology_cache.OK]
+
+    def test_parser_version(self):
+        topology_cache.build(self.as_rel_file, self.cache_dir)
+        parser_version = as_graph.PARSER_VERSION
+        as_graph.PARSER_VERSION += 1
+        try:
+            assert topology_cache.entries(self.cache_dir)[0].status() == topology_cache.OUTDATED
+            topology_cache.load_topology(self.as_rel_file, self.cache_dir)
+            assert len(topology_cache.prune(self.cache_dir)) == 1
+            assert topology_cache.entries(self.cache_dir)[0].meta['parser_version'] == as_graph.PARSER_VERSION
+        finally:
+            as_graph.PARSER_VERSION = parser_version
+
+    def test_damaged_entry(self):
+        entry = topology_cache.build(self.as_rel_file, self.cache_dir)
+        os.remove(os.path.join(entry.path, 'peer_indices.npy'))
+        topology = topology_cache.load_topology(self.as_rel_file, self.cache_dir)
+        assert topology.digest() == as_graph.load_topology(AS_REL_FILEPATH).digest()
+
+        assert topology_cache.prune(self.cache_dir, everything=True)
+        assert topology_cache.entries(self.cache_dir) == []
+
+
+if __name__ == '__main__':
+    unittest.main()